@@ -5,6 +5,7 @@ from django.db.models import Q
 from django.contrib import admin
 from django.contrib.admin.views.main import ChangeList
 from django.urls import path
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.urls import reverse
 
@@ -13,6 +14,8 @@ from core.admin import InputFilter
 from aids.admin_views import AmendmentMerge
 from aids.models import Aid
 from aids.forms import AidAdminForm
+from aids.search_cache import invalidate_search_cache
+from aids.search_documents import refresh_search_documents
 
 
 class LiveAidListFilter(admin.SimpleListFilter):
@@ -228,7 +231,9 @@ class BaseAidAdmin(admin.ModelAdmin):
     live_status.short_description = _('Live')
 
     def make_mark_as_CFP(self, request, queryset):
-        queryset.update(is_call_for_project=True)
+        queryset.update(is_call_for_project=True, date_updated=timezone.now())
+        refresh_search_documents(queryset.values_list('id', flat=True))
+        invalidate_search_cache()
         self.message_user(request, _('The selected aids were set as CFP'))
     make_mark_as_CFP.short_description = _('Set as CFP')
 
@@ -247,7 +252,10 @@ class AidAdmin(BaseAidAdmin):
         obj.soft_delete()
 
     def delete_queryset(self, request, queryset):
-        queryset.update(status='deleted')
+        aid_ids = list(queryset.values_list('id', flat=True))
+        queryset.update(status='deleted', date_updated=timezone.now())
+        refresh_search_documents(aid_ids)
+        invalidate_search_cache()
 
 
 class DeletedAid(Aid):
@@ -0,0 +1,96 @@
+"""Export the whole aid catalogue.
+
+Exports can be huge, so they are produced as iterators of text lines: aids
+are read from the db with a server-side cursor and serialized one chunk at a
+time, so memory usage does not depend on the catalogue size.
+"""
+
+import csv
+import io
+from itertools import islice
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from aids.models import Aid
+from aids.api.serializers import AidSerializer, AidValuesSerializer
+
+
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CHUNK_SIZE = 500
+
+# Separator used for multiple values in csv cells
+CSV_LIST_SEPARATOR = '; '
+
+
+def get_export_queryset():
+    """The exported aids: all published and open aids."""
+
+    qs = Aid.objects \
+        .published() \
+        .open() \
+        .order_by('id')
+    return qs
+
+
+def iter_aid_records(qs=None, chunk_size=CHUNK_SIZE):
+    """Yield serialized aids, in the api format.
+
+    Ids are read with a server-side cursor, and every chunk of aids is
+    rendered by the fast serializer, that fetches related data for the whole
+    chunk at once.
+    """
+    if qs is None:
+        qs = get_export_queryset()
+
+    aid_ids = qs.values_list('id', flat=True).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(aid_ids, chunk_size))
+        if not chunk:
+            break
+
+        yield from AidValuesSerializer(chunk).data
+
+
+def iter_jsonl(records):
+    """Yield one json document per line."""
+
+    encoder = JSONEncoder(ensure_ascii=False)
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+def iter_csv(records):
+    """Yield csv lines, with a header line."""
+
+    fieldnames = AidSerializer.Meta.fields
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writeheader()
+    yield flush()
+
+    for record in records:
+        writer.writerow({
+            key: CSV_LIST_SEPARATOR.join(map(str, value))
+            if isinstance(value, list) else value
+            for key, value in record.items()})
+        yield flush()
+
+
+def iter_export(export_format, qs=None):
+    """Yield the lines of the export in the given format."""
+
+    records = iter_aid_records(qs)
+    if export_format == 'csv':
+        return iter_csv(records)
+    return iter_jsonl(records)
@@ -0,0 +1,146 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    """Build an opaque cursor from a list of json serializable values."""
+
+    data = json.dumps(values).encode()
+    return urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(encoded):
+    """Return the list of values from an opaque cursor.
+
+    Raises `ValueError` if the cursor is invalid.
+    """
+    padding = '=' * (-len(encoded) % 4)
+    data = urlsafe_b64decode(encoded + padding)
+    values = json.loads(data.decode())
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+class AidPagination(PageNumberPagination):
+    """Paginate aids either by page number or by cursor.
+
+    Page number pagination is the default, and is kept for existing clients.
+    However, deep pages require an OFFSET scan and every page requires a
+    full COUNT query.
+
+    Clients that walk the whole catalogue should use keyset (a.k.a "seek")
+    pagination instead, by passing an empty `cursor` parameter for the first
+    page, then following the `next` links. Every page is then fetched with a
+    simple `WHERE (scale, deadline, id) > (…)` condition, hence a constant
+    cost, whatever the page depth.
+
+    Cursors are opaque values and are only valid for forward navigation.
+    Aids without a perimeter come last, and aids without a submission
+    deadline come last in each scale, as in the default page number order.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('perimeter__scale', 'submission_deadline', 'id')
+
+    def uses_cursor(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.uses_cursor(request):
+            self.cursor_page = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_page = True
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        qs = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position:
+            qs = qs.filter(self.get_position_filter(*position))
+
+        results = list(qs[:page_size + 1])
+        has_next = len(results) > page_size
+        results = results[:page_size]
+
+        if has_next:
+            last = results[-1]
+            scale = last.perimeter.scale if last.perimeter_id else None
+            self.next_position = (scale, last.submission_deadline, last.id)
+        else:
+            self.next_position = None
+
+        return results
+
+    def get_position_filter(self, scale, deadline, aid_id):
+        """Select aids that come after the given position.
+
+        Postgres sorts NULL values last, hence the special cases for aids
+        without perimeters or deadlines.
+        """
+        if deadline is None:
+            same_scale = Q(submission_deadline__isnull=True, id__gt=aid_id)
+        else:
+            same_scale = \
+                Q(submission_deadline__gt=deadline) | \
+                Q(submission_deadline__isnull=True) | \
+                Q(submission_deadline=deadline, id__gt=aid_id)
+
+        if scale is None:
+            return Q(perimeter__isnull=True) & same_scale
+
+        return Q(perimeter__scale__gt=scale) | \
+            Q(perimeter__scale__isnull=True) | \
+            Q(Q(perimeter__scale=scale) & same_scale)
+
+    def encode_cursor(self, position):
+        scale, deadline, aid_id = position
+        deadline = deadline.isoformat() if deadline else None
+        return encode_cursor([scale, deadline, aid_id])
+
+    def decode_cursor(self, request):
+        """Return the (scale, deadline, id) position from the request.
+
+        An empty cursor means the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            scale, deadline, aid_id = decode_cursor(encoded)
+            scale = int(scale) if scale is not None else None
+            deadline = date.fromisoformat(deadline) if deadline else None
+            return scale, deadline, int(aid_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.cursor_page:
+            return super().get_next_link()
+
+        if self.next_position is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self.next_position)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_page:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -1,6 +1,11 @@
+from collections import OrderedDict, defaultdict
+from types import SimpleNamespace
+
+from django.urls import reverse
 from rest_framework import serializers
 
 from aids.models import Aid
+from geofr.models import Perimeter
 
 
 class ArrayField(serializers.ListField):
@@ -38,3 +43,132 @@ class AidSerializer(serializers.ModelSerializer):
                   'start_date', 'predeposit_date', 'submission_deadline',
                   'subvention_rate', 'contact', 'recurrence', 'date_created',
                   'date_updated')
+
+
+class AidValuesSerializer:
+    """A fast, read-only version of `AidSerializer` for lists of aids.
+
+    Rendering model instances with `AidSerializer` is slow: the full aid
+    objects must be fetched, related objects are converted one by one, and
+    urls and choice labels are computed for every single row.
+
+    Instead, this serializer fetches a `values()` projection of the given
+    aids, fetches backer names and perimeters with a single query each, and
+    precomputes urls and labels. The output is the same as `AidSerializer`'s.
+
+    Fields that don't need special handling are still rendered by the
+    `AidSerializer` fields themselves.
+    """
+
+    URL_SLUG_PLACEHOLDER = '__slug__'
+    CUSTOM_FIELDS = ('url', 'financers', 'instructors', 'perimeter',
+                     'recurrence')
+
+    def __init__(self, aid_ids):
+        self.aid_ids = list(aid_ids)
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            self._data = self.to_representation()
+        return self._data
+
+    def get_simple_fields(self, fields):
+        """Return a {name: (source, field, needs_object)} dict.
+
+        `ModelField` fields expect the whole object instead of a single
+        value, so we must pass them an object with the right attribute.
+        """
+        simple_fields = {}
+        for name, field in fields.items():
+            if name in self.CUSTOM_FIELDS or isinstance(field, ArrayField):
+                continue
+
+            needs_object = isinstance(field, serializers.ModelField)
+            if needs_object:
+                source = field.model_field.attname
+            else:
+                source = field.source
+            simple_fields[name] = (source, field, needs_object)
+        return simple_fields
+
+    def get_backer_names(self, relation):
+        """Return a {aid_id: [backer names]} dict for the given relation."""
+
+        Through = getattr(Aid, relation).through
+        links = Through.objects \
+            .filter(aid_id__in=self.aid_ids) \
+            .order_by('id') \
+            .values_list('aid_id', 'backer__name')
+
+        names = defaultdict(list)
+        for aid_id, backer_name in links:
+            names[aid_id].append(backer_name)
+        return names
+
+    def get_perimeter_names(self, perimeter_ids):
+        perimeters = Perimeter.objects \
+            .filter(id__in=perimeter_ids) \
+            .only('id', 'name', 'scale', 'zipcodes')
+        return {perimeter.id: str(perimeter) for perimeter in perimeters}
+
+    def to_representation(self):
+        fields = AidSerializer().fields
+        simple_fields = self.get_simple_fields(fields)
+        choice_labels = {
+            name: {key: str(label) for key, label in field.repr_dict.items()}
+            for name, field in fields.items()
+            if isinstance(field, ArrayField)}
+        recurrence_labels = {
+            key: str(label) for key, label in Aid.RECURRENCE}
+
+        value_fields = {'id', 'slug', 'perimeter_id', 'recurrence'}
+        value_fields.update(
+            source for source, _, _ in simple_fields.values())
+        value_fields.update(choice_labels.keys())
+        rows = Aid.objects \
+            .filter(id__in=self.aid_ids) \
+            .values(*value_fields)
+        rows = {row['id']: row for row in rows}
+
+        financers = self.get_backer_names('financers')
+        instructors = self.get_backer_names('instructors')
+        perimeter_names = self.get_perimeter_names(
+            {row['perimeter_id'] for row in rows.values()})
+        url_template = reverse(
+            'aid_detail_view', args=[self.URL_SLUG_PLACEHOLDER])
+
+        data = []
+        for aid_id in self.aid_ids:
+            if aid_id not in rows:
+                continue
+
+            row = rows[aid_id]
+            obj = SimpleNamespace(**row)
+            custom_values = {
+                'url': url_template.replace(
+                    self.URL_SLUG_PLACEHOLDER, row['slug']),
+                'financers': financers.get(aid_id, []),
+                'instructors': instructors.get(aid_id, []),
+                'perimeter': perimeter_names.get(row['perimeter_id']),
+                'recurrence': recurrence_labels.get(
+                    row['recurrence'], row['recurrence']),
+            }
+
+            record = OrderedDict()
+            for name in fields.keys():
+                if name in custom_values:
+                    record[name] = custom_values[name]
+                elif name in choice_labels:
+                    labels = choice_labels[name]
+                    value = row[name]
+                    record[name] = None if value is None \
+                        else [labels[choice] for choice in value]
+                else:
+                    source, field, needs_object = simple_fields[name]
+                    value = obj if needs_object else row[source]
+                    record[name] = None if value is None \
+                        else field.to_representation(value)
+            data.append(record)
+
+        return data
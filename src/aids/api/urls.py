@@ -1,10 +1,14 @@
+from django.urls import path
 from rest_framework import routers
 
-from aids.api.views import AidViewSet
+from aids.api.views import AidViewSet, AidExportView
 
 
 router = routers.SimpleRouter()
 router.register('', AidViewSet, basename='aids')
 
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('export.<str:export_format>', AidExportView.as_view(),
+         name='aids_export'),
+] + router.urls
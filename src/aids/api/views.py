@@ -1,14 +1,38 @@
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db.models import Q
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.generic import View
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-from aids.models import Aid
-from aids.api.serializers import AidSerializer
+from aids.models import Aid, AidWorkflow
+from aids.api.serializers import AidSerializer, AidValuesSerializer
+from aids.api.pagination import AidPagination, encode_cursor, decode_cursor
+from aids.api.export import EXPORT_FORMATS, iter_export
 from aids.forms import AidSearchForm
+from aids.search_cache import get_cached_aid_ids, CachedSearchResults
 
 
 class AidViewSet(viewsets.ReadOnlyModelViewSet):
     """List all active aids that we know about."""
 
     serializer_class = AidSerializer
+    pagination_class = AidPagination
+
+    # Changes feed settings
+    CHANGES_PAGE_SIZE = 200
+
+    # Recent changes could belong to transactions that are not commited
+    # yet. Since the feed position must only move forward, such changes
+    # would be skipped. Hence, we only serve changes old enough.
+    CHANGES_SETTLE_DELAY = timedelta(minutes=5)
 
     def get_queryset(self):
         """Filter data according to search query."""
@@ -22,4 +46,142 @@ class AidViewSet(viewsets.ReadOnlyModelViewSet):
 
         filter_form = AidSearchForm(data=self.request.GET)
         filtered_qs = filter_form.filter_queryset(qs)
-        return filtered_qs
+
+        # Single aids are fetched with `get_object`, and cursor pages with
+        # a keyset condition, both need an actual queryset.
+        # Other result lists are served from the search cache.
+        if self.action != 'list' or self.paginator.uses_cursor(self.request):
+            return filtered_qs
+
+        aid_ids = get_cached_aid_ids(filter_form, filtered_qs, 'api')
+        return CachedSearchResults(aid_ids, qs)
+
+    def list(self, request, *args, **kwargs):
+        """List aids.
+
+        Cached search results are rendered with the fast serializer, from
+        the ids of the current page.
+        """
+        results = self.get_queryset()
+        if not isinstance(results, CachedSearchResults):
+            return super().list(request, *args, **kwargs)
+
+        page_ids = self.paginate_queryset(results.aid_ids)
+        data = AidValuesSerializer(page_ids).data
+        return self.get_paginated_response(data)
+
+    @action(detail=False)
+    def changes(self, request):
+        """Return the aids that changed since a given position.
+
+        This is meant for clients that mirror the aid catalogue. The `since`
+        parameter is either an ISO 8601 datetime (for the first call) or the
+        `cursor` value returned by the previous call.
+
+        Every result is either a full aid record (`created` or `updated`
+        change), or a tombstone (`unpublished` or `deleted` change) telling
+        the client to remove the aid. Aids that were never published are not
+        part of the feed.
+
+        Note that expired aids are not removed from the feed, since
+        clients can filter them with the `submission_deadline` value.
+        """
+        since = request.query_params.get('since', '')
+        since_date, since_id = self.parse_changes_position(since)
+        until_date = timezone.now() - self.CHANGES_SETTLE_DELAY
+
+        qs = Aid.all_aids \
+            .filter(is_amendment=False) \
+            .filter(date_published__isnull=False) \
+            .filter(date_updated__lte=until_date) \
+            .filter(
+                Q(date_updated__gt=since_date) |
+                Q(date_updated=since_date, id__gt=since_id)) \
+            .select_related('perimeter') \
+            .prefetch_related('financers', 'instructors') \
+            .order_by('date_updated', 'id')
+
+        aids = list(qs[:self.CHANGES_PAGE_SIZE + 1])
+        has_more = len(aids) > self.CHANGES_PAGE_SIZE
+        aids = aids[:self.CHANGES_PAGE_SIZE]
+
+        if aids:
+            last = aids[-1]
+            cursor = encode_cursor([last.date_updated.isoformat(), last.id])
+        else:
+            cursor = encode_cursor([since_date.isoformat(), since_id])
+
+        if has_more:
+            url = request.build_absolute_uri()
+            next_url = replace_query_param(url, 'since', cursor)
+        else:
+            next_url = None
+
+        return Response(OrderedDict([
+            ('cursor', cursor),
+            ('next', next_url),
+            ('results', [self.serialize_change(aid, since_date)
+                         for aid in aids]),
+        ]))
+
+    def parse_changes_position(self, since):
+        """Return the (date_updated, id) position to start from."""
+
+        if not since:
+            raise ValidationError({'since': 'This parameter is required.'})
+
+        try:
+            since_date = parse_datetime(since)
+            if since_date is not None:
+                since_id = 0
+            else:
+                date_updated, since_id = decode_cursor(since)
+                since_date = parse_datetime(date_updated)
+                if since_date is None:
+                    raise ValueError('Invalid date')
+                since_id = int(since_id)
+        except (TypeError, ValueError):
+            raise ValidationError({'since': 'Invalid date or cursor.'})
+
+        if timezone.is_naive(since_date):
+            since_date = timezone.make_aware(since_date)
+        return since_date, since_id
+
+    def serialize_change(self, aid, since_date):
+        states = AidWorkflow.states
+        if aid.status == states.published:
+            change = 'created' if aid.date_published > since_date \
+                else 'updated'
+            data = self.get_serializer(aid).data
+        else:
+            change = 'deleted' if aid.status == states.deleted \
+                else 'unpublished'
+            data = None
+
+        return OrderedDict([
+            ('id', aid.id),
+            ('change', change),
+            ('date_updated', aid.date_updated),
+            ('data', data),
+        ])
+
+
+class AidExportView(View):
+    """Stream the whole catalogue of published and open aids.
+
+    The export is generated on the fly, without pagination, in json lines
+    or csv format. Records have the same format as in the aid api.
+    """
+
+    def get(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            raise Http404
+
+        content_type = '{}; charset=utf-8'.format(
+            EXPORT_FORMATS[export_format])
+        response = StreamingHttpResponse(
+            iter_export(export_format), content_type=content_type)
+        response['Content-Disposition'] = \
+            'attachment; filename="aides-territoires.{}"'.format(
+                export_format)
+        return response
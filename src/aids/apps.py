@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AidsConfig(AppConfig):
     name = 'aids'
+
+    def ready(self):
+        import aids.signals  # noqa
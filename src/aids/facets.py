@@ -0,0 +1,158 @@
+"""Count matching aids for every search filter value.
+
+The search engine sidebar displays, next to every filter value (audiences,
+aid types, project steps, destinations and categories), the number of aids
+that would match the search if this value was selected.
+
+Counts are "disjunctive": every facet is counted ignoring its own filter,
+otherwise selecting a single audience would display zero for all the other
+ones. Hence, every facet requires its own search query.
+
+Views only count the facets of the filters their template displays. Those
+facets are counted in a single `UNION ALL` query. Array fields are counted
+with `unnest`, and categories with a join. Counts are cached alongside the
+search results (see `aids.search_cache`).
+"""
+
+import copy
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.db.models import CharField, Count, F, Func, Value
+from django.db.models.expressions import RawSQL
+
+from aids.models import Aid
+from aids.search_cache import get_search_cache_key
+
+
+# The `aid_type` filter values are groups of aid types, and an aid can
+# belong to both groups
+AID_TYPE_GROUPS = RawSQL(
+    """unnest(array_remove(ARRAY[
+        CASE WHEN "aids_aid"."aid_types" && %s::varchar[] THEN 'financial' END,
+        CASE WHEN "aids_aid"."aid_types" && %s::varchar[] THEN 'technical' END
+    ], NULL))""",
+    (list(Aid.FINANCIAL_AIDS), list(Aid.TECHNICAL_AIDS)),
+    output_field=CharField())
+
+
+# The list of facets, with the aid field (or expression) to count and the
+# search form fields that filter on this facet.
+FACETS = (
+    ('targeted_audiances', 'targeted_audiances', ('targeted_audiances',)),
+    ('aid_type', AID_TYPE_GROUPS,
+     ('aid_type', 'financial_aids', 'technical_aids')),
+    ('aid_types', 'aid_types',
+     ('aid_type', 'financial_aids', 'technical_aids')),
+    ('mobilization_steps', 'mobilization_steps', ('mobilization_step',)),
+    ('destinations', 'destinations', ('destinations',)),
+    ('categories', 'categories__slug', ('categories', 'themes')),
+)
+
+
+# The search form fields that display aid counts, with the related facet
+FACET_FIELDS = {
+    'targeted_audiances': 'targeted_audiances',
+    'aid_type': 'aid_type',
+    'financial_aids': 'aid_types',
+    'technical_aids': 'aid_types',
+    'mobilization_step': 'mobilization_steps',
+    'destinations': 'destinations',
+    'categories': 'categories',
+}
+
+
+def get_facet_form(form, ignored_fields):
+    """Return a copy of a search form that ignores some filters."""
+
+    facet_form = copy.copy(form)
+    facet_form.cleaned_data = dict(form.cleaned_data)
+    for field in ignored_fields:
+        facet_form.cleaned_data[field] = []
+    return facet_form
+
+
+def get_facet_queryset(form, facet, field, ignored_fields):
+    """Return the (facet, value, nb_aids) rows of a single facet."""
+
+    facet_form = get_facet_form(form, ignored_fields)
+    matching_ids = facet_form.filter_queryset().order_by().values('id')
+
+    if not isinstance(field, str):
+        value = field
+    elif isinstance(Aid._meta.get_field(field.split('__')[0]), ArrayField):
+        value = Func(F(field), function='unnest', output_field=CharField())
+    else:
+        value = F(field)
+
+    return Aid.objects \
+        .filter(id__in=matching_ids) \
+        .annotate(value=value) \
+        .values('value') \
+        .annotate(
+            nb_aids=Count('id', distinct=True),
+            facet=Value(facet, output_field=CharField())) \
+        .values_list('facet', 'value', 'nb_aids') \
+        .order_by()
+
+
+def get_facets(field_names):
+    """Return the facets to count to display the given form fields."""
+
+    facets = {FACET_FIELDS[name] for name in field_names
+              if name in FACET_FIELDS}
+    return [facet for facet in FACETS if facet[0] in facets]
+
+
+def compute_facet_counts(form, facets):
+    querysets = [
+        get_facet_queryset(form, facet, field, ignored_fields)
+        for facet, field, ignored_fields in facets]
+    rows = querysets[0]
+    if len(querysets) > 1:
+        rows = rows.union(*querysets[1:], all=True)
+
+    counts = defaultdict(dict)
+    for facet, value, nb_aids in rows:
+        if value is not None:
+            counts[facet][value] = nb_aids
+    return {facet: dict(counts[facet]) for facet, _, _ in facets}
+
+
+def get_facet_counts(form, field_names=FACET_FIELDS):
+    """Return the number of matching aids for every filter value.
+
+    `form` is a validated search form, and `field_names` are the form fields
+    that display counts. No query is made if none of them does.
+
+    Returns a {facet: {value: nb_aids}} dict, e.g
+    `counts['targeted_audiances']['commune']`.
+    """
+    facets = get_facets(field_names)
+    if not facets:
+        return {}
+
+    namespace = 'search-facets:{}'.format(
+        ','.join(facet for facet, _, _ in facets))
+    cache_key = get_search_cache_key(form, namespace)
+    counts = cache.get(cache_key)
+    if counts is None:
+        counts = compute_facet_counts(form, facets)
+        cache.set(cache_key, counts, settings.SEARCH_CACHE_TIMEOUT)
+    return counts
+
+
+def add_facet_counts(form, counts):
+    """Display the number of matching aids next to every filter value."""
+
+    for name, facet in FACET_FIELDS.items():
+        if name not in form.fields or facet not in counts:
+            continue
+
+        field = form.fields[name]
+        facet_counts = counts[facet]
+        field.choices = [
+            (value, '{} ({})'.format(label, facet_counts.get(value, 0)))
+            for value, label in field.choices]
@@ -51,10 +51,3 @@ class AidFactory(DjangoModelFactory):
             # A list of groups were passed in, use them
             for financer in extracted:
                 self.financers.add(financer)
-
-    @classmethod
-    def _create(cls, model_class, *args, **kwargs):
-        obj = super()._create(model_class, *args, **kwargs)
-        obj.set_search_vector(financers=[])
-        obj.save()
-        return obj
@@ -2,7 +2,7 @@ import re
 import operator
 
 from django import forms
-from django.db.models import Q, F
+from django.db.models import F
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.contrib.admin.widgets import FilteredSelectMultiple
@@ -10,12 +10,14 @@ from django.contrib.postgres.search import SearchQuery, SearchRank
 
 from core.forms import (
     AutocompleteModelChoiceField, AutocompleteModelMultipleChoiceField,
-    MultipleChoiceFilterWidget, RichTextField)
-from geofr.models import Perimeter
+    MultipleChoiceFilterWidget, RichTextField, resolve_autocomplete_choices)
+from geofr.models import Perimeter, PerimeterClosure
+from geofr.graph import related_ids
+from geofr.zipcodes import commune_ids_from_zipcode
 from backers.models import Backer
 from categories.fields import CategoryMultipleChoiceField
 from categories.models import Category, Theme
-from aids.models import Aid
+from aids.models import Aid, AidSearchDocument
 
 
 FINANCIAL_AIDS = (
@@ -58,6 +60,10 @@ AUDIANCES = (
     (_('Other audiances'), OTHER_AUDIANCES)
 )
 
+# Above this number of perimeters, the search perimeter filter uses a
+# subquery instead of a list of ids
+MAX_INLINE_PERIMETER_IDS = 500
+
 IS_CALL_FOR_PROJECT = (
     (None, '----'),
     (True, _('Yes')),
@@ -155,17 +161,6 @@ class BaseAidForm(forms.ModelForm):
 
         return data
 
-    def save(self, commit=True):
-        """Saves the instance.
-
-        We update the aid search_vector here, because this is the only place
-        we gather all the necessary data (object + m2m related objects).
-        """
-        financers = self.cleaned_data.get('financers', None)
-        instructors = self.cleaned_data.get('instructors', None)
-        self.instance.set_search_vector(financers, instructors)
-        return super().save(commit=commit)
-
     def _save_m2m(self):
         super()._save_m2m()
 
@@ -312,6 +307,7 @@ class AidEditForm(BaseAidForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        resolve_autocomplete_choices(self, ['financers', 'instructors'])
         if 'subvention_rate' in self.fields:
             range_widgets = self.fields['subvention_rate'].widget.widgets
             range_widgets[0].attrs['placeholder'] = _('Min. subvention rate')
@@ -450,6 +446,10 @@ class BaseAidSearchForm(forms.Form):
         queryset=Perimeter.objects.all(),
         label=_('Your territory'),
         required=False)
+    zipcode = forms.CharField(
+        label=_('Zipcode'),
+        max_length=5,
+        required=False)
 
     # This field is not related to the search, but is submitted
     # in views embedded through an iframe.
@@ -463,6 +463,10 @@ class BaseAidSearchForm(forms.Form):
         required=False,
         choices=ORDER_BY)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        resolve_autocomplete_choices(self, ['backers'])
+
     def clean_zipcode(self):
         zipcode = self.cleaned_data['zipcode']
         if zipcode and re.match(r'\d{5}', zipcode) is None:
@@ -472,7 +476,12 @@ class BaseAidSearchForm(forms.Form):
         return zipcode
 
     def filter_queryset(self, qs=None):
-        """Filter querysets depending of input data."""
+        """Filter querysets depending of input data.
+
+        Search filters are applied on the `AidSearchDocument` table, so we
+        don't need to join the aids with any related table (and the results
+        don't need to be made distinct).
+        """
 
         # If no qs was passed, just start with all published aids
         if qs is None:
@@ -485,9 +494,26 @@ class BaseAidSearchForm(forms.Form):
         if not hasattr(self, 'cleaned_data'):
             self.full_clean()
 
+        documents = self.filter_documents(AidSearchDocument.objects.all())
+        if documents.query.has_filters():
+            qs = qs.filter(id__in=documents.values('aid_id'))
+
+        text = self.cleaned_data.get('text', None)
+        if text:
+            query = self.parse_query(text)
+            qs = qs.annotate(rank=SearchRank(F('search_vector'), query))
+
+        return qs
+
+    def filter_documents(self, qs):
+        """Filter the `AidSearchDocument` queryset."""
+
         perimeter = self.cleaned_data.get('perimeter', None)
+        zipcode = self.cleaned_data.get('zipcode', None)
         if perimeter:
             qs = self.perimeter_filter(qs, perimeter)
+        elif zipcode:
+            qs = self.zipcode_filter(qs, zipcode)
 
         mobilization_steps = self.cleaned_data.get('mobilization_step', None)
         if mobilization_steps:
@@ -524,9 +550,7 @@ class BaseAidSearchForm(forms.Form):
         text = self.cleaned_data.get('text', None)
         if text:
             query = self.parse_query(text)
-            qs = qs \
-                .filter(search_vector=query) \
-                .annotate(rank=SearchRank(F('search_vector'), query))
+            qs = qs.filter(search_vector=query)
 
         targeted_audiances = self.cleaned_data.get('targeted_audiances', None)
         if targeted_audiances:
@@ -534,7 +558,8 @@ class BaseAidSearchForm(forms.Form):
 
         categories = self.cleaned_data.get('categories', None)
         if categories:
-            qs = qs.filter(categories__in=categories)
+            qs = qs.filter(
+                category_ids__overlap=[category.id for category in categories])
 
         # We filter by theme only if no categories were provided.
         # This is to handle the following edge case: on the multi-step search
@@ -542,12 +567,12 @@ class BaseAidSearchForm(forms.Form):
         # any categories and just click "Search".
         themes = self.cleaned_data.get('themes', None)
         if themes and not categories:
-            qs = qs.filter(categories__theme__in=themes)
+            qs = qs.filter(theme_ids__overlap=[theme.id for theme in themes])
 
         backers = self.cleaned_data.get('backers', None)
         if backers:
             qs = qs.filter(
-                Q(financers__in=backers) | Q(instructors__in=backers))
+                backer_ids__overlap=[backer.id for backer in backers])
 
         return qs
 
@@ -649,29 +674,40 @@ class BaseAidSearchForm(forms.Form):
         # Note: the original way we adressed this was more straightforward,
         # but we got very very bad perf results (like, queries with very slow
         # execution times > 30s).
-        # Thus, we add to "help" a little Postgres execution planner.
-
-        # We just need to efficiently get a list of all perimeter ids related
-        # to the current query.
+        #
+        # We then tried to "help" the Postgres planner with three subqueries
+        # on the `contained_in` table, but the union still got slow for
+        # large perimeters (regions, France…).
+        #
+        # The list of related perimeters is now precomputed, both in memory
+        # and in a closure table.
+        #
+        # For small perimeters, we directly pass the list of related ids.
+        # For wide perimeters (regions, France…) that contain thousands of
+        # communes, a single index lookup in the closure table is cheaper
+        # than a huge `IN` clause.
+        perimeters = related_ids(search_perimeter.id)
+        if len(perimeters) > MAX_INLINE_PERIMETER_IDS:
+            perimeters = PerimeterClosure.objects \
+                .filter(perimeter_id=search_perimeter.id) \
+                .values('related_id')
+
+        qs = qs.filter(perimeter__in=perimeters)
 
-        Through = Perimeter.contained_in.through
-        contains_id = Through.objects \
-            .filter(from_perimeter_id=search_perimeter.id) \
-            .values('to_perimeter_id') \
-            .distinct()
-        contained_id = Through.objects \
-            .filter(to_perimeter_id=search_perimeter.id) \
-            .values('from_perimeter_id') \
-            .distinct()
+        return qs
 
-        q_exact_match = Q(id=search_perimeter.id)
-        q_contains = Q(id__in=contains_id)
-        q_contained = Q(id__in=contained_id)
+    def zipcode_filter(self, qs, zipcode):
+        """Filter queryset depending on the given zipcode.
 
-        perimeter_qs = Perimeter.objects.filter(
-            q_exact_match | q_contains | q_contained).values('id').distinct()
+        The zipcode is resolved to commune perimeters using an in-memory
+        index. Several communes can share the same zipcode, so we return
+        aids related to any of them.
+        """
+        perimeters = set()
+        for commune_id in commune_ids_from_zipcode(zipcode):
+            perimeters |= related_ids(commune_id)
 
-        qs = qs.filter(perimeter__in=perimeter_qs)
+        qs = qs.filter(perimeter__in=perimeters)
 
         return qs
 
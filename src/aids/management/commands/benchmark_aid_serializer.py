@@ -0,0 +1,128 @@
+"""Compare the model and the values-based aid serializers."""
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmark import Rollback
+from aids.api.serializers import AidSerializer, AidValuesSerializer
+from aids.models import Aid
+from backers.models import Backer
+from geofr.models import Perimeter
+
+
+class Command(BaseCommand):
+    """Benchmark the serialization of a page of aids.
+
+    We measure the time needed to fetch and render a page of aids in json,
+    from the list of their ids (which is what the api list view knows).
+
+    With the `--synthetic` option, a fixture of aids is generated first, in a
+    transaction that is rolled back at the end.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', action='store_true',
+            help='Generate a fixture of aids (rolled back afterwards)')
+        parser.add_argument(
+            '--page-size', type=int, default=50,
+            help='Number of aids to serialize')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of runs for each serializer')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['synthetic']:
+                    self.build_fixture(options['page_size'])
+                self.run_benchmark(options['page_size'], options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def build_fixture(self, nb_aids):
+        self.stdout.write('Generating {} aids…'.format(nb_aids))
+        TYPES = Perimeter.TYPES
+        perimeters = Perimeter.objects.bulk_create([
+            Perimeter(scale=TYPES.commune, code='BENCH-{}'.format(i),
+                      name='Bench commune {}'.format(i),
+                      zipcodes=['{:05}'.format(i)])
+            for i in range(10)])
+        backers = Backer.objects.bulk_create([
+            Backer(name='Bench backer {}'.format(i),
+                   slug='bench-backer-{}'.format(i))
+            for i in range(20)])
+
+        aids = Aid.objects.bulk_create([
+            Aid(name='Bench aid {}'.format(i),
+                slug='bench-aid-{}'.format(i),
+                description='Bench aid description ' * 50,
+                eligibility='Bench aid eligibility ' * 20,
+                status='published',
+                recurrence='ongoing',
+                mobilization_steps=['preop', 'op'],
+                targeted_audiances=['commune', 'epci', 'department'],
+                aid_types=['grant', 'technical'],
+                destinations=['investment'],
+                tags=['bench', 'aid'],
+                perimeter=random.choice(perimeters))
+            for i in range(nb_aids)])
+        for aid in aids:
+            aid.financers.set(random.sample(backers, 2))
+            aid.instructors.set(random.sample(backers, 1))
+
+        self.aid_ids = [aid.id for aid in aids]
+
+    def get_aid_ids(self, page_size):
+        if hasattr(self, 'aid_ids'):
+            return self.aid_ids
+
+        return list(Aid.objects
+                    .published()
+                    .order_by('id')
+                    .values_list('id', flat=True)[:page_size])
+
+    def render_with_models(self, aid_ids):
+        aids = Aid.objects \
+            .select_related('perimeter') \
+            .prefetch_related('financers', 'instructors') \
+            .in_bulk(aid_ids)
+        page = [aids[aid_id] for aid_id in aid_ids if aid_id in aids]
+        return JSONRenderer().render(AidSerializer(page, many=True).data)
+
+    def render_with_values(self, aid_ids):
+        return JSONRenderer().render(AidValuesSerializer(aid_ids).data)
+
+    def run_benchmark(self, page_size, repeat):
+        aid_ids = self.get_aid_ids(page_size)
+        self.stdout.write('Serializing {} aids\n'.format(len(aid_ids)))
+
+        renderers = (
+            ('models', self.render_with_models),
+            ('values', self.render_with_values),
+        )
+        outputs = []
+        for name, render in renderers:
+            with CaptureQueriesContext(connection) as queries:
+                outputs.append(render(aid_ids))
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                render(aid_ids)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write('  {:<8} {:>3} queries  {:8.2f}ms'.format(
+                name, len(queries), statistics.median(timings)))
+
+        if outputs[0] == outputs[1]:
+            self.stdout.write(self.style.SUCCESS('Outputs are identical'))
+        else:
+            self.stdout.write(self.style.ERROR('Outputs differ!'))
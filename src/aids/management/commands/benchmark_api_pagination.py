@@ -0,0 +1,125 @@
+"""Compare page number and cursor pagination for the aid api."""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmark import Rollback
+from aids.api.pagination import AidPagination
+from aids.models import Aid
+from geofr.models import Perimeter
+
+
+class Command(BaseCommand):
+    """Benchmark the aid api pagination.
+
+    For both pagination modes, we measure the time needed to fetch pages at
+    increasing depths. Page number pagination cost grows with the page depth
+    (OFFSET scan) and is burdened by a COUNT query, whereas cursor pagination
+    cost should remain constant.
+
+    Only the pagination is measured, since the serialization cost does not
+    depend on the pagination mode.
+
+    With the `--synthetic` option, a fixture of aids is generated first, in a
+    transaction that is rolled back at the end.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', action='store_true',
+            help='Generate a fixture of aids (rolled back afterwards)')
+        parser.add_argument(
+            '--aids', type=int, default=20000,
+            help='Number of aids in the synthetic fixture')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Number of runs for each page number query')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['synthetic']:
+                    self.build_fixture(options['aids'])
+                self.run_benchmark(options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def build_fixture(self, nb_aids):
+        self.stdout.write('Generating {} aids…'.format(nb_aids))
+        TYPES = Perimeter.TYPES
+        perimeters = Perimeter.objects.bulk_create([
+            Perimeter(scale=scale, code='BENCH-{}-{}'.format(scale, i),
+                      name='Bench perimeter {}'.format(i))
+            for i in range(10)
+            for scale in (TYPES.commune, TYPES.department, TYPES.region,
+                          TYPES.country)])
+
+        Aid.objects.bulk_create([
+            Aid(name='Bench aid {}'.format(i),
+                slug='bench-aid-{}'.format(i),
+                description='Bench aid',
+                status='published',
+                recurrence='ongoing',
+                perimeter=perimeters[i % len(perimeters)])
+            for i in range(nb_aids)], batch_size=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def get_queryset(self):
+        """The aid api queryset, without any filter."""
+
+        return Aid.objects \
+            .published() \
+            .open() \
+            .select_related('perimeter') \
+            .order_by('perimeter__scale', 'submission_deadline')
+
+    def paginate(self, params):
+        request = Request(APIRequestFactory().get('/', params))
+        paginator = AidPagination()
+        start = time.perf_counter()
+        paginator.paginate_queryset(self.get_queryset(), request)
+        duration = (time.perf_counter() - start) * 1000
+        return paginator, duration
+
+    def run_benchmark(self, repeat):
+        page_size = AidPagination.page_size
+        nb_pages = max(1, -(-self.get_queryset().count() // page_size))
+        depths = sorted({1, 2, 10, nb_pages // 4, nb_pages // 2, nb_pages})
+        depths = [depth for depth in depths if depth > 0]
+
+        # Walk the whole catalogue with cursors, as a mirroring client would
+        cursor_timings = {}
+        params = {'cursor': ''}
+        page = 1
+        while True:
+            paginator, duration = self.paginate(params)
+            cursor_timings[page] = duration
+            if paginator.next_position is None:
+                break
+            params = {'cursor': paginator.encode_cursor(
+                paginator.next_position)}
+            page += 1
+
+        self.stdout.write('{} pages of {} aids\n'.format(nb_pages, page_size))
+        self.stdout.write('{:>6}  {:>12}  {:>12}'.format(
+            'page', 'page number', 'cursor'))
+        for depth in depths:
+            timings = [
+                self.paginate({'page': depth})[1] for _ in range(repeat)]
+            self.stdout.write('{:>6}  {:>10.2f}ms  {:>10.2f}ms'.format(
+                depth,
+                statistics.median(timings),
+                cursor_timings.get(depth, float('nan'))))
+
+        self.stdout.write(self.style.SUCCESS(
+            'Full cursor walk: {:.0f}ms, median {:.2f}ms per page'.format(
+                sum(cursor_timings.values()),
+                statistics.median(cursor_timings.values()))))
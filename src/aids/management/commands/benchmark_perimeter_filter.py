@@ -0,0 +1,190 @@
+"""Compare the legacy and the closure-based perimeter search filters."""
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core.benchmark import Rollback
+from aids.models import Aid
+from geofr.models import Perimeter, PerimeterClosure
+from geofr.utils import refresh_perimeter_closure
+
+
+def legacy_perimeter_filter(qs, search_perimeter):
+    """The perimeter filter, as it was before the closure table."""
+
+    Through = Perimeter.contained_in.through
+    contains_id = Through.objects \
+        .filter(from_perimeter_id=search_perimeter.id) \
+        .values('to_perimeter_id') \
+        .distinct()
+    contained_id = Through.objects \
+        .filter(to_perimeter_id=search_perimeter.id) \
+        .values('from_perimeter_id') \
+        .distinct()
+
+    q_exact_match = Q(id=search_perimeter.id)
+    q_contains = Q(id__in=contains_id)
+    q_contained = Q(id__in=contained_id)
+
+    perimeter_qs = Perimeter.objects.filter(
+        q_exact_match | q_contains | q_contained).values('id').distinct()
+
+    return qs.filter(perimeter__in=perimeter_qs)
+
+
+def closure_perimeter_filter(qs, search_perimeter):
+    """The current perimeter filter."""
+
+    perimeter_qs = PerimeterClosure.objects \
+        .filter(perimeter_id=search_perimeter.id) \
+        .values('related_id')
+    return qs.filter(perimeter__in=perimeter_qs)
+
+
+class Command(BaseCommand):
+    """Benchmark the search engine perimeter filter.
+
+    By default, the benchmark runs against the existing data. With the
+    `--synthetic` option, a fixture with a realistic number of perimeters
+    (regions, departments, ~35k communes) and aids is generated first. The
+    fixture lives in a transaction that is rolled back at the end.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', action='store_true',
+            help='Generate a realistic fixture (rolled back afterwards)')
+        parser.add_argument(
+            '--communes', type=int, default=35000,
+            help='Number of communes in the synthetic fixture')
+        parser.add_argument(
+            '--aids', type=int, default=5000,
+            help='Number of aids in the synthetic fixture')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of runs for each query')
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Print the query plans')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['synthetic']:
+                    self.build_fixture(options['communes'], options['aids'])
+                self.run_benchmark(options['repeat'], options['explain'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def build_fixture(self, nb_communes, nb_aids):
+        self.stdout.write('Generating {} communes and {} aids…'.format(
+            nb_communes, nb_aids))
+        TYPES = Perimeter.TYPES
+        Link = Perimeter.contained_in.through
+
+        europe = Perimeter.objects.create(
+            scale=TYPES.continent, code='BENCH-EU', name='Bench Europe')
+        france = Perimeter.objects.create(
+            scale=TYPES.country, code='BENCH-FR', name='Bench France')
+        regions = Perimeter.objects.bulk_create([
+            Perimeter(scale=TYPES.region, code='BR{}'.format(i),
+                      name='Bench region {}'.format(i))
+            for i in range(18)])
+        departments = Perimeter.objects.bulk_create([
+            Perimeter(scale=TYPES.department, code='BD{}'.format(i),
+                      name='Bench department {}'.format(i))
+            for i in range(101)])
+        communes = Perimeter.objects.bulk_create([
+            Perimeter(scale=TYPES.commune, code='BC{}'.format(i),
+                      name='Bench commune {}'.format(i))
+            for i in range(nb_communes)], batch_size=2000)
+
+        links = [Link(from_perimeter_id=france.id, to_perimeter_id=europe.id)]
+        department_regions = {}
+        for department in departments:
+            region = random.choice(regions)
+            department_regions[department.id] = region
+            for container in (region, france, europe):
+                links.append(Link(
+                    from_perimeter_id=department.id,
+                    to_perimeter_id=container.id))
+        for region in regions:
+            for container in (france, europe):
+                links.append(Link(
+                    from_perimeter_id=region.id,
+                    to_perimeter_id=container.id))
+        for commune in communes:
+            department = random.choice(departments)
+            region = department_regions[department.id]
+            for container in (department, region, france, europe):
+                links.append(Link(
+                    from_perimeter_id=commune.id,
+                    to_perimeter_id=container.id))
+        Link.objects.bulk_create(links, batch_size=5000)
+        refresh_perimeter_closure()
+
+        all_perimeters = [europe, france] + regions + departments + communes
+        Aid.objects.bulk_create([
+            Aid(name='Bench aid {}'.format(i),
+                slug='bench-aid-{}'.format(i),
+                description='Bench aid',
+                status='published',
+                recurrence='ongoing',
+                perimeter=random.choice(all_perimeters))
+            for i in range(nb_aids)], batch_size=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.perimeters = {
+            'country': france,
+            'region': regions[0],
+            'department': departments[0],
+            'commune': communes[0],
+        }
+
+    def get_perimeters(self):
+        if hasattr(self, 'perimeters'):
+            return self.perimeters
+
+        perimeters = {}
+        for scale in ('country', 'region', 'department', 'commune'):
+            perimeter = Perimeter.objects \
+                .filter(scale=getattr(Perimeter.TYPES, scale)) \
+                .order_by('id') \
+                .first()
+            if perimeter:
+                perimeters[scale] = perimeter
+        return perimeters
+
+    def run_benchmark(self, repeat, explain):
+        base_qs = Aid.objects \
+            .published() \
+            .open() \
+            .order_by('perimeter__scale', 'submission_deadline')
+
+        filters = (
+            ('legacy', legacy_perimeter_filter),
+            ('closure', closure_perimeter_filter),
+        )
+        for scale, perimeter in self.get_perimeters().items():
+            self.stdout.write('\n{} ({})'.format(perimeter.name, scale))
+            for name, perimeter_filter in filters:
+                qs = perimeter_filter(base_qs, perimeter).distinct()
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    nb_aids = qs.values('id').order_by('id').count()
+                    list(qs[:18])
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                self.stdout.write('  {:<8} {:>6} aids  {:8.2f}ms'.format(
+                    name, nb_aids, statistics.median(timings)))
+                if explain:
+                    self.stdout.write(qs.explain(analyze=True))
@@ -0,0 +1,38 @@
+import gzip
+import os
+
+from django.core.management.base import BaseCommand
+
+from aids.api.export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    """Export all published and open aids to a gzipped file.
+
+    This is the same export as the `/api/aids/export.<format>` endpoint,
+    meant to be published on the open-data portal.
+
+    The file is written next to its final destination, then renamed, so the
+    previous export stays available until the new one is complete.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', type=str,
+            help='Path of the file to write, e.g aides.jsonl.gz')
+        parser.add_argument(
+            '--format', dest='export_format', choices=EXPORT_FORMATS.keys(),
+            default='jsonl')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        tmp_output = '{}.tmp'.format(output)
+        nb_lines = 0
+        with gzip.open(tmp_output, 'wt', encoding='utf-8', newline='') as f:
+            for line in iter_export(options['export_format']):
+                f.write(line)
+                nb_lines += 1
+        os.replace(tmp_output, output)
+
+        self.stdout.write(self.style.SUCCESS(
+            '{} lines written to {}'.format(nb_lines, output)))
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from aids.models import Aid
+
+
+UPDATE_SQL = '''
+    UPDATE {aid}
+    SET search_vector = aids_aid_search_vector({aid})
+    WHERE id >= %s AND id < %s
+'''
+
+
+class Command(BaseCommand):
+    """Recompute the full text search vector of all aids.
+
+    Vectors are maintained by db triggers (see the
+    `0111_search_vector_triggers` migration), so this command is only
+    needed after the vector definition is modified, or to repair data.
+
+    Aids are updated in batches (ranges of ids), each batch in its own short
+    transaction, so concurrent edits are never blocked for long. Since the
+    vector is computed by the `UPDATE` statement itself, a concurrent edit
+    of a row is either waited for or followed by the trigger, and the
+    resulting vector is always up to date.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of ids in every batch')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of batches updated in parallel')
+
+    def handle(self, *args, **options):
+        bounds = Aid.objects.aggregate(min_id=Min('id'), max_id=Max('id'))
+        if bounds['min_id'] is None:
+            self.stdout.write('No aids to update')
+            return
+
+        batch_size = options['batch_size']
+        ranges = [
+            (start, start + batch_size)
+            for start in range(bounds['min_id'], bounds['max_id'] + 1,
+                               batch_size)]
+
+        # With a single worker, we stay in the current thread (and the
+        # current db connection).
+        if options['workers'] <= 1:
+            results = (self.update_batch(*batch) for batch in ranges)
+            self.report_progress(results, len(ranges))
+            return
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                executor.submit(self.update_batch_in_thread, *batch)
+                for batch in ranges]
+            results = (future.result() for future in as_completed(futures))
+            self.report_progress(results, len(ranges))
+
+    def update_batch(self, start, end):
+        """Update the vectors of aids with ids in [start, end)."""
+
+        sql = UPDATE_SQL.format(aid=Aid._meta.db_table)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [start, end])
+                return cursor.rowcount
+
+    def update_batch_in_thread(self, start, end):
+        try:
+            return self.update_batch(start, end)
+        finally:
+            # Every thread has its own db connection
+            connection.close()
+
+    def report_progress(self, results, nb_batches):
+        nb_updated = 0
+        for nb_done, nb_aids in enumerate(results, start=1):
+            nb_updated += nb_aids
+            self.stdout.write('{}/{} batches, {} aids updated'.format(
+                nb_done, nb_batches, nb_updated))
+
+        self.stdout.write(self.style.SUCCESS(
+            '{} search vectors rebuilt'.format(nb_updated)))
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aids', '0108_auto_20200615_1055'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aid',
+            index=models.Index(fields=['date_updated', 'id'], name='aids_aid_date_up_fe1995_idx'),
+        ),
+    ]
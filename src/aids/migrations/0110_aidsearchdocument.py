@@ -0,0 +1,110 @@
+# Generated by Django 2.2.28 on 2026-10-18 08:47
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BUILD_DOCUMENTS_SQL = '''
+    INSERT INTO aids_aidsearchdocument (
+        aid_id, perimeter_id, perimeter_scale, backer_ids, category_ids,
+        theme_ids, targeted_audiances, aid_types, mobilization_steps,
+        destinations, submission_deadline, is_call_for_project,
+        search_vector)
+    SELECT
+        aid.id,
+        aid.perimeter_id,
+        perimeter.scale,
+        ARRAY(
+            SELECT backer_id FROM aids_aid_financers WHERE aid_id = aid.id
+            UNION
+            SELECT backer_id FROM aids_aid_instructors WHERE aid_id = aid.id),
+        ARRAY(
+            SELECT category_id FROM aids_aid_categories
+            WHERE aid_id = aid.id),
+        ARRAY(
+            SELECT DISTINCT category.theme_id
+            FROM aids_aid_categories aid_category
+            JOIN categories_category category
+            ON category.id = aid_category.category_id
+            WHERE aid_category.aid_id = aid.id),
+        COALESCE(aid.targeted_audiances, '{}'),
+        COALESCE(aid.aid_types, '{}'),
+        COALESCE(aid.mobilization_steps, '{}'),
+        COALESCE(aid.destinations, '{}'),
+        aid.submission_deadline,
+        aid.is_call_for_project,
+        aid.search_vector
+    FROM aids_aid aid
+    LEFT JOIN geofr_perimeter perimeter ON perimeter.id = aid.perimeter_id
+    WHERE aid.status = 'published'
+'''
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geofr', '0005_remove_perimeter_commune'),
+        ('aids', '0109_auto_20261018_1019'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AidSearchDocument',
+            fields=[
+                ('aid', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='aids.Aid', verbose_name='Aid')),
+                ('perimeter_scale', models.PositiveIntegerField(null=True, verbose_name='Perimeter scale')),
+                ('backer_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None, verbose_name='Financers and instructors')),
+                ('category_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None, verbose_name='Categories')),
+                ('theme_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None, verbose_name='Themes')),
+                ('targeted_audiances', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=32), default=list, size=None, verbose_name='Targeted audiances')),
+                ('aid_types', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=32), default=list, size=None, verbose_name='Aid types')),
+                ('mobilization_steps', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=32), default=list, size=None, verbose_name='Mobilization step')),
+                ('destinations', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=32), default=list, size=None, verbose_name='Destinations')),
+                ('submission_deadline', models.DateField(null=True, verbose_name='Submission deadline')),
+                ('is_call_for_project', models.BooleanField(null=True, verbose_name='Call for project / Call for expressions of interest')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True, verbose_name='Search vector')),
+                ('perimeter', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='geofr.Perimeter', verbose_name='Perimeter')),
+            ],
+            options={
+                'verbose_name': 'Aid search document',
+                'verbose_name_plural': 'Aid search documents',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['backer_ids'], name='aids_aidsea_backer__59a4d4_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['category_ids'], name='aids_aidsea_categor_d28e99_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['theme_ids'], name='aids_aidsea_theme_i_9545cc_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['targeted_audiances'], name='aids_aidsea_targete_65a5f7_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['aid_types'], name='aids_aidsea_aid_typ_8f2a30_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['mobilization_steps'], name='aids_aidsea_mobiliz_cd549c_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['destinations'], name='aids_aidsea_destina_d74fea_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='aidsearchdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='aids_aidsea_search__681cca_gin'),
+        ),
+        migrations.RunSQL(
+            BUILD_DOCUMENTS_SQL,
+            'DELETE FROM aids_aidsearchdocument'),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:02
+
+from django.db import migrations
+
+
+# The search vector is computed from the aid text fields, and from the names
+# of the financers and instructors.
+CREATE_FUNCTIONS_SQL = '''
+    CREATE OR REPLACE FUNCTION aids_aid_search_vector(aid aids_aid)
+    RETURNS tsvector AS $$
+        SELECT
+            setweight(to_tsvector('french', COALESCE(aid.name, '')), 'A') ||
+            setweight(
+                to_tsvector('french', COALESCE(aid.eligibility, '')), 'D') ||
+            setweight(
+                to_tsvector('french', COALESCE(aid.description, '')), 'B') ||
+            setweight(
+                to_tsvector(
+                    'french',
+                    COALESCE(array_to_string(aid.tags, ' '), '')),
+                'A') ||
+            setweight(to_tsvector('french', COALESCE((
+                SELECT string_agg(backer.name, ' ' ORDER BY financer.id)
+                FROM aids_aid_financers financer
+                JOIN backers_backer backer
+                ON backer.id = financer.backer_id
+                WHERE financer.aid_id = aid.id), '')), 'D') ||
+            setweight(to_tsvector('french', COALESCE((
+                SELECT string_agg(backer.name, ' ' ORDER BY instructor.id)
+                FROM aids_aid_instructors instructor
+                JOIN backers_backer backer
+                ON backer.id = instructor.backer_id
+                WHERE instructor.aid_id = aid.id), '')), 'D')
+    $$ LANGUAGE SQL STABLE;
+
+    -- Compute the vector every time the aid text is modified
+    CREATE OR REPLACE FUNCTION aids_aid_set_search_vector()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := aids_aid_search_vector(NEW);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    -- Recompute the vector of aids whose backers were modified
+    CREATE OR REPLACE FUNCTION aids_aid_backers_changed()
+    RETURNS trigger AS $$
+    DECLARE
+        changed_aid_id integer;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed_aid_id := OLD.aid_id;
+        ELSE
+            changed_aid_id := NEW.aid_id;
+        END IF;
+
+        UPDATE aids_aid
+        SET search_vector = aids_aid_search_vector(aids_aid)
+        WHERE id = changed_aid_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    -- Recompute the vector of aids related to a renamed backer
+    CREATE OR REPLACE FUNCTION aids_backer_renamed()
+    RETURNS trigger AS $$
+    BEGIN
+        UPDATE aids_aid
+        SET search_vector = aids_aid_search_vector(aids_aid)
+        WHERE id IN (
+            SELECT aid_id FROM aids_aid_financers WHERE backer_id = NEW.id
+            UNION
+            SELECT aid_id FROM aids_aid_instructors WHERE backer_id = NEW.id);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    -- Keep the search document copy of the vector in sync
+    -- (the vector may be modified by the previous trigger, so this one must
+    -- not be restricted to updates of the `search_vector` column)
+    CREATE OR REPLACE FUNCTION aids_aid_search_vector_changed()
+    RETURNS trigger AS $$
+    BEGIN
+        UPDATE aids_aidsearchdocument
+        SET search_vector = NEW.search_vector
+        WHERE aid_id = NEW.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+'''
+
+CREATE_TRIGGERS_SQL = '''
+    CREATE TRIGGER aids_aid_set_search_vector
+    BEFORE INSERT OR UPDATE OF name, eligibility, description, tags
+    ON aids_aid
+    FOR EACH ROW EXECUTE PROCEDURE aids_aid_set_search_vector();
+
+    CREATE TRIGGER aids_aid_financers_changed
+    AFTER INSERT OR UPDATE OR DELETE ON aids_aid_financers
+    FOR EACH ROW EXECUTE PROCEDURE aids_aid_backers_changed();
+
+    CREATE TRIGGER aids_aid_instructors_changed
+    AFTER INSERT OR UPDATE OR DELETE ON aids_aid_instructors
+    FOR EACH ROW EXECUTE PROCEDURE aids_aid_backers_changed();
+
+    CREATE TRIGGER aids_backer_renamed
+    AFTER UPDATE OF name ON backers_backer
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE PROCEDURE aids_backer_renamed();
+
+    CREATE TRIGGER aids_aid_search_vector_changed
+    AFTER UPDATE ON aids_aid
+    FOR EACH ROW WHEN (OLD.search_vector IS DISTINCT FROM NEW.search_vector)
+    EXECUTE PROCEDURE aids_aid_search_vector_changed();
+'''
+
+UPDATE_VECTORS_SQL = '''
+    UPDATE aids_aid SET search_vector = aids_aid_search_vector(aids_aid);
+'''
+
+DROP_SQL = '''
+    DROP TRIGGER IF EXISTS aids_aid_set_search_vector ON aids_aid;
+    DROP TRIGGER IF EXISTS aids_aid_financers_changed ON aids_aid_financers;
+    DROP TRIGGER IF EXISTS aids_aid_instructors_changed
+        ON aids_aid_instructors;
+    DROP TRIGGER IF EXISTS aids_backer_renamed ON backers_backer;
+    DROP TRIGGER IF EXISTS aids_aid_search_vector_changed ON aids_aid;
+    DROP FUNCTION IF EXISTS aids_aid_set_search_vector();
+    DROP FUNCTION IF EXISTS aids_aid_backers_changed();
+    DROP FUNCTION IF EXISTS aids_backer_renamed();
+    DROP FUNCTION IF EXISTS aids_aid_search_vector_changed();
+    DROP FUNCTION IF EXISTS aids_aid_search_vector(aids_aid);
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aids', '0110_aidsearchdocument'),
+        ('backers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CREATE_FUNCTIONS_SQL + CREATE_TRIGGERS_SQL + UPDATE_VECTORS_SQL,
+            DROP_SQL),
+    ]
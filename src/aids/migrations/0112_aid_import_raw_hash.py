@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aids', '0111_search_vector_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aid',
+            name='import_raw_hash',
+            field=models.CharField(blank=True, help_text='Used to detect upstream modifications.', max_length=64, null=True, verbose_name='Hash of the imported raw data'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:40
+
+from django.db import migrations
+
+
+# Public queries only concern live aids (published and not amendments, see
+# `Aid.objects.published()`), so the indexes are restricted to those rows.
+# Django 2.2 does not support partial indexes, hence the raw SQL.
+LIVE_AIDS = "status = 'published' AND NOT is_amendment"
+
+CREATE_INDEXES_SQL = '''
+    -- Open aids with a deadline, and sort by deadline
+    CREATE INDEX aids_aid_live_deadline_idx
+    ON aids_aid (submission_deadline, id)
+    WHERE {live};
+
+    -- Open aids without a deadline
+    CREATE INDEX aids_aid_live_ongoing_idx
+    ON aids_aid (id)
+    WHERE {live} AND recurrence = 'ongoing';
+
+    -- Sort by publication date
+    CREATE INDEX aids_aid_live_published_idx
+    ON aids_aid (date_published DESC, id)
+    WHERE {live};
+'''.format(live=LIVE_AIDS)
+
+DROP_INDEXES_SQL = '''
+    DROP INDEX IF EXISTS aids_aid_live_deadline_idx;
+    DROP INDEX IF EXISTS aids_aid_live_ongoing_idx;
+    DROP INDEX IF EXISTS aids_aid_live_published_idx;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aids', '0112_aid_import_raw_hash'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEXES_SQL, DROP_INDEXES_SQL),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:20
+
+from django.db import migrations
+
+
+# Row level triggers on the backer link tables recomputed the search vector
+# of an aid for every inserted link, and every aid update fired the search
+# document trigger again. Bulk imports insert thousands of links in a single
+# statement, so the links are now handled per statement, using transition
+# tables, and every modified aid is updated once.
+#
+# Transition tables can't be used by triggers with several events, hence the
+# separate insert, update and delete triggers.
+CREATE_FUNCTION_SQL = '''
+    CREATE OR REPLACE FUNCTION aids_aid_backers_changed()
+    RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE aids_aid
+            SET search_vector = aids_aid_search_vector(aids_aid)
+            WHERE id IN (SELECT DISTINCT aid_id FROM new_rows);
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE aids_aid
+            SET search_vector = aids_aid_search_vector(aids_aid)
+            WHERE id IN (SELECT DISTINCT aid_id FROM old_rows);
+        ELSE
+            UPDATE aids_aid
+            SET search_vector = aids_aid_search_vector(aids_aid)
+            WHERE id IN (
+                SELECT aid_id FROM new_rows
+                UNION
+                SELECT aid_id FROM old_rows);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+'''
+
+CREATE_TRIGGERS_SQL = '''
+    DROP TRIGGER IF EXISTS aids_aid_{relation}_changed ON aids_aid_{relation};
+
+    CREATE TRIGGER aids_aid_{relation}_inserted
+    AFTER INSERT ON aids_aid_{relation}
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE aids_aid_backers_changed();
+
+    CREATE TRIGGER aids_aid_{relation}_updated
+    AFTER UPDATE ON aids_aid_{relation}
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE aids_aid_backers_changed();
+
+    CREATE TRIGGER aids_aid_{relation}_deleted
+    AFTER DELETE ON aids_aid_{relation}
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE aids_aid_backers_changed();
+'''
+
+# Restore the row level triggers of the previous migration
+DROP_FUNCTION_SQL = '''
+    CREATE OR REPLACE FUNCTION aids_aid_backers_changed()
+    RETURNS trigger AS $$
+    DECLARE
+        changed_aid_id integer;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            changed_aid_id := OLD.aid_id;
+        ELSE
+            changed_aid_id := NEW.aid_id;
+        END IF;
+
+        UPDATE aids_aid
+        SET search_vector = aids_aid_search_vector(aids_aid)
+        WHERE id = changed_aid_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+'''
+
+DROP_TRIGGERS_SQL = '''
+    DROP TRIGGER IF EXISTS aids_aid_{relation}_inserted ON aids_aid_{relation};
+    DROP TRIGGER IF EXISTS aids_aid_{relation}_updated ON aids_aid_{relation};
+    DROP TRIGGER IF EXISTS aids_aid_{relation}_deleted ON aids_aid_{relation};
+
+    CREATE TRIGGER aids_aid_{relation}_changed
+    AFTER INSERT OR UPDATE OR DELETE ON aids_aid_{relation}
+    FOR EACH ROW EXECUTE PROCEDURE aids_aid_backers_changed();
+'''
+
+RELATIONS = ('financers', 'instructors')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aids', '0113_live_aids_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CREATE_FUNCTION_SQL + ''.join(
+                CREATE_TRIGGERS_SQL.format(relation=relation)
+                for relation in RELATIONS),
+            ''.join(
+                DROP_TRIGGERS_SQL.format(relation=relation)
+                for relation in RELATIONS) + DROP_FUNCTION_SQL),
+    ]
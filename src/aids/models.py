@@ -2,9 +2,9 @@ from uuid import uuid4
 from datetime import timedelta
 
 from django.db import models
-from django.db.models import Q, Value
+from django.db.models import Q
 from django.contrib.postgres.fields import ArrayField
-from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.postgres.indexes import GinIndex
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _, pgettext_lazy
@@ -55,6 +55,9 @@ class AidQuerySet(models.QuerySet):
           - the submission deadline is not provided OR
           - the recurrence field is set to "ongoing"
 
+        Every condition matches a partial index on published aids (see the
+        `0113_live_aids_indexes` migration), so the planner can combine
+        index scans instead of reading the whole table.
         """
 
         today = timezone.now().date()
@@ -388,6 +391,11 @@ class Aid(xwf_models.WorkflowEnabled, models.Model):
     import_last_access = models.DateField(
         _('Date of the latest access'),
         null=True, blank=True)
+    import_raw_hash = models.CharField(
+        _('Hash of the imported raw data'),
+        max_length=64,
+        null=True, blank=True,
+        help_text=_('Used to detect upstream modifications.'))
 
     # This field is used to index searchable text content
     search_vector = SearchVectorField(
@@ -438,6 +446,7 @@ class Aid(xwf_models.WorkflowEnabled, models.Model):
         verbose_name_plural = _('Aids')
         indexes = [
             GinIndex(fields=['search_vector']),
+            models.Index(fields=['date_updated', 'id']),
         ]
 
     def set_slug(self):
@@ -458,52 +467,6 @@ class Aid(xwf_models.WorkflowEnabled, models.Model):
         if self.is_published() and self.date_published is None:
             self.date_published = timezone.now()
 
-    def set_search_vector(self, financers=None, instructors=None):
-        """Update the full text cache field."""
-
-        # Note: we use `SearchVector(Value(self.field))` instead of
-        # `SearchVector('field')` because the latter only works for updates,
-        # not when inserting new records.
-        #
-        # Note 2: we have to pass the financers parameter instead of using
-        # `self.financers.all()` because that last expression would not work
-        # during an object creation.
-        search_vector = \
-            SearchVector(
-                Value(self.name, output_field=models.CharField()),
-                weight='A',
-                config='french') + \
-            SearchVector(
-                Value(self.eligibility, output_field=models.CharField()),
-                weight='D',
-                config='french') + \
-            SearchVector(
-                Value(self.description, output_field=models.CharField()),
-                weight='B',
-                config='french') + \
-            SearchVector(
-                Value(' '.join(self.tags), output_field=models.CharField()),
-                weight='A',
-                config='french')
-
-        if financers:
-            search_vector += SearchVector(
-                Value(
-                    ' '.join(str(backer) for backer in financers),
-                    output_field=models.CharField()),
-                weight='D',
-                config='french')
-
-        if instructors:
-            search_vector += SearchVector(
-                Value(
-                    ' '.join(str(backer) for backer in instructors),
-                    output_field=models.CharField()),
-                weight='D',
-                config='french')
-
-        self.search_vector = search_vector
-
     def populate_tags(self):
         """Populates the `_tags_m2m` field.
 
@@ -594,3 +557,86 @@ class Aid(xwf_models.WorkflowEnabled, models.Model):
     def is_live(self):
         """True if the aid must be displayed on the site."""
         return self.is_published() and not self.has_expired()
+
+
+class AidSearchDocument(models.Model):
+    """Denormalized search data of a published aid.
+
+    Search filters concern many related tables (perimeters, backers,
+    categories and themes). Joining all of them multiplies the result rows,
+    hence the search query requires a costly `DISTINCT` clause.
+
+    Instead, we store one row per published aid, with the ids of related
+    objects stored in arrays, so the search filters are applied on a single
+    table.
+
+    This table is derived from the aids and must never be edited by hand.
+    See `aids.search_documents.refresh_search_documents`.
+    """
+
+    aid = models.OneToOneField(
+        'Aid',
+        verbose_name=_('Aid'),
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='search_document')
+    perimeter = models.ForeignKey(
+        'geofr.Perimeter',
+        verbose_name=_('Perimeter'),
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='+')
+    perimeter_scale = models.PositiveIntegerField(
+        _('Perimeter scale'),
+        null=True)
+    backer_ids = ArrayField(
+        models.IntegerField(),
+        verbose_name=_('Financers and instructors'),
+        default=list)
+    category_ids = ArrayField(
+        models.IntegerField(),
+        verbose_name=_('Categories'),
+        default=list)
+    theme_ids = ArrayField(
+        models.IntegerField(),
+        verbose_name=_('Themes'),
+        default=list)
+    targeted_audiances = ArrayField(
+        models.CharField(max_length=32),
+        verbose_name=_('Targeted audiances'),
+        default=list)
+    aid_types = ArrayField(
+        models.CharField(max_length=32),
+        verbose_name=_('Aid types'),
+        default=list)
+    mobilization_steps = ArrayField(
+        models.CharField(max_length=32),
+        verbose_name=_('Mobilization step'),
+        default=list)
+    destinations = ArrayField(
+        models.CharField(max_length=32),
+        verbose_name=_('Destinations'),
+        default=list)
+    submission_deadline = models.DateField(
+        _('Submission deadline'),
+        null=True)
+    is_call_for_project = models.BooleanField(
+        _('Call for project / Call for expressions of interest'),
+        null=True)
+    search_vector = SearchVectorField(
+        _('Search vector'),
+        null=True)
+
+    class Meta:
+        verbose_name = _('Aid search document')
+        verbose_name_plural = _('Aid search documents')
+        indexes = [
+            GinIndex(fields=['backer_ids']),
+            GinIndex(fields=['category_ids']),
+            GinIndex(fields=['theme_ids']),
+            GinIndex(fields=['targeted_audiances']),
+            GinIndex(fields=['aid_types']),
+            GinIndex(fields=['mobilization_steps']),
+            GinIndex(fields=['destinations']),
+            GinIndex(fields=['search_vector']),
+        ]
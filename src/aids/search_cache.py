@@ -0,0 +1,155 @@
+"""Cross-request cache for search engine results.
+
+Most searches are repeated over and over (the same perimeter with the same
+few filters), and a single search requires a costly query (text ranking,
+perimeter filtering, counting). Hence, we cache the ordered list of matching
+aid ids, and we only fetch the full aid objects of the displayed page.
+
+Cache keys are built from the canonical form of the search parameters (so
+`?categories=a&categories=b` and `?categories=b&categories=a` share the same
+entry), the current date (since aids expire) and two version stamps:
+
+ - the search stamp, that is bumped every time an aid is modified (see
+   `aids.signals`);
+ - the perimeter graph stamp, that is bumped every time the perimeter
+   hierarchy is modified (see `geofr.graph`);
+ - for zipcode searches only, the zipcode index stamp, that is bumped every
+   time a perimeter is modified (see `geofr.zipcodes`).
+"""
+
+import hashlib
+import json
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model, QuerySet
+from django.utils import timezone
+
+from core.cache import get_stamp, bump_stamp
+from geofr import graph, zipcodes
+
+
+SEARCH_STAMP_CACHE_KEY = 'aids:search_stamp'
+
+# Form fields that have no impact on search results
+IGNORED_FIELDS = ('integration',)
+
+# Number of aids to fetch at once when iterating over cached results
+ITERATION_CHUNK_SIZE = 100
+
+
+def invalidate_search_cache():
+    """Make sure all cached search results will be recomputed.
+
+    The cache is invalidated again once the current transaction is commited,
+    otherwise a concurrent search could store results computed from the
+    previous db state.
+    """
+    bump_stamp(SEARCH_STAMP_CACHE_KEY)
+    transaction.on_commit(lambda: bump_stamp(SEARCH_STAMP_CACHE_KEY))
+
+
+def normalize_value(value):
+    """Return a json serializable and order-independant version of a value."""
+
+    if isinstance(value, Model):
+        return value.pk
+
+    if isinstance(value, (QuerySet, list, tuple, set, frozenset)):
+        return sorted((normalize_value(item) for item in value), key=str)
+
+    if isinstance(value, date):
+        return value.isoformat()
+
+    return value
+
+
+def normalize_search_data(cleaned_data):
+    """Return the canonical version of search parameters.
+
+    Empty values are dropped, since they have no impact on the results.
+    """
+    normalized = {}
+    for name, value in cleaned_data.items():
+        if name in IGNORED_FIELDS:
+            continue
+
+        value = normalize_value(value)
+        if value is None or value is False or value in ('', []):
+            continue
+
+        normalized[name] = value
+    return normalized
+
+
+def get_search_cache_key(form, namespace):
+    """Return the cache key of a search.
+
+    The `namespace` parameter distinguishes searches with the same
+    parameters but that return different results (e.g different base
+    querysets or order).
+    """
+    search_data = normalize_search_data(getattr(form, 'cleaned_data', {}))
+    serialized = json.dumps(search_data, sort_keys=True, default=str)
+    digest = hashlib.sha1(serialized.encode()).hexdigest()
+    stamps = [
+        get_stamp(SEARCH_STAMP_CACHE_KEY),
+        graph.perimeter_graph.get_version()]
+    if 'zipcode' in search_data:
+        stamps.append(zipcodes.zipcode_index.get_version())
+    return 'aids:search:{}:{}:{}:{}'.format(
+        namespace,
+        timezone.now().date().isoformat(),
+        ':'.join(stamps),
+        digest)
+
+
+def get_cached_aid_ids(form, qs, namespace):
+    """Return the ordered list of ids of aids matching the search.
+
+    `qs` is the fully filtered and ordered queryset. It is only evaluated if
+    results are not found in the cache.
+    """
+    cache_key = get_search_cache_key(form, namespace)
+    aid_ids = cache.get(cache_key)
+    if aid_ids is None:
+        aid_ids = list(qs.values_list('id', flat=True))
+        cache.set(cache_key, aid_ids, settings.SEARCH_CACHE_TIMEOUT)
+    return aid_ids
+
+
+class CachedSearchResults:
+    """A lazy, list-like sequence of aids.
+
+    Only the (cached) list of ids is known beforehand. Aid objects are only
+    fetched from the db when the sequence is sliced, e.g by a paginator.
+    """
+
+    def __init__(self, aid_ids, queryset):
+        self.aid_ids = aid_ids
+        self.queryset = queryset
+        self.model = queryset.model
+
+    def count(self):
+        return len(self.aid_ids)
+
+    def __len__(self):
+        return len(self.aid_ids)
+
+    def __bool__(self):
+        return bool(self.aid_ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            aid_ids = self.aid_ids[key]
+            aids = self.queryset.in_bulk(aid_ids)
+            return [aids[aid_id] for aid_id in aid_ids if aid_id in aids]
+
+        aid_id = self.aid_ids[key]
+        return self.queryset.get(id=aid_id)
+
+    def __iter__(self):
+        for start in range(0, len(self.aid_ids), ITERATION_CHUNK_SIZE):
+            yield from self[start:start + ITERATION_CHUNK_SIZE]
@@ -0,0 +1,114 @@
+"""Maintenance of the `AidSearchDocument` table.
+
+Documents are refreshed when an aid is saved, when its backers or
+categories are modified, when a category is saved, when a backer or a
+category is deleted (see `aids.signals`), and after bulk updates (admin
+actions, imports), that don't send any signal.
+"""
+
+from django.db import connection, transaction
+
+from aids.models import Aid, AidSearchDocument
+from categories.models import Category
+from geofr.models import Perimeter
+
+
+DOCUMENT_FIELDS = (
+    'perimeter_id', 'perimeter_scale', 'backer_ids', 'category_ids',
+    'theme_ids', 'targeted_audiances', 'aid_types', 'mobilization_steps',
+    'destinations', 'submission_deadline', 'is_call_for_project',
+    'search_vector',
+)
+
+
+def get_related_aid_ids(through, instance):
+    """Return the ids of the aids linked to `instance` through an m2m table.
+
+    `through` is the through model of an aid relation (e.g
+    `Aid.financers.through`), and `instance` a backer or a category.
+    """
+    field = next(
+        field for field in through._meta.get_fields()
+        if field.is_relation and field.related_model is type(instance))
+    aid_ids = through.objects \
+        .filter(**{field.name: instance.pk}) \
+        .values_list('aid_id', flat=True)
+    return set(aid_ids)
+
+
+@transaction.atomic
+def refresh_search_documents(aid_ids=None):
+    """Update the `AidSearchDocument` table from the aids.
+
+    If `aid_ids` is None, the whole table is rebuilt. Otherwise, only the
+    documents of the given aids are recomputed.
+
+    Documents of aids that are not published anymore are deleted.
+    """
+    if aid_ids is None:
+        delete_where = 'TRUE'
+        insert_where = 'TRUE'
+        params = []
+    else:
+        ids = list(aid_ids)
+        if not ids:
+            return
+
+        delete_where = 'aid_id = ANY(%s)'
+        insert_where = 'aid.id = ANY(%s)'
+        params = [ids]
+
+    tables = {
+        'document': AidSearchDocument._meta.db_table,
+        'aid': Aid._meta.db_table,
+        'perimeter': Perimeter._meta.db_table,
+        'category': Category._meta.db_table,
+        'financers': Aid.financers.through._meta.db_table,
+        'instructors': Aid.instructors.through._meta.db_table,
+        'categories': Aid.categories.through._meta.db_table,
+    }
+
+    delete_sql = '''
+        DELETE FROM {document}
+        WHERE {where} AND aid_id NOT IN (
+            SELECT id FROM {aid} WHERE status = 'published')
+    '''.format(where=delete_where, **tables)
+    insert_sql = '''
+        INSERT INTO {document} (aid_id, {fields})
+        SELECT
+            aid.id,
+            aid.perimeter_id,
+            perimeter.scale,
+            ARRAY(
+                SELECT backer_id FROM {financers} WHERE aid_id = aid.id
+                UNION
+                SELECT backer_id FROM {instructors} WHERE aid_id = aid.id),
+            ARRAY(
+                SELECT category_id FROM {categories} WHERE aid_id = aid.id),
+            ARRAY(
+                SELECT DISTINCT category.theme_id
+                FROM {categories} aid_category
+                JOIN {category} category
+                ON category.id = aid_category.category_id
+                WHERE aid_category.aid_id = aid.id),
+            COALESCE(aid.targeted_audiances, '{{}}'),
+            COALESCE(aid.aid_types, '{{}}'),
+            COALESCE(aid.mobilization_steps, '{{}}'),
+            COALESCE(aid.destinations, '{{}}'),
+            aid.submission_deadline,
+            aid.is_call_for_project,
+            aid.search_vector
+        FROM {aid} aid
+        LEFT JOIN {perimeter} perimeter ON perimeter.id = aid.perimeter_id
+        WHERE aid.status = 'published' AND {where}
+        ON CONFLICT (aid_id) DO UPDATE SET {updates}
+    '''.format(
+        fields=', '.join(DOCUMENT_FIELDS),
+        updates=', '.join(
+            '{0} = EXCLUDED.{0}'.format(field) for field in DOCUMENT_FIELDS),
+        where=insert_where,
+        **tables)
+
+    with connection.cursor() as cursor:
+        cursor.execute(delete_sql, params)
+        cursor.execute(insert_sql, params)
@@ -0,0 +1,113 @@
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete, m2m_changed)
+from django.dispatch import receiver
+
+from aids.models import Aid
+from aids.search_cache import invalidate_search_cache
+from aids.search_documents import (
+    get_related_aid_ids, refresh_search_documents)
+from backers.models import Backer
+from categories.models import Category
+
+
+# The aid relations that are denormalized in search documents
+AID_RELATIONS = {
+    Backer: (Aid.financers.through, Aid.instructors.through),
+    Category: (Aid.categories.through,),
+}
+
+
+@receiver(post_save, sender=Aid)
+@receiver(post_delete, sender=Aid)
+def invalidate_search_cache_on_aid_change(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_search_cache()
+
+
+@receiver(m2m_changed, sender=Aid.categories.through)
+@receiver(m2m_changed, sender=Aid.financers.through)
+@receiver(m2m_changed, sender=Aid.instructors.through)
+def invalidate_search_cache_on_aid_relation_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_search_cache()
+
+
+@receiver(post_save, sender=Aid)
+def refresh_search_document_on_aid_save(sender, instance, raw=False,
+                                        **kwargs):
+    if not raw:
+        refresh_search_documents([instance.pk])
+
+
+@receiver(m2m_changed, sender=Aid.categories.through)
+@receiver(m2m_changed, sender=Aid.financers.through)
+@receiver(m2m_changed, sender=Aid.instructors.through)
+def refresh_search_documents_on_aid_relation_change(
+        sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_search_documents([instance.pk])
+
+    elif action == 'pre_clear':
+        # All the aids of a backer or a category are about to be removed,
+        # and we won't know which ones once it's done
+        instance._cleared_aid_ids = get_related_aid_ids(sender, instance)
+
+    elif action == 'post_clear':
+        aid_ids = instance.__dict__.pop('_cleared_aid_ids', ())
+        refresh_search_documents(aid_ids)
+
+    elif action in ('post_add', 'post_remove'):
+        refresh_search_documents(pk_set)
+
+
+@receiver(post_save, sender=Category)
+def refresh_search_documents_on_category_save(sender, instance, raw=False,
+                                              **kwargs):
+    """The category theme is denormalized in the search documents."""
+
+    if not raw:
+        aid_ids = get_related_aid_ids(Aid.categories.through, instance)
+        if aid_ids:
+            refresh_search_documents(aid_ids)
+            invalidate_search_cache()
+
+
+@receiver(pre_save, sender=Backer)
+def collect_backer_name_before_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._previous_name = Backer.objects \
+            .filter(pk=instance.pk) \
+            .values_list('name', flat=True) \
+            .first()
+
+
+@receiver(post_save, sender=Backer)
+def invalidate_search_cache_on_backer_rename(sender, instance, **kwargs):
+    """Backer names are part of the aid search vectors.
+
+    Vectors are updated by a db trigger, but cached search results must be
+    invalidated too.
+    """
+    previous_name = instance.__dict__.pop('_previous_name', None)
+    if previous_name is not None and previous_name != instance.name:
+        invalidate_search_cache()
+
+
+@receiver(pre_delete, sender=Backer)
+@receiver(pre_delete, sender=Category)
+def collect_aids_before_relation_delete(sender, instance, **kwargs):
+    """Deleted links to aids don't send the `m2m_changed` signal."""
+
+    instance._deleted_aid_ids = set().union(*(
+        get_related_aid_ids(through, instance)
+        for through in AID_RELATIONS[sender]))
+
+
+@receiver(post_delete, sender=Backer)
+@receiver(post_delete, sender=Category)
+def refresh_search_documents_on_relation_delete(sender, instance, **kwargs):
+    aid_ids = instance.__dict__.pop('_deleted_aid_ids', None)
+    if aid_ids:
+        refresh_search_documents(aid_ids)
+        invalidate_search_cache()
@@ -0,0 +1,224 @@
+"""Test methods for the aid api."""
+
+import csv
+import gzip
+import io
+import json
+import pytest
+from datetime import timedelta
+from urllib.parse import urlencode
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from aids.factories import AidFactory
+from aids.api.pagination import AidPagination
+from aids.api.views import AidViewSet
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def aids(perimeters):
+    today = timezone.now().date()
+    aids = []
+    for name in ('europe', 'france', 'herault', 'montpellier'):
+        aids += AidFactory.create_batch(
+            3, perimeter=perimeters[name], submission_deadline=None,
+            recurrence='ongoing')
+        aids += AidFactory.create_batch(
+            3, perimeter=perimeters[name],
+            submission_deadline=today + timedelta(days=10))
+        aids += AidFactory.create_batch(
+            2, perimeter=perimeters[name],
+            submission_deadline=today + timedelta(days=20))
+    return aids
+
+
+def test_api_page_number_pagination(client, aids, monkeypatch):
+    monkeypatch.setattr(AidPagination, 'page_size', 10)
+    url = reverse('aids-list')
+    res = client.get(url)
+    assert res.status_code == 200
+    assert res.data['count'] == 32
+    assert len(res.data['results']) == 10
+    assert 'page=2' in res.data['next']
+
+
+def test_api_cursor_pagination(client, aids, monkeypatch):
+    monkeypatch.setattr(AidPagination, 'page_size', 5)
+    url = '{}?cursor='.format(reverse('aids-list'))
+    results = []
+    nb_pages = 0
+    while url:
+        res = client.get(url)
+        assert res.status_code == 200
+        assert 'count' not in res.data
+        results += res.data['results']
+        url = res.data['next']
+        nb_pages += 1
+
+    assert nb_pages == 7
+    aid_ids = [aid['id'] for aid in results]
+    assert sorted(aid_ids) == sorted(aid.id for aid in aids)
+
+    # Aids are sorted by scale, then deadline (null last), then id
+    expected = sorted(aids, key=lambda aid: (
+        aid.perimeter.scale,
+        aid.submission_deadline is None,
+        aid.submission_deadline,
+        aid.id))
+    assert aid_ids == [aid.id for aid in expected]
+
+
+def test_api_cursor_pagination_without_perimeters(client, aids, monkeypatch):
+    """Aids without a perimeter come last, and are never skipped."""
+
+    today = timezone.now().date()
+    aids += AidFactory.create_batch(
+        3, perimeter=None, submission_deadline=None, recurrence='ongoing')
+    aids += AidFactory.create_batch(
+        4, perimeter=None, submission_deadline=today + timedelta(days=10))
+
+    monkeypatch.setattr(AidPagination, 'page_size', 3)
+    url = '{}?cursor='.format(reverse('aids-list'))
+    aid_ids = []
+    while url:
+        res = client.get(url)
+        assert res.status_code == 200
+        aid_ids += [aid['id'] for aid in res.data['results']]
+        url = res.data['next']
+
+    assert sorted(aid_ids) == sorted(aid.id for aid in aids)
+    assert set(aid_ids[-7:]) == {aid.id for aid in aids[-7:]}
+
+
+def test_api_invalid_cursor(client, aids):
+    url = reverse('aids-list')
+    res = client.get(url, data={'cursor': 'not a cursor'})
+    assert res.status_code == 404
+
+
+@pytest.fixture
+def changes_url(monkeypatch):
+    monkeypatch.setattr(AidViewSet, 'CHANGES_SETTLE_DELAY', timedelta(0))
+    return reverse('aids-changes')
+
+
+def test_api_changes_requires_a_position(client, changes_url):
+    res = client.get(changes_url)
+    assert res.status_code == 400
+
+    res = client.get(changes_url, data={'since': 'not a date'})
+    assert res.status_code == 400
+
+
+def test_api_changes_feed(client, changes_url):
+    watermark = timezone.now()
+    published = AidFactory.create_batch(3)
+    AidFactory(status='draft')
+
+    res = client.get(changes_url, data={'since': watermark.isoformat()})
+    assert res.status_code == 200
+    results = res.data['results']
+    assert [change['id'] for change in results] == [
+        aid.id for aid in published]
+    assert [change['change'] for change in results] == ['created'] * 3
+    assert results[0]['data']['name'] == published[0].name
+
+    # Nothing changed since the last call
+    cursor = res.data['cursor']
+    res = client.get(changes_url, data={'since': cursor})
+    assert res.data['results'] == []
+    assert res.data['cursor'] == cursor
+
+    published[0].name = 'New name'
+    published[0].save()
+    published[1].unpublish()
+    published[2].soft_delete()
+
+    res = client.get(changes_url, data={'since': cursor})
+    results = res.data['results']
+    assert [(change['id'], change['change']) for change in results] == [
+        (published[0].id, 'updated'),
+        (published[1].id, 'unpublished'),
+        (published[2].id, 'deleted'),
+    ]
+    assert results[0]['data']['name'] == 'New name'
+    assert results[1]['data'] is None
+
+
+def test_api_changes_feed_pagination(client, changes_url, monkeypatch):
+    monkeypatch.setattr(AidViewSet, 'CHANGES_PAGE_SIZE', 2)
+    watermark = timezone.now()
+    aids = AidFactory.create_batch(5)
+
+    url = '{}?{}'.format(
+        changes_url, urlencode({'since': watermark.isoformat()}))
+    aid_ids = []
+    while url:
+        res = client.get(url)
+        aid_ids += [change['id'] for change in res.data['results']]
+        url = res.data['next']
+    assert aid_ids == [aid.id for aid in aids]
+
+
+def test_api_changes_feed_ignores_recent_changes(client):
+    watermark = timezone.now()
+    AidFactory()
+    url = reverse('aids-changes')
+    res = client.get(url, data={'since': watermark.isoformat()})
+    assert res.data['results'] == []
+
+
+def test_api_export_jsonl(client, aids):
+    url = reverse('aids_export', args=['jsonl'])
+    res = client.get(url)
+    assert res.status_code == 200
+    assert res['Content-Type'].startswith('application/x-ndjson')
+
+    lines = b''.join(res.streaming_content).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record['id'] for record in records] == sorted(
+        aid.id for aid in aids)
+    assert records[0]['perimeter'] == str(aids[0].perimeter)
+    assert records[0]['financers'] == [
+        backer.name for backer in aids[0].financers.all()]
+
+
+def test_api_export_csv(client, aids):
+    url = reverse('aids_export', args=['csv'])
+    res = client.get(url)
+    assert res.status_code == 200
+
+    content = b''.join(res.streaming_content).decode()
+    rows = list(csv.DictReader(io.StringIO(content)))
+    assert len(rows) == len(aids)
+    assert rows[0]['name'] == min(aids, key=lambda aid: aid.id).name
+
+
+def test_api_export_unknown_format(client):
+    url = reverse('aids_export', args=['xml'])
+    res = client.get(url)
+    assert res.status_code == 404
+
+
+def test_export_command(aids, tmp_path):
+    output = tmp_path / 'aids.jsonl.gz'
+    call_command('export_aids', str(output), stdout=io.StringIO())
+    with gzip.open(output, 'rt') as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == len(aids)
+
+
+def test_api_search_by_zipcode(client, aids, perimeters):
+    perimeters['vic'].zipcodes = ['34110']
+    perimeters['vic'].save()
+
+    url = reverse('aids-list')
+    res = client.get(url, {'zipcode': '34110'})
+    assert res.status_code == 200
+    assert res.data['count'] == 24
+    assert not any('Montpellier' in aid['perimeter']
+                   for aid in res.data['results'])
@@ -0,0 +1,144 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from aids.factories import AidFactory
+from aids.facets import get_facet_counts
+from aids.forms import AidSearchForm
+from categories.models import Theme, Category
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def categories():
+    nature = Theme.objects.create(name='Nature', slug='nature')
+    return {
+        'forest': Category.objects.create(
+            name='Forêt', slug='forest', theme=nature),
+        'water': Category.objects.create(
+            name='Eau', slug='water', theme=nature),
+    }
+
+
+@pytest.fixture
+def aids(categories):
+    aids_data = [
+        (['commune'], ['grant'], ['forest', 'water']),
+        (['commune', 'epci'], ['loan'], ['forest']),
+        (['epci'], ['grant', 'technical'], []),
+    ]
+    for audiances, aid_types, slugs in aids_data:
+        aid = AidFactory(
+            targeted_audiances=audiances,
+            aid_types=aid_types,
+            mobilization_steps=['op'],
+            destinations=['investment'])
+        aid.categories.set([categories[slug] for slug in slugs])
+    AidFactory(status='draft', targeted_audiances=['commune'])
+
+
+def get_form(data):
+    form = AidSearchForm(data)
+    form.full_clean()
+    return form
+
+
+def test_facet_counts(aids):
+    counts = get_facet_counts(get_form({}))
+    assert counts == {
+        'targeted_audiances': {'commune': 2, 'epci': 2},
+        'aid_type': {'financial': 3, 'technical': 1},
+        'aid_types': {'grant': 2, 'loan': 1, 'technical': 1},
+        'mobilization_steps': {'op': 3},
+        'destinations': {'investment': 3},
+        'categories': {'forest': 2, 'water': 1},
+    }
+
+
+def test_facet_counts_are_disjunctive(aids):
+    """Each facet ignores its own filter, but not the other ones."""
+
+    counts = get_facet_counts(get_form({'targeted_audiances': ['epci']}))
+    assert counts['targeted_audiances'] == {'commune': 2, 'epci': 2}
+    assert counts['aid_types'] == {'grant': 1, 'loan': 1, 'technical': 1}
+    assert counts['categories'] == {'forest': 1}
+
+    counts = get_facet_counts(get_form({'financial_aids': ['loan']}))
+    assert counts['aid_types'] == {'grant': 2, 'loan': 1, 'technical': 1}
+    assert counts['aid_type'] == {'financial': 3, 'technical': 1}
+    assert counts['targeted_audiances'] == {'commune': 1, 'epci': 1}
+
+
+def test_facet_counts_are_cached(aids):
+    with CaptureQueriesContext(connection) as queries:
+        get_facet_counts(get_form({}))
+    assert len(queries) == 1
+
+    with CaptureQueriesContext(connection) as queries:
+        get_facet_counts(get_form({}))
+    assert len(queries) == 0
+
+
+def test_facet_counts_of_displayed_fields_only(aids):
+    form = get_form({})
+    with CaptureQueriesContext(connection) as queries:
+        counts = get_facet_counts(form, ['aid_type', 'categories'])
+    assert len(queries) == 1
+    assert 'UNION' in queries[0]['sql']
+    assert counts == {
+        'aid_type': {'financial': 3, 'technical': 1},
+        'categories': {'forest': 2, 'water': 1},
+    }
+
+    with CaptureQueriesContext(connection) as queries:
+        counts = get_facet_counts(form, ['aid_type'])
+    assert 'UNION' not in queries[0]['sql']
+    assert counts == {'aid_type': {'financial': 3, 'technical': 1}}
+
+    with CaptureQueriesContext(connection) as queries:
+        assert get_facet_counts(form, ['backers', 'text']) == {}
+    assert len(queries) == 0
+
+
+def test_search_view_displays_counts(client, aids):
+    """Other filters are only rendered as hidden fields."""
+
+    url = reverse('search_view')
+    res = client.get(url, {'targeted_audiances': 'epci'})
+    assert res.status_code == 200
+    assert res.context['facet_counts'] == {
+        'aid_type': {'financial': 2, 'technical': 1}}
+
+    form = res.context['form']
+    choices = dict(form.fields['aid_type'].choices)
+    assert choices['financial'].endswith('(2)')
+    assert choices['technical'].endswith('(1)')
+    choices = dict(form.fields['categories'].choices)
+    assert not choices['forest'].endswith(')')
+
+
+def test_advanced_search_view_displays_counts(client, aids):
+    url = reverse('advanced_search_view')
+    res = client.get(url, {'targeted_audiances': 'epci'})
+    assert res.status_code == 200
+    assert res.context['facet_counts']['categories'] == {'forest': 1}
+
+    form = res.context['form']
+    choices = dict(form.fields['aid_type'].choices)
+    assert choices['financial'].endswith('(2)')
+    choices = dict(form.fields['targeted_audiances'].choices)
+    assert choices['commune'].endswith('(2)')
+    choices = dict(form.fields['categories'].choices)
+    assert choices['forest'].endswith('(1)')
+    assert choices['water'].endswith('(0)')
+
+
+def test_results_view_does_not_count_facets(client, aids):
+    url = reverse('results_view')
+    with CaptureQueriesContext(connection) as queries:
+        res = client.get(url, {'targeted_audiances': 'epci'})
+    assert res.status_code == 200
+    assert 'facet_counts' not in res.context
+    assert not any('UNION' in query['sql'] for query in queries)
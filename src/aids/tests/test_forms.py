@@ -7,6 +7,7 @@ from aids.models import Aid
 from aids.admin import AidAdmin
 from aids.forms import AidSearchForm, AidEditForm
 from aids.factories import AidFactory
+from backers.factories import BackerFactory
 
 
 pytestmark = pytest.mark.django_db
@@ -420,3 +421,75 @@ def test_aid_creation_description_sanitization(aid_form_data):
     assert 'class="toto"' not in description
     assert 'style' not in description
     assert '<img' not in description
+
+
+def test_search_form_filter_by_zipcode(perimeters):
+    perimeters['montpellier'].zipcodes = ['34000', '34070']
+    perimeters['montpellier'].save()
+    perimeters['vic'].zipcodes = ['34110']
+    perimeters['vic'].save()
+    herault_aid = AidFactory(perimeter=perimeters['herault'])
+    vic_aid = AidFactory(perimeter=perimeters['vic'])
+    AidFactory(perimeter=perimeters['montpellier'])
+    AidFactory(perimeter=perimeters['aveyron'])
+    aids = Aid.objects.all()
+
+    form = AidSearchForm({'zipcode': '34110'})
+    qs = form.filter_queryset(aids)
+    assert set(qs) == {herault_aid, vic_aid}
+
+    form = AidSearchForm({'zipcode': '99999'})
+    qs = form.filter_queryset(aids)
+    assert qs.count() == 0
+
+    # The perimeter has precedence over the zipcode
+    form = AidSearchForm({
+        'zipcode': '34110',
+        'perimeter': perimeters['aveyron'].id})
+    qs = form.filter_queryset(aids)
+    assert qs.count() == 1
+
+    form = AidSearchForm({'zipcode': 'abcde'})
+    assert not form.is_valid()
+    assert 'zipcode' in form.errors
+
+
+def test_edit_form_fetches_selected_backers_at_once(
+        django_assert_num_queries):
+    financer = BackerFactory(name='Financer')
+    instructor = BackerFactory(name='Instructor')
+    form = AidEditForm({
+        'financers': [financer.id_slug],
+        'instructors': [financer.id_slug, instructor.id_slug],
+    })
+
+    with django_assert_num_queries(1):
+        financers = str(form['financers'])
+        instructors = str(form['instructors'])
+    assert 'Financer' in financers
+    assert 'Instructor' not in financers
+    assert 'Financer' in instructors
+    assert 'Instructor' in instructors
+
+
+def test_edit_form_reuses_initial_backers(django_assert_num_queries):
+    financer = BackerFactory(name='Financer')
+    instructor = BackerFactory(name='Instructor')
+    aid = AidFactory(financers=[financer])
+    aid.instructors.add(instructor)
+    form = AidEditForm(instance=aid)
+
+    with django_assert_num_queries(0):
+        financers = str(form['financers'])
+        instructors = str(form['instructors'])
+    assert 'Financer' in financers
+    assert 'Instructor' in instructors
+
+
+def test_search_form_only_fetches_backers_when_rendered(
+        backer, django_assert_num_queries):
+    with django_assert_num_queries(0):
+        form = AidSearchForm({'backers': [backer.id_slug]})
+
+    with django_assert_num_queries(1):
+        assert backer.name in str(form['backers'])
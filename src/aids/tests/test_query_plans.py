@@ -0,0 +1,113 @@
+"""Make sure the hot search queries can use the database indexes.
+
+Sequential scans are disabled, so the planner only falls back to a full
+table scan when no index matches the query.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from accounts.factories import UserFactory
+from aids.models import Aid, AidSearchDocument
+from aids.search_documents import refresh_search_documents
+
+pytestmark = pytest.mark.django_db
+
+
+def explain(qs):
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN {}'.format(sql), params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.execute('SET LOCAL enable_seqscan = on')
+    return plan
+
+
+def get_index_name(model, field):
+    indexes = [
+        index for index in model._meta.indexes if index.fields == [field]]
+    return indexes[0].name
+
+
+@pytest.fixture
+def aids():
+    """Most aids are not live: drafts, amendments or expired aids."""
+
+    author = UserFactory()
+    today = timezone.now().date()
+    aids = []
+    for i in range(2000):
+        if i % 100 == 0:
+            values = {'submission_deadline': today + timedelta(days=i)}
+        elif i % 100 == 1:
+            values = {
+                'recurrence': 'ongoing',
+                'submission_deadline': today - timedelta(days=i)}
+        elif i % 100 == 2:
+            values = {'submission_deadline': None}
+        elif i % 100 == 3:
+            values = {'is_amendment': True}
+        elif i % 2:
+            values = {'submission_deadline': today - timedelta(days=i)}
+        else:
+            values = {'status': 'draft'}
+
+        aids.append(Aid(
+            name='Aide {}'.format(i),
+            slug='aide-{}'.format(i),
+            author=author,
+            status=values.pop('status', 'published'),
+            date_published=timezone.now() - timedelta(days=i),
+            targeted_audiances=['commune'] if i % 3 else ['epci'],
+            aid_types=['grant'] if i % 5 else ['loan'],
+            mobilization_steps=['preop'] if i % 7 else ['op'],
+            destinations=['supply'] if i % 11 else ['investment'],
+            **values))
+    Aid.objects.bulk_create(aids)
+    refresh_search_documents()
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE aids_aid')
+        cursor.execute('ANALYZE aids_aidsearchdocument')
+
+
+def test_open_aids_query_uses_live_indexes(aids):
+    plan = explain(Aid.objects.published().open())
+    assert 'aids_aid_live_deadline_idx' in plan
+    assert 'aids_aid_live_ongoing_idx' in plan
+    assert 'Seq Scan on aids_aid' not in plan
+
+    # Sanity check
+    assert Aid.objects.published().open().count() == 60
+
+
+def test_sort_by_deadline_uses_live_index(aids):
+    qs = Aid.objects.published().open().order_by('submission_deadline')
+    plan = explain(qs[:20])
+    assert 'Index Scan using aids_aid_live_deadline_idx' in plan
+    assert 'Sort' not in plan
+
+
+def test_sort_by_publication_date_uses_live_index(aids):
+    qs = Aid.objects.published().open().order_by('-date_published')
+    plan = explain(qs[:20])
+    assert 'Index Scan using aids_aid_live_published_idx' in plan
+    assert 'Sort' not in plan
+
+
+@pytest.mark.parametrize('field, values', [
+    ('targeted_audiances', ['epci']),
+    ('aid_types', ['loan']),
+    ('mobilization_steps', ['op']),
+    ('destinations', ['investment']),
+])
+def test_overlap_filters_use_gin_indexes(aids, field, values):
+    qs = AidSearchDocument.objects.filter(**{
+        '{}__overlap'.format(field): values})
+    plan = explain(qs)
+    assert 'Bitmap Index Scan on {}'.format(
+        get_index_name(AidSearchDocument, field)) in plan
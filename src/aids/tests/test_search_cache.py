@@ -0,0 +1,139 @@
+"""Test methods for the search results cache."""
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.http import QueryDict
+
+from aids.factories import AidFactory
+from aids.forms import AidSearchForm
+from aids.search_cache import SEARCH_STAMP_CACHE_KEY, get_search_cache_key
+from backers.factories import BackerFactory
+from core.cache import get_stamp
+
+
+pytestmark = pytest.mark.django_db
+
+
+def get_cache_key(querystring):
+    form = AidSearchForm(data=QueryDict(querystring))
+    form.full_clean()
+    return get_search_cache_key(form, 'search')
+
+
+def test_cache_key_does_not_depend_on_parameters_order():
+    backers = BackerFactory.create_batch(2)
+    key_1 = get_cache_key('text=test&backers={}&backers={}'.format(
+        backers[0].pk, backers[1].pk))
+    key_2 = get_cache_key('backers={}&backers={}&text=test'.format(
+        backers[1].pk, backers[0].pk))
+    assert key_1 == key_2
+
+
+def test_cache_key_ignores_empty_and_unrelated_parameters():
+    key_1 = get_cache_key('text=test')
+    key_2 = get_cache_key('text=test&apply_before=&integration=true')
+    assert key_1 == key_2
+
+    key_3 = get_cache_key('text=other')
+    assert key_1 != key_3
+
+
+def test_cache_key_survives_results_eviction():
+    """Evicting search results does not evict invalidation stamps."""
+
+    key = get_cache_key('text=test')
+    cache.clear()
+    assert get_cache_key('text=test') == key
+
+
+def test_search_results_are_cached(client):
+    AidFactory.create_batch(3)
+    url = reverse('search_view')
+    with CaptureQueriesContext(connection) as first_queries:
+        res = client.get(url)
+    assert res.context['paginator'].count == 3
+
+    # The second time, neither the id list nor the facet counts are
+    # fetched again
+    with CaptureQueriesContext(connection) as second_queries:
+        res = client.get(url)
+    assert res.context['paginator'].count == 3
+    assert len(res.context['aids']) == 3
+    assert len(second_queries) == len(first_queries) - 2
+
+
+def test_cached_results_keep_the_search_order(client):
+    aids = AidFactory.create_batch(5)
+    url = reverse('search_view')
+    res = client.get(url, data={'order_by': 'publication_date'})
+    expected = [aid.id for aid in res.context['aids']]
+    assert sorted(expected) == sorted(aid.id for aid in aids)
+
+    res = client.get(url, data={'order_by': 'publication_date'})
+    assert [aid.id for aid in res.context['aids']] == expected
+
+
+def test_cache_is_invalidated_on_aid_update(client):
+    aids = AidFactory.create_batch(3)
+    url = reverse('search_view')
+    res = client.get(url)
+    assert res.context['paginator'].count == 3
+
+    aids[0].status = 'draft'
+    aids[0].save()
+    res = client.get(url)
+    assert res.context['paginator'].count == 2
+
+    AidFactory()
+    res = client.get(url)
+    assert res.context['paginator'].count == 3
+
+
+def test_cache_is_invalidated_on_aid_relations_update(client):
+    aid = AidFactory()
+    backer = BackerFactory()
+    url = reverse('search_view')
+    res = client.get(url, data={'backers': backer.pk})
+    assert res.context['paginator'].count == 0
+
+    aid.financers.add(backer)
+    res = client.get(url, data={'backers': backer.pk})
+    assert res.context['paginator'].count == 1
+
+
+def test_cache_is_invalidated_on_backer_rename(client):
+    aid = AidFactory()
+    backer = BackerFactory(name='Gloubiboulga')
+    aid.financers.add(backer)
+    url = reverse('search_view')
+    res = client.get(url, data={'text': 'casimir'})
+    assert res.context['paginator'].count == 0
+
+    # Saving a backer without renaming it keeps the cached results
+    stamp = get_stamp(SEARCH_STAMP_CACHE_KEY)
+    backer.save()
+    assert get_stamp(SEARCH_STAMP_CACHE_KEY) == stamp
+
+    backer.name = 'Casimir'
+    backer.save()
+    res = client.get(url, data={'text': 'casimir'})
+    assert res.context['paginator'].count == 1
+
+
+def test_api_results_are_cached(client):
+    AidFactory.create_batch(3)
+    url = reverse('aids-list')
+    res = client.get(url)
+    assert res.data['count'] == 3
+
+    aid = AidFactory()
+    res = client.get(url)
+    assert res.data['count'] == 4
+
+    detail_url = reverse('aids-detail', args=[aid.pk])
+    res = client.get(detail_url)
+    assert res.status_code == 200
+    assert res.data['id'] == aid.pk
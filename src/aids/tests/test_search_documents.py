@@ -0,0 +1,154 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from aids import signals
+from aids.factories import AidFactory
+from aids.forms import AidSearchForm
+from aids.models import Aid, AidSearchDocument
+from aids.search_documents import refresh_search_documents
+from backers.factories import BackerFactory
+from categories.models import Theme, Category
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def category():
+    theme = Theme.objects.create(name='Nature', slug='nature')
+    return Category.objects.create(name='Forêt', slug='forest', theme=theme)
+
+
+def test_documents_are_created_for_published_aids(perimeters):
+    aid = AidFactory(
+        perimeter=perimeters['montpellier'],
+        targeted_audiances=['commune'],
+        aid_types=['grant'])
+    AidFactory(status='draft')
+
+    document = AidSearchDocument.objects.get()
+    assert document.aid_id == aid.id
+    assert document.perimeter_id == perimeters['montpellier'].id
+    assert document.perimeter_scale == perimeters['montpellier'].scale
+    assert document.targeted_audiances == ['commune']
+    assert document.aid_types == ['grant']
+    assert document.search_vector is not None
+
+
+def test_documents_are_deleted_for_unpublished_aids():
+    aid = AidFactory()
+    assert AidSearchDocument.objects.filter(aid=aid).exists()
+
+    aid.status = 'draft'
+    aid.save()
+    assert not AidSearchDocument.objects.filter(aid=aid).exists()
+
+
+def test_documents_follow_relation_changes(category):
+    aid = AidFactory()
+    financer = BackerFactory()
+    instructor = BackerFactory()
+
+    aid.financers.add(financer)
+    aid.instructors.add(instructor)
+    aid.categories.add(category)
+    document = AidSearchDocument.objects.get(aid=aid)
+    assert sorted(document.backer_ids) == sorted([financer.id, instructor.id])
+    assert document.category_ids == [category.id]
+    assert document.theme_ids == [category.theme_id]
+
+    # Reverse relation changes
+    financer.financed_aids.remove(aid)
+    category.aids.clear()
+    document.refresh_from_db()
+    assert document.backer_ids == [instructor.id]
+    assert document.category_ids == []
+    assert document.theme_ids == []
+
+
+def test_documents_follow_category_theme_changes(category):
+    aid = AidFactory()
+    aid.categories.add(category)
+    other_theme = Theme.objects.create(name='Eau', slug='water')
+
+    category.theme = other_theme
+    category.save()
+    document = AidSearchDocument.objects.get(aid=aid)
+    assert document.theme_ids == [other_theme.id]
+
+
+def test_documents_follow_backer_deletion():
+    aid = AidFactory()
+    financer = BackerFactory()
+    instructor = BackerFactory()
+    aid.financers.add(financer)
+    aid.instructors.add(instructor, financer)
+
+    financer.delete()
+    document = AidSearchDocument.objects.get(aid=aid)
+    assert document.backer_ids == [instructor.id]
+
+
+def test_documents_follow_category_deletion(category):
+    aid = AidFactory()
+    aid.categories.add(category)
+
+    category.delete()
+    document = AidSearchDocument.objects.get(aid=aid)
+    assert document.category_ids == []
+    assert document.theme_ids == []
+
+
+def test_reverse_clear_only_refreshes_related_documents(monkeypatch):
+    aids = AidFactory.create_batch(2)
+    AidFactory()
+    financer = BackerFactory()
+    financer.financed_aids.set(aids)
+
+    refreshed = []
+
+    def refresh(aid_ids=None):
+        refreshed.append(aid_ids)
+        refresh_search_documents(aid_ids)
+
+    monkeypatch.setattr(signals, 'refresh_search_documents', refresh)
+    financer.financed_aids.clear()
+    assert refreshed == [{aid.id for aid in aids}]
+    for aid in aids:
+        assert AidSearchDocument.objects.get(aid=aid).backer_ids == []
+
+
+def test_bulk_updates_require_a_refresh():
+    aid = AidFactory(is_call_for_project=False)
+    Aid.objects.filter(id=aid.id).update(is_call_for_project=True)
+    assert not AidSearchDocument.objects.get(aid=aid).is_call_for_project
+
+    refresh_search_documents([aid.id])
+    assert AidSearchDocument.objects.get(aid=aid).is_call_for_project
+
+
+def test_full_rebuild():
+    aids = AidFactory.create_batch(3)
+    AidSearchDocument.objects.all().delete()
+    Aid.objects.filter(id=aids[0].id).update(status='draft')
+
+    refresh_search_documents()
+    assert set(AidSearchDocument.objects.values_list('aid_id', flat=True)) \
+        == {aids[1].id, aids[2].id}
+
+
+def test_search_filters_dont_join_related_tables(perimeters, category):
+    form = AidSearchForm({
+        'perimeter': perimeters['herault'].id,
+        'categories': [category.slug],
+        'backers': [BackerFactory().id],
+        'targeted_audiances': ['commune'],
+        'text': 'fromage',
+    })
+    qs = form.filter_queryset()
+    with CaptureQueriesContext(connection) as queries:
+        list(qs)
+
+    sql = queries[-1]['sql']
+    assert 'JOIN' not in sql
+    assert 'DISTINCT' not in sql
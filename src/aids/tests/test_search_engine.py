@@ -143,6 +143,16 @@ def test_search_aids_from_montpellier(client, perimeters, aids):
     assert res.context['paginator'].count == 28
 
 
+def test_search_aids_from_wide_perimeter(client, perimeters, aids,
+                                         monkeypatch):
+    """Wide perimeters are filtered with the closure table."""
+
+    monkeypatch.setattr('aids.forms.MAX_INLINE_PERIMETER_IDS', 0)
+    url = reverse('search_view')
+    res = client.get(url, data={'perimeter': perimeters['herault'].pk})
+    assert res.context['paginator'].count == 21
+
+
 def test_search_aids_from_rhone_mediterannee_basin(client, perimeters, aids):
     """Only display aids in the selected basin."""
 
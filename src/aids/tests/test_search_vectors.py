@@ -0,0 +1,96 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+
+from aids.factories import AidFactory
+from aids.forms import AidSearchForm
+from aids.models import Aid
+from backers.factories import BackerFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def search(text):
+    form = AidSearchForm(QueryDict('text={}'.format(text)))
+    return list(form.filter_queryset())
+
+
+def test_vector_is_computed_on_save():
+    aid = AidFactory(name='Une aide pour le fromage')
+    assert search('fromage') == [aid]
+
+    aid.name = 'Une aide pour le vin'
+    aid.save()
+    assert search('fromage') == []
+    assert search('vin') == [aid]
+
+
+def test_vector_is_computed_on_bulk_updates():
+    aid = AidFactory(name='Une aide pour le fromage')
+    Aid.objects.filter(id=aid.id).update(name='Une aide pour le vin')
+    assert search('vin') == [aid]
+
+
+def test_vector_contains_backer_names():
+    aid = AidFactory()
+    financer = BackerFactory(name='Gloubiboulga')
+    instructor = BackerFactory(name='Casimir')
+
+    aid.financers.add(financer)
+    aid.instructors.add(instructor)
+    assert search('gloubiboulga') == [aid]
+    assert search('casimir') == [aid]
+
+    aid.instructors.remove(instructor)
+    assert search('casimir') == []
+
+
+def count_aid_updates():
+    """Number of aid rows updated in the current transaction."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT n_tup_upd FROM pg_stat_xact_user_tables "
+            "WHERE relname = 'aids_aid'")
+        return cursor.fetchone()[0]
+
+
+def test_aids_are_updated_once_per_backer_links_statement():
+    aids = AidFactory.create_batch(2)
+    backers = [BackerFactory(name='Gloubiboulga {}'.format(i))
+               for i in range(5)]
+    Financers = Aid.financers.through
+
+    before = count_aid_updates()
+    Financers.objects.bulk_create([
+        Financers(aid=aid, backer=backer)
+        for aid in aids for backer in backers])
+    assert count_aid_updates() - before == 2
+    assert set(search('gloubiboulga')) == set(aids)
+
+    before = count_aid_updates()
+    Financers.objects.filter(aid=aids[0]).delete()
+    assert count_aid_updates() - before == 1
+    assert search('gloubiboulga') == [aids[1]]
+
+
+def test_vector_follows_backer_renames():
+    aid = AidFactory()
+    financer = BackerFactory(name='Gloubiboulga')
+    aid.financers.add(financer)
+
+    financer.name = 'Casimir'
+    financer.save()
+    assert search('gloubiboulga') == []
+    assert search('casimir') == [aid]
+
+
+def test_rebuild_search_vectors_command():
+    aids = AidFactory.create_batch(5, name='Une aide pour le fromage')
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE aids_aid SET search_vector = NULL')
+    assert search('fromage') == []
+
+    call_command('rebuild_search_vectors', batch_size=2, workers=1)
+    assert set(search('fromage')) == set(aids)
@@ -0,0 +1,51 @@
+"""Test methods for the aid api serializers."""
+
+import pytest
+from psycopg2.extras import NumericRange
+from rest_framework.renderers import JSONRenderer
+
+from aids.factories import AidFactory
+from aids.models import Aid
+from aids.api.serializers import AidSerializer, AidValuesSerializer
+from backers.factories import BackerFactory
+from geofr.factories import PerimeterFactory
+from geofr.models import Perimeter
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_values_serializer_output_is_the_same(perimeters):
+    commune = PerimeterFactory(
+        scale=Perimeter.TYPES.commune, zipcodes=['34000', '34080'])
+    aids = [
+        AidFactory(
+            perimeter=commune,
+            financers=[BackerFactory()],
+            subvention_rate=NumericRange(10, 50),
+            recurrence='ongoing',
+            submission_deadline=None,
+            tags=['eau', 'forêt']),
+        AidFactory(perimeter=perimeters['herault']),
+        AidFactory(perimeter=None, recurrence=''),
+    ]
+    aids[1].instructors.add(BackerFactory())
+
+    # Order matters
+    aid_ids = [aids[1].id, aids[0].id, aids[2].id]
+    qs = Aid.objects \
+        .select_related('perimeter') \
+        .prefetch_related('financers', 'instructors') \
+        .in_bulk(aid_ids)
+    expected = AidSerializer([qs[aid_id] for aid_id in aid_ids], many=True)
+
+    renderer = JSONRenderer()
+    fast_serializer = AidValuesSerializer(aid_ids)
+    assert renderer.render(fast_serializer.data) == \
+        renderer.render(expected.data)
+
+
+def test_values_serializer_ignores_missing_aids():
+    aid = AidFactory()
+    data = AidValuesSerializer([aid.id, aid.id + 1]).data
+    assert [record['id'] for record in data] == [aid.id]
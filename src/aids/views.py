@@ -3,7 +3,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.mail import send_mail
-from django.db.models import Q, Sum, Prefetch
+from django.db.models import Q, Sum, Prefetch, QuerySet
 from django.http import HttpResponse, HttpResponseRedirect
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext_lazy as _
@@ -19,6 +19,7 @@ from django.utils.functional import cached_property
 from braces.views import MessageMixin
 
 from stats.utils import log_event
+from geofr.graph import ancestor_ids
 from accounts.mixins import ContributorRequiredMixin
 from programs.models import Program
 from alerts.forms import AlertForm
@@ -28,6 +29,8 @@ from aids.tasks import log_admins
 from aids.forms import (AidEditForm, AidAmendForm, AidSearchForm,
                         AdvancedAidFilterForm)
 from aids.models import Aid, AidWorkflow
+from aids.facets import get_facet_counts, add_facet_counts
+from aids.search_cache import get_cached_aid_ids, CachedSearchResults
 
 
 class SearchMixin:
@@ -42,19 +45,43 @@ class SearchMixin:
         return kwargs
 
 
+class FacetsMixin:
+    """Display the number of matching aids next to search filter values.
+
+    Counts are only computed for the filters that are displayed by the
+    view's template (see `aids.facets`), and are added to the form of the
+    context. The view must provide the validated search form in `self.form`.
+    """
+
+    # The displayed search form fields with aid counts
+    facet_fields = ()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        facet_counts = get_facet_counts(self.form, self.facet_fields)
+        if facet_counts:
+            add_facet_counts(context['form'], facet_counts)
+            context['facet_counts'] = facet_counts
+        return context
+
+
 class AidPaginator(Paginator):
     """Custom paginator for aids.
 
     The default django paginator uses COUNT(*) for counting results, which
     takes up a lot of memory and results in terrible performances.
+
+    Cached search results already know their size.
     """
 
     @cached_property
     def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return len(self.object_list)
         return self.object_list.values('id').order_by('id').count()
 
 
-class SearchView(SearchMixin, FormMixin, ListView):
+class SearchView(SearchMixin, FacetsMixin, FormMixin, ListView):
     """Search and display aids."""
 
     template_name = 'aids/search.html'
@@ -63,6 +90,9 @@ class SearchView(SearchMixin, FormMixin, ListView):
     paginate_by = 18
     paginator_class = AidPaginator
 
+    # The other filters are only rendered as hidden fields
+    facet_fields = ('aid_type',)
+
     def get(self, request, *args, **kwargs):
         self.form = self.get_form()
         self.form.full_clean()
@@ -70,7 +100,11 @@ class SearchView(SearchMixin, FormMixin, ListView):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        """Return the list of results to display."""
+        """Return the list of results to display.
+
+        The ordered list of matching aid ids is cached, and the full aid
+        objects are only fetched for the displayed page.
+        """
 
         qs = Aid.objects \
             .published() \
@@ -80,8 +114,9 @@ class SearchView(SearchMixin, FormMixin, ListView):
 
         filter_form = self.form
         results = filter_form.filter_queryset(qs)
-        ordered_results = filter_form.order_queryset(results).distinct()
-        return ordered_results
+        ordered_results = filter_form.order_queryset(results)
+        aid_ids = get_cached_aid_ids(filter_form, ordered_results, 'search')
+        return CachedSearchResults(aid_ids, qs)
 
     def get_programs(self):
         """Get the aid programs that matched the search perimeter.
@@ -96,11 +131,9 @@ class SearchView(SearchMixin, FormMixin, ListView):
         if not searched_perimeter:
             return []
 
-        q_exact_match = Q(perimeter=searched_perimeter)
-        q_container_match = Q(
-            perimeter__in=searched_perimeter.contained_in.all())
-        programs = Program.objects \
-            .filter(q_exact_match | q_container_match)
+        perimeter_ids = ancestor_ids(searched_perimeter.id) \
+            | {searched_perimeter.id}
+        programs = Program.objects.filter(perimeter__in=perimeter_ids)
         return programs
 
     def store_current_search(self):
@@ -132,11 +165,18 @@ class SearchView(SearchMixin, FormMixin, ListView):
         return context
 
 
-class AdvancedSearchView(SearchMixin, FormView):
+class AdvancedSearchView(SearchMixin, FacetsMixin, FormView):
     """Only displays the search form, more suitable for mobile views."""
 
     form_class = AdvancedAidFilterForm
     template_name = 'aids/advanced_search.html'
+    facet_fields = ('targeted_audiances', 'categories', 'aid_type',
+                    'destinations', 'mobilization_step')
+
+    def get(self, request, *args, **kwargs):
+        self.form = self.get_form()
+        self.form.full_clean()
+        return super().get(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -152,6 +192,7 @@ class ResultsView(SearchView):
     fragment of search engine results.
     """
     template_name = 'aids/_results.html'
+    facet_fields = ()
 
     def get_context_data(self, **kwargs):
         kwargs['search_actions'] = True
@@ -1,12 +1,14 @@
 """This is the "send email alerts upon new saved search results" feature."""
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 import logging
+import time
 
-from django.utils import timezone
+from django.utils import timezone, translation
 from django.core.management.base import BaseCommand
 from django.template.loader import render_to_string
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.contrib.sites.models import Site
 from django.db.models import Q, Case, When
 from django.urls import reverse
@@ -14,30 +16,41 @@ from django.conf import settings
 
 from stats.utils import log_event
 from alerts.models import Alert
+from alerts.utils import get_new_aids_by_alert
 
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    """Send an email alert upon new aid results."""
+    """Send an email alert upon new aid results.
+
+    Emails are rendered in a pool of worker threads, then sent through a
+    single smtp connection per batch of messages, with a maximum number of
+    messages per second so we don't get throttled by the smtp server.
+
+    The alert date is only updated for alerts whose email was actually
+    delivered, so failed alerts will be sent again during the next run.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rate', type=float, default=settings.ALERTS_EMAILS_PER_SECOND,
+            help='Maximum number of emails sent per second')
 
     def handle(self, *args, **options):
 
-        alerts = self.get_alerts()
-        alerted_alerts = []
-        for alert in alerts:
-            new_aids = list(alert.get_new_aids())
-            if new_aids:
-                alerted_alerts.append(alert.token)
-                self.send_alert(alert, new_aids)
-                logger.info(
-                    'Sending alert alert email to {}: {} alerts'.format(
-                        alert.email,
-                        len(new_aids)))
+        alerts = list(self.get_alerts())
+        new_aids_by_alert = get_new_aids_by_alert(alerts)
+        alerts_to_send = [
+            (alert, new_aids_by_alert[alert.token])
+            for alert in alerts if alert.token in new_aids_by_alert]
+
+        messages = self.render_messages(alerts_to_send)
+        delivered_alerts = self.send_messages(messages, options['rate'])
 
         updated = Alert.objects \
-            .filter(token__in=alerted_alerts) \
+            .filter(token__in=delivered_alerts) \
             .update(latest_alert_date=timezone.now())
         self.stdout.write('{} alerts sent'.format(updated))
         log_event('alert', 'sent', value=updated)
@@ -70,11 +83,29 @@ class Command(BaseCommand):
 
         return alerts
 
-    def send_alert(self, alert, new_aids):
-        """Send an email alert with a summary of the newly published aids."""
+    def render_messages(self, alerts_to_send):
+        """Render all emails in parallel.
 
-        delete_url = reverse('alert_delete_view', args=[alert.token])
+        Returns a list of (alert, message) tuples.
+        """
         site = Site.objects.get_current()
+        language = translation.get_language()
+
+        def render(alert_and_aids):
+            alert, new_aids = alert_and_aids
+            with translation.override(language):
+                message = self.get_alert_message(alert, new_aids, site)
+            return alert, message
+
+        workers = settings.ALERTS_RENDER_WORKERS
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            messages = list(executor.map(render, alerts_to_send))
+        return messages
+
+    def get_alert_message(self, alert, new_aids, site):
+        """Build an email with a summary of the newly published aids."""
+
+        delete_url = reverse('alert_delete_view', args=[alert.token])
         email_context = {
             'domain': site.domain,
             'alert': alert,
@@ -93,10 +124,56 @@ class Command(BaseCommand):
         email_from = settings.DEFAULT_FROM_EMAIL
         email_to = [alert.email]
 
-        send_mail(
+        message = EmailMultiAlternatives(
             '{}{}'.format(settings.EMAIL_SUBJECT_PREFIX, email_subject),
             text_body,
             email_from,
-            email_to,
-            html_message=html_body,
-            fail_silently=False)
+            email_to)
+        message.attach_alternative(html_body, 'text/html')
+        return message
+
+    def send_messages(self, messages, rate):
+        """Send the emails, and return the tokens of delivered alerts.
+
+        A single connection is opened for every batch of messages. Messages
+        are sent one by one through this connection, so we know exactly
+        which ones were delivered.
+        """
+        delivered_alerts = []
+        batch_size = settings.ALERTS_EMAIL_BATCH_SIZE
+        min_interval = 1 / rate if rate > 0 else 0
+        next_send = time.monotonic()
+
+        for start in range(0, len(messages), batch_size):
+            batch = messages[start:start + batch_size]
+            connection = get_connection(fail_silently=False)
+            try:
+                connection.open()
+            except Exception as e:
+                logger.error('Cannot open email connection: {}'.format(e))
+                continue
+
+            try:
+                for alert, message in batch:
+                    delay = next_send - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_send = time.monotonic() + min_interval
+
+                    try:
+                        sent = connection.send_messages([message])
+                    except Exception as e:
+                        logger.error(
+                            'Cannot send alert email to {}: {}'.format(
+                                alert.email, e))
+                        continue
+
+                    if sent:
+                        delivered_alerts.append(alert.token)
+                        logger.info(
+                            'Sending alert alert email to {}'.format(
+                                alert.email))
+            finally:
+                connection.close()
+
+        return delivered_alerts
@@ -1,8 +1,12 @@
 import pytest
+import time
+from smtplib import SMTPException
+from django.core.mail.backends import locmem
 from django.core.management import call_command
 
 from aids.factories import AidFactory
 from alerts.factories import AlertFactory
+from alerts.models import Alert
 
 pytestmark = pytest.mark.django_db
 
@@ -61,3 +65,50 @@ def test_command_output_format(mailoutbox):
     # Only the first three aids are in the mail
     assert 'Schtroumpf 4' not in content
     assert 'encore d\'autres aides disponibles !' in content
+
+
+def test_command_sends_emails_through_a_single_connection(settings, tmp_path):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+    settings.EMAIL_FILE_PATH = str(tmp_path)
+    AlertFactory.create_batch(5, querystring='text=Schtroumpf')
+    AidFactory.create_batch(2, name='Schtroumpf')
+    call_command('send_alerts', rate=0)
+
+    # The file backend writes a single file per connection
+    email_files = list(tmp_path.iterdir())
+    assert len(email_files) == 1
+    assert email_files[0].read_text().count('Subject:') == 5
+
+
+def test_command_only_updates_delivered_alerts(mailoutbox, monkeypatch):
+    alerts = AlertFactory.create_batch(3, querystring='text=Schtroumpf')
+    AidFactory.create_batch(2, name='Schtroumpf')
+    failing_email = alerts[1].email
+
+    send_messages = locmem.EmailBackend.send_messages
+
+    def fail_for_one_address(self, messages):
+        if failing_email in messages[0].to:
+            raise SMTPException('Mailbox unavailable')
+        return send_messages(self, messages)
+
+    monkeypatch.setattr(
+        locmem.EmailBackend, 'send_messages', fail_for_one_address)
+    call_command('send_alerts', rate=0)
+    assert len(mailoutbox) == 2
+
+    dates = {alert.token: alert.latest_alert_date for alert in alerts}
+    for alert in Alert.objects.all():
+        if alert.email == failing_email:
+            assert alert.latest_alert_date == dates[alert.token]
+        else:
+            assert alert.latest_alert_date > dates[alert.token]
+
+
+def test_command_respects_the_rate_limit(mailoutbox):
+    AlertFactory.create_batch(3, querystring='text=Schtroumpf')
+    AidFactory.create_batch(2, name='Schtroumpf')
+    start = time.monotonic()
+    call_command('send_alerts', rate=20)
+    assert len(mailoutbox) == 3
+    assert time.monotonic() - start >= 0.1
@@ -0,0 +1,57 @@
+import pytest
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from aids.factories import AidFactory
+from alerts.factories import AlertFactory
+from alerts.utils import normalize_querystring, get_new_aids_by_alert
+
+pytestmark = pytest.mark.django_db
+
+
+def test_normalize_querystring():
+    assert normalize_querystring('text=eau&aid_type=technical') == \
+        normalize_querystring('aid_type=technical&text=eau&page=2')
+    assert normalize_querystring('a=1&a=2&b=') == \
+        normalize_querystring('a=2&a=1')
+    assert normalize_querystring('text=eau') != \
+        normalize_querystring('text=forêt')
+
+
+def test_new_aids_are_the_same_as_for_single_alerts():
+    yesterday = timezone.now() - timedelta(days=1)
+    alerts = [
+        AlertFactory(querystring='text=eau'),
+        AlertFactory(querystring='text=eau'),
+        AlertFactory(querystring='text=eau', latest_alert_date=yesterday),
+        AlertFactory(querystring='text=forêt'),
+        AlertFactory(querystring='text=schtroumpf'),
+    ]
+    old_aid = AidFactory(name='Protection de l\'eau')
+    old_aid.date_published = timezone.now() - timedelta(days=3)
+    old_aid.save()
+    AidFactory.create_batch(2, name='Gestion de l\'eau')
+    AidFactory.create_batch(3, name='Gestion de la forêt')
+
+    new_aids = get_new_aids_by_alert(alerts)
+    for alert in alerts:
+        expected = list(alert.get_new_aids())
+        assert new_aids.get(alert.token, []) == expected
+
+    assert len(new_aids[alerts[0].token]) == 3
+    assert len(new_aids[alerts[2].token]) == 2
+    assert alerts[4].token not in new_aids
+
+
+def test_identical_searches_are_only_run_once():
+    AidFactory.create_batch(3, name='Gestion de l\'eau')
+    alerts = AlertFactory.create_batch(10, querystring='text=eau')
+    with CaptureQueriesContext(connection) as queries:
+        new_aids = get_new_aids_by_alert(alerts)
+    assert len(new_aids) == 10
+
+    # candidates, search, aids and financers
+    assert len(queries) == 4
@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+from django.http import QueryDict
+
+from aids.models import Aid
+from aids.forms import AidSearchForm
+
+
+# Those parameters have no impact on the matching aids
+IGNORED_PARAMETERS = ('page', 'integration', 'order_by')
+
+
+def normalize_querystring(querystring):
+    """Return a canonical version of a search querystring.
+
+    Two searches with the same parameters, in any order, get the same
+    normalized querystring.
+    """
+    querydict = QueryDict(querystring, mutable=True)
+    params = []
+    for key in sorted(querydict.keys()):
+        if key in IGNORED_PARAMETERS:
+            continue
+        values = sorted(value for value in querydict.getlist(key) if value)
+        params += [(key, value) for value in values]
+
+    normalized = QueryDict(mutable=True)
+    for key, value in params:
+        normalized.appendlist(key, value)
+    return normalized.urlencode()
+
+
+def get_new_aids_by_alert(alerts):
+    """Return the new matching aids of many alerts at once.
+
+    Calling `Alert.get_new_aids` for each alert is costly: every call
+    requires a full filtered search query.
+
+    Instead, we fetch the ids of all aids published since the oldest alert
+    date, which is a small candidate set. Then, alerts are grouped by search
+    parameters, and each distinct search is only run once, restricted to
+    the candidate aids. Finally, the results of each alert are selected in
+    memory, depending on its own latest alert date.
+
+    Returns a {alert token: [aids]} dict, with aids sorted by publication
+    date. Alerts without new aids are not part of the result.
+    """
+    alerts = list(alerts)
+    if not alerts:
+        return {}
+
+    base_qs = Aid.objects.published().open()
+    oldest_alert_date = min(alert.latest_alert_date for alert in alerts)
+    candidates = dict(base_qs
+                      .filter(date_published__gte=oldest_alert_date)
+                      .values_list('id', 'date_published'))
+    if not candidates:
+        return {}
+
+    alerts_by_search = defaultdict(list)
+    for alert in alerts:
+        alerts_by_search[normalize_querystring(alert.querystring)].append(
+            alert)
+
+    matching_ids_by_alert = {}
+    for querystring, search_alerts in alerts_by_search.items():
+        search_form = AidSearchForm(QueryDict(querystring))
+        matching_ids = set(search_form
+                           .filter_queryset(
+                               base_qs.filter(id__in=list(candidates)))
+                           .values_list('id', flat=True))
+
+        for alert in search_alerts:
+            alert_ids = [
+                aid_id for aid_id in matching_ids
+                if candidates[aid_id] >= alert.latest_alert_date]
+            if alert_ids:
+                matching_ids_by_alert[alert.token] = alert_ids
+
+    all_ids = set().union(*matching_ids_by_alert.values())
+    aids = Aid.objects \
+        .select_related('perimeter', 'author') \
+        .prefetch_related('financers') \
+        .in_bulk(all_ids)
+
+    new_aids_by_alert = {}
+    for token, aid_ids in matching_ids_by_alert.items():
+        alert_aids = [aids[aid_id] for aid_id in aid_ids if aid_id in aids]
+        alert_aids.sort(key=lambda aid: (aid.date_published, aid.id))
+        new_aids_by_alert[token] = alert_aids
+    return new_aids_by_alert
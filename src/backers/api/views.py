@@ -1,8 +1,6 @@
-import operator
-from functools import reduce
 from rest_framework import viewsets
-from django.db.models import Q
 
+from backers import autocomplete
 from backers.models import Backer
 from backers.api.serializers import BackerSerializer
 
@@ -14,19 +12,18 @@ class BackerViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = BackerSerializer
 
     def get_queryset(self):
-        """Filter data according to search query."""
+        return Backer.objects.order_by('name')
 
-        qs = Backer.objects.all()
-        q = self.request.query_params.get('q', '')
-        terms = q.split()
-        q_filters = []
-        for term in terms:
-            if len(term) >= MIN_SEARCH_LENGTH:
-                q_filters.append(Q(name__icontains=term))
-
-        if q_filters:
-            qs = qs.filter(reduce(operator.and_, q_filters))
+    def list(self, request, *args, **kwargs):
+        """Search backers using the in-memory autocomplete index.
 
-        qs = qs.order_by('name')
+        Backers must match all the search terms, but terms that are too
+        short are ignored.
+        """
+        q = self.request.query_params.get('q', '')
+        terms = [term for term in q.split()
+                 if len(term) >= MIN_SEARCH_LENGTH]
 
-        return qs
+        results = autocomplete.search(terms)
+        page = self.paginate_queryset(results)
+        return self.get_paginated_response(page)
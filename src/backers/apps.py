@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BackersConfig(AppConfig):
     name = 'backers'
+
+    def ready(self):
+        import backers.signals  # noqa
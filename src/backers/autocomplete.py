@@ -0,0 +1,99 @@
+"""In-memory index for the backer autocomplete api.
+
+Backer names are searched on every keystroke of the backer autocomplete
+widgets. Instead of a sequential scan of the backer table, every worker
+builds a read-only index of the accent-folded words of all backer names,
+stored in a sorted array, so each search term is a prefix lookup.
+
+The index is tagged with a version stamp stored in the cache, that is bumped
+every time a backer is modified (see `backers.signals`). Workers rebuild the
+index upon next access.
+
+Note: `bulk_create` does not send signals, so code that creates backers in
+bulk must call `backer_index.invalidate()` by itself.
+"""
+
+from array import array
+
+from core.autocomplete import SearchResults, fold, prefix_range, split_words
+from core.cache import VersionedSingleton
+from backers.models import Backer
+
+
+VERSION_CACHE_KEY = 'backers:autocomplete_version'
+
+RESULT_FIELDS = ('id', 'text')
+
+
+class BackerIndex:
+    """A read-only search index of all backers."""
+
+    def __init__(self, version, backers):
+        """Build the index.
+
+        `backers` is a list of `Backer` objects, with at least the `id`,
+        `name` and `slug` fields.
+        """
+        self.version = version
+
+        # Backers are stored by name, so results are sorted by position
+        backers = sorted(
+            backers, key=lambda backer: (fold(backer.name), backer.name))
+        self.results = [(backer.id_slug, backer.name) for backer in backers]
+
+        words = sorted(
+            (word, position)
+            for position, backer in enumerate(backers)
+            for word in set(split_words(backer.name)))
+        self.words = [word for word, _ in words]
+        self.word_positions = array('l', (position for _, position in words))
+
+    @classmethod
+    def load(cls, version):
+        backers = Backer.objects.only('id', 'name', 'slug')
+        return cls(version, list(backers))
+
+    def __len__(self):
+        return len(self.results)
+
+    def search(self, terms):
+        """Return the positions of backers matching all the search terms.
+
+        A backer matches a term if one of the words of its name starts with
+        it, regardless of case and accents. Terms without any word (e.g
+        punctuation) match no backer.
+        """
+        matches = None
+        for term in terms:
+            words = split_words(term)
+            if not words:
+                return []
+            for word in words:
+                start, end = prefix_range(self.words, word)
+                positions = set(self.word_positions[start:end])
+                matches = positions if matches is None \
+                    else matches & positions
+
+        if matches is None:
+            return range(len(self))
+        return sorted(matches)
+
+    def get_results(self, terms):
+        """Return the serialized backers matching all the search terms."""
+
+        return SearchResults(self.results, self.search(terms), RESULT_FIELDS)
+
+
+backer_index = VersionedSingleton(VERSION_CACHE_KEY, BackerIndex.load)
+
+
+def get_index():
+    """Return an up-to-date index, building it if necessary."""
+
+    return backer_index.get()
+
+
+def search(terms):
+    """Return the serialized backers matching all the search terms."""
+
+    return get_index().get_results(terms)
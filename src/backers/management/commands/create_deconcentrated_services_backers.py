@@ -1,6 +1,7 @@
 # flake8: noqa
 from django.core.management.base import BaseCommand
 
+from backers.autocomplete import backer_index
 from backers.models import Backer
 from geofr.constants import OVERSEAS_REGIONS
 from geofr.models import Perimeter
@@ -42,6 +43,7 @@ class Command(BaseCommand):
                     name='{} — {}'.format(service, region.name)))
 
         results = Backer.objects.bulk_create(backers)
+        backer_index.invalidate()
         self.stdout.write(self.style.SUCCESS(
             '{} backers created'.format(len(results))
         ))
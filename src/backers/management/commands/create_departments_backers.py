@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 
+from backers.autocomplete import backer_index
 from backers.models import Backer
 from geofr.models import Perimeter
 
@@ -21,6 +22,7 @@ class Command(BaseCommand):
                 name='{} (Département)'.format(department.name)))
 
         results = Backer.objects.bulk_create(backers)
+        backer_index.invalidate()
         self.stdout.write(self.style.SUCCESS(
             '{} backers created'.format(len(results))
         ))
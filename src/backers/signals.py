@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from backers.autocomplete import backer_index
+from backers.models import Backer
+
+
+@receiver(post_save, sender=Backer)
+@receiver(post_delete, sender=Backer)
+def update_backer_index(sender, instance, raw=False, **kwargs):
+    """Backer names are searched with an in-memory index."""
+
+    if not raw:
+        backer_index.invalidate()
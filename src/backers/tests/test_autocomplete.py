@@ -0,0 +1,112 @@
+import pytest
+from django.urls import reverse
+
+from backers import autocomplete
+from backers.autocomplete import BackerIndex
+from backers.factories import BackerFactory
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def backers():
+    return {
+        'ademe': BackerFactory(name='ADEME'),
+        'ademe_occitanie': BackerFactory(
+            name='Ademe — Direction régionale Occitanie'),
+        'herault': BackerFactory(name='Hérault (Département)'),
+        'region': BackerFactory(name='Région Occitanie'),
+    }
+
+
+def search(terms):
+    index = BackerIndex.load('test')
+    return [result['text'] for result in index.get_results(terms)]
+
+
+def test_search_by_prefix(backers):
+    assert search(['ADEM']) == [
+        'ADEME', 'Ademe — Direction régionale Occitanie']
+    assert search(['occ']) == [
+        'Ademe — Direction régionale Occitanie', 'Région Occitanie']
+
+
+def test_search_matches_all_terms(backers):
+    assert search(['occ', 'ademe']) == [
+        'Ademe — Direction régionale Occitanie']
+    assert search(['occ', 'herault']) == []
+
+
+def test_search_ignores_accents(backers):
+    assert search(['herault']) == ['Hérault (Département)']
+    assert search(['RÉGION', 'occ']) == [
+        'Ademe — Direction régionale Occitanie', 'Région Occitanie']
+
+
+def test_search_terms_without_words_match_nothing(backers):
+    assert search(['---']) == []
+    assert search(['occ', '...']) == []
+
+
+def test_search_without_terms_lists_all_backers(backers):
+    assert len(search([])) == 4
+
+
+def test_results_are_serialized_when_accessed(backers):
+    results = autocomplete.get_index().get_results([])
+    assert not isinstance(results, list)
+    assert len(results) == 4
+    assert results[1:3] == [results[1], results[2]]
+    assert set(results[0].keys()) == {'id', 'text'}
+
+
+def test_index_is_rebuilt_when_backers_change(backers):
+    """Modifying a backer invalidates the in-memory index."""
+
+    old_index = autocomplete.get_index()
+    assert autocomplete.get_index() is old_index
+
+    backers['herault'].name = 'Département de l\'Hérault'
+    backers['herault'].save()
+    new_index = autocomplete.get_index()
+    assert new_index is not old_index
+    assert [result['text'] for result in new_index.get_results(['dep'])] == [
+        'Département de l\'Hérault']
+
+    backers['herault'].delete()
+    assert len(autocomplete.get_index().get_results(['dep'])) == 0
+
+
+def test_api_search(client, backers, django_assert_num_queries):
+    autocomplete.get_index()
+    url = reverse('backers-list')
+
+    with django_assert_num_queries(0):
+        res = client.get(url, {'q': 'régi occ'})
+    assert res.status_code == 200
+    assert res.json() == {
+        'count': 2,
+        'next': None,
+        'previous': None,
+        'results': [{
+            'id': backers['ademe_occitanie'].id_slug,
+            'text': 'Ademe — Direction régionale Occitanie',
+        }, {
+            'id': backers['region'].id_slug,
+            'text': 'Région Occitanie',
+        }],
+    }
+
+
+def test_api_ignores_short_terms(client, backers):
+    url = reverse('backers-list')
+    res = client.get(url, {'q': 'de occ'})
+    assert res.json()['count'] == 2
+
+
+def test_api_search_without_words(client, backers):
+    url = reverse('backers-list')
+    res = client.get(url, {'q': '---'})
+    assert res.status_code == 200
+    assert res.json()['count'] == 0
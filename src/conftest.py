@@ -1,6 +1,8 @@
 """Global fixtures for tests."""
 
 import pytest
+from django.conf import settings
+from django.core.cache import caches
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 
@@ -10,6 +12,14 @@ from geofr.factories import PerimeterFactory
 from geofr.models import Perimeter
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Make sure cached data does not leak from a test to another."""
+
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
 @pytest.fixture
 def user():
     """Generates a valid and active user."""
@@ -0,0 +1,55 @@
+"""Text helpers shared by the in-memory autocomplete indexes.
+
+See `geofr.autocomplete` and `backers.autocomplete`.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections.abc import Sequence
+
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Lowercase the text and remove accents."""
+
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed
+                   if not unicodedata.combining(char))
+
+
+def split_words(text):
+    return WORD_RE.findall(fold(text))
+
+
+def prefix_range(sorted_keys, prefix):
+    """Return the (start, end) positions of keys starting with `prefix`."""
+
+    start = bisect_left(sorted_keys, prefix)
+    end = bisect_left(sorted_keys, prefix + '\uffff', start)
+    return start, end
+
+
+class SearchResults(Sequence):
+    """The serialized objects matching a search.
+
+    `results` holds the indexed objects as tuples of `fields` values, and
+    `positions` the positions of the matching ones. Objects are only
+    serialized when accessed, so the results can be paginated without
+    building the full list.
+    """
+
+    def __init__(self, results, positions, fields):
+        self.results = results
+        self.positions = positions
+        self.fields = fields
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[position] for position in range(len(self))[key]]
+        return dict(zip(self.fields, self.results[self.positions[key]]))
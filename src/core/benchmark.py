@@ -0,0 +1,10 @@
+"""Helpers shared by the benchmark management commands."""
+
+
+class Rollback(Exception):
+    """Raised to roll back the synthetic fixtures of a benchmark.
+
+    Benchmarks run in a transaction, that is rolled back by raising this
+    exception once measures are done, so the db is left untouched.
+    """
+    pass
@@ -0,0 +1,80 @@
+"""Helpers to invalidate derived data shared by all workers."""
+
+import threading
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+# Stamps are stored in a dedicated cache, that never evicts them
+STAMPS_CACHE_ALIAS = 'stamps'
+
+
+def get_stamp(key):
+    """Return the current version stamp stored under `key`.
+
+    Version stamps are opaque values that change every time the underlying
+    data is modified. Derived data (in-memory indexes, cached results…) is
+    tagged with the stamp that was current when it was computed, and
+    considered stale as soon as the stamp changes.
+    """
+    cache = caches[STAMPS_CACHE_ALIAS]
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def bump_stamp(key):
+    """Invalidate all data tagged with the current stamp."""
+
+    caches[STAMPS_CACHE_ALIAS].set(key, uuid4().hex, timeout=None)
+
+
+class VersionedSingleton:
+    """Some derived data loaded once per worker, tagged with a stamp.
+
+    The data is built by calling `loader` with the current stamp, and is
+    loaded again upon next access every time the stamp stored under `key`
+    is bumped, by any worker.
+    """
+
+    def __init__(self, key, loader):
+        self.key = key
+        self.loader = loader
+        self.lock = threading.Lock()
+        # A (stamp, value) tuple, so both are always read together
+        self.current = None
+
+    def get_version(self):
+        return get_stamp(self.key)
+
+    def get(self, force_reload=False):
+        """Return the up-to-date value, loading it if necessary."""
+
+        version = self.get_version()
+        current = self.current
+        if force_reload or current is None or current[0] != version:
+            with self.lock:
+                current = self.current
+                if force_reload or current is None or current[0] != version:
+                    current = (version, self.loader(version))
+                    self.current = current
+        return current[1]
+
+    def bump(self):
+        """Tell all workers that the value must be loaded again."""
+
+        bump_stamp(self.key)
+
+    def invalidate(self):
+        """Make sure all workers load the value again.
+
+        The stamp is bumped right now so the current process sees its own
+        changes, and once again after the commit so other workers can't
+        load stale data in between.
+        """
+        self.bump()
+        transaction.on_commit(self.bump)
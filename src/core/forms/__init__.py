@@ -2,10 +2,11 @@ from core.forms.widgets import (
     AutocompleteSelect, AutocompleteSelectMultiple, MultipleChoiceFilterWidget)
 from core.forms.fields import (
     RichTextField, GroupedModelChoiceField, AutocompleteModelChoiceField,
-    AutocompleteModelMultipleChoiceField)
+    AutocompleteModelMultipleChoiceField, resolve_autocomplete_choices)
 
 __all__ = [
     'AutocompleteSelect', 'AutocompleteSelectMultiple',
     'MultipleChoiceFilterWidget', 'RichTextField', 'GroupedModelChoiceField',
     'AutocompleteModelChoiceField', 'AutocompleteModelMultipleChoiceField',
+    'resolve_autocomplete_choices',
 ]
@@ -2,6 +2,7 @@ from functools import partial
 from itertools import groupby
 from operator import attrgetter
 from django import forms
+from django.utils.functional import SimpleLazyObject
 
 from core.forms.widgets import AutocompleteSelect, AutocompleteSelectMultiple
 from dataproviders.utils import content_prettify
@@ -130,3 +131,44 @@ class AutocompleteModelMultipleChoiceField(forms.ModelMultipleChoiceField):
             value = [clean_val(val) for val in value]
 
         return super().prepare_value(value)
+
+
+def resolve_autocomplete_choices(form, field_names):
+    """Fetch the selected objects of several autocomplete fields at once.
+
+    Autocomplete widgets only render the selected options, but each of them
+    fetches its selected objects with a dedicated query. The given fields
+    must share the same queryset: their selected objects are fetched with a
+    single query, or not at all when the initial values are model instances
+    (e.g. the related objects of a model form's instance).
+
+    Objects are only fetched when the first widget is rendered.
+    """
+
+    bound_fields = [form[name] for name in field_names if name in form.fields]
+
+    def get_selected_objects():
+        objects = {}
+        pks = set()
+        for bound_field in bound_fields:
+            if not form.is_bound:
+                initial = bound_field.initial or []
+                objects.update(
+                    (obj.pk, obj) for obj in initial if hasattr(obj, '_meta'))
+
+            for value in bound_field.value() or []:
+                try:
+                    pks.add(int(value))
+                except (TypeError, ValueError):
+                    pass
+
+        pks -= set(objects)
+        if pks:
+            queryset = bound_fields[0].field.queryset
+            objects.update(
+                (obj.pk, obj) for obj in queryset.filter(pk__in=pks))
+        return objects
+
+    selected_objects = SimpleLazyObject(get_selected_objects)
+    for bound_field in bound_fields:
+        bound_field.field.widget.selected_objects = selected_objects
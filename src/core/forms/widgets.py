@@ -8,6 +8,10 @@ class AutocompleteMixin:
     the entire queryset as a huge <option> list.
     """
 
+    # The objects of the selected options, if they were already fetched
+    # (see `core.forms.resolve_autocomplete_choices`)
+    selected_objects = None
+
     def __init__(self, *args, **kwargs):
         self.choices = list()
         return super().__init__(*args, **kwargs)
@@ -44,9 +48,15 @@ class AutocompleteMixin:
 
         if not self.is_required and not self.allow_multiple_selected:
             default[1].append(self.create_option(name, '', '', False, 0))
+        if self.selected_objects is None:
+            objects = self.choices.queryset.filter(pk__in=selected_choices)
+        else:
+            objects = (self.selected_objects[pk]
+                       for pk in sorted(selected_choices)
+                       if pk in self.selected_objects)
         choices = (
             (obj.pk, self.choices.field.label_from_instance(obj))
-            for obj in self.choices.queryset.filter(pk__in=selected_choices)
+            for obj in objects
         )
         for option_value, option_label in choices:
             selected = (
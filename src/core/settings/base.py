@@ -170,6 +170,22 @@ TEMPLATES = [
     },
 ]
 
+# Invalidation stamps (see `core.cache`) are stored in their own cache, that
+# must never evict them: when a stamp disappears, all workers rebuild their
+# in-memory indexes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'stamps': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'stamps',
+    },
+}
+
+# How long (in seconds) search results are kept in cache
+SEARCH_CACHE_TIMEOUT = 60 * 15
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
@@ -221,6 +237,20 @@ SERVER_EMAIL = 'aides-territoires@beta.gouv.fr'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_WHITELIST = []
 
+# Analytics events are buffered and saved in batches
+STATS_BUFFER_EVENTS = True
+STATS_EVENTS_BUFFER_SIZE = 100
+STATS_EVENTS_FLUSH_INTERVAL = 10  # seconds
+STATS_EVENTS_CELERY_FLUSH = False
+
+# Alert emails delivery
+ALERTS_RENDER_WORKERS = 4
+ALERTS_EMAIL_BATCH_SIZE = 100
+ALERTS_EMAILS_PER_SECOND = 10
+
+# Cache of the incremental crawls of aid providers websites
+CRAWLER_CACHE_DIR = PROJECT_ROOT.child('var', 'crawler')
+
 SITE_ID = 1
 
 LOGIN_URL = 'login'
@@ -26,6 +26,29 @@ DATABASES = {
     'default': env.db()
 }
 
+# Caches must be shared by all workers.
+#
+# Search results are stored in the default cache, that evicts old entries
+# when full. Invalidation stamps (e.g search results, perimeter graph) are
+# stored in a separate cache that must never evict them, hence the huge
+# `MAX_ENTRIES` value (there are only a few stamps).
+CACHES = {
+    'default': env.cache(
+        'CACHE_URL', default='filecache:///var/tmp/aides-territoires-cache'),
+    'stamps': env.cache(
+        'STAMPS_CACHE_URL',
+        default='filecache:///var/tmp/aides-territoires-stamps'),
+}
+CACHES_MAX_ENTRIES = {
+    'default': env.int('CACHE_MAX_ENTRIES', default=5000),
+    'stamps': 1000000,
+}
+for alias, max_entries in CACHES_MAX_ENTRIES.items():
+    # Only the file and local memory backends evict entries by themselves
+    if CACHES[alias]['BACKEND'].endswith(('FileBasedCache', 'LocMemCache')):
+        CACHES[alias].setdefault('OPTIONS', {}) \
+            .setdefault('MAX_ENTRIES', max_entries)
+
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS')
 
 INTERNAL_IPS = env.list('INTERNAL_IPS')
@@ -59,6 +82,8 @@ ADMINS = [x.split(':') for x in env.list('ADMINS')]
 # For staging only, this will be ignored in production
 EMAIL_WHITELIST = env.list('EMAIL_WHITELIST', [])
 
+ALERTS_EMAILS_PER_SECOND = env.float('ALERTS_EMAILS_PER_SECOND', 10)
+
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
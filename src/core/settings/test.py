@@ -26,3 +26,6 @@ CELERY_TASK_EAGER_PROPAGATES = True
 # Piwik goal tracking ids
 GOAL_REGISTER_ID = 1
 GOAL_FIRST_LOGIN_ID = 2
+
+# Save analytics events immediately
+STATS_BUFFER_EVENTS = False
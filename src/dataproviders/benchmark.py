@@ -0,0 +1,77 @@
+"""The reference implementation of `content_prettify`, and its corpus.
+
+The sanitizer output is compared to the original BeautifulSoup
+implementation, on all the html texts of the recorded feeds (see the
+`benchmark_content_prettify` command and the sanitizer tests).
+"""
+
+import csv
+import json
+import os
+from html import unescape
+from unicodedata import normalize
+from xml.etree import ElementTree
+
+from bs4 import BeautifulSoup as bs
+
+from dataproviders.utils import ALLOWED_ATTRS, ALLOWED_TAGS, REMOVABLE_TAGS
+
+
+FEEDS_DIR = os.path.join(os.path.dirname(__file__), 'tests', 'feeds')
+
+# Html fields of the recorded feeds
+BPI_FIELDS = ('baseline', 'introduction_us', 'we', 'introduction_you', 'you')
+DREAL_FIELDS = ('objet', 'publicsBeneficiairesDetails')
+
+# Tags allowed in rich text fields (see `core.forms.fields.RichTextField`)
+RICH_TEXT_TAGS = ['a', 'blockquote', 'br', 'header', 'footer']
+
+
+def beautifulsoup_prettify(raw_text, more_allowed_tags=[]):
+    """The original BeautifulSoup implementation of `content_prettify`."""
+
+    allowed_tags = ALLOWED_TAGS + more_allowed_tags
+
+    unescaped = unescape(raw_text or '')
+    unquoted = unescaped \
+        .replace('“', '"') \
+        .replace('”', '"') \
+        .replace('’', "'")
+    normalized = normalize('NFKC', unquoted)
+
+    soup = bs(normalized, features='html.parser')
+    for tag in soup.find_all():
+        if tag.name in REMOVABLE_TAGS or not tag.name:
+            tag.decompose()
+        elif tag.name in allowed_tags:
+            for attr in list(tag.attrs.keys()):
+                if attr not in ALLOWED_ATTRS:
+                    tag.attrs.pop(attr)
+
+            if not tag.contents and not tag.name == 'br':
+                tag.decompose()
+            elif tag.string and not tag.string.strip():
+                tag.decompose()
+        else:
+            tag.unwrap()
+    return soup.prettify()
+
+
+def load_corpus(feeds_dir=FEEDS_DIR):
+    """Extract all the html texts from the recorded feeds."""
+
+    corpus = []
+
+    xml_root = ElementTree.parse(os.path.join(feeds_dir, 'ademe.xml'))
+    corpus += [elt.text for elt in xml_root.iter('presentation')]
+
+    with open(os.path.join(feeds_dir, 'bpi.json')) as json_file:
+        for line in json.load(json_file)['data']:
+            corpus += [line[field] for field in BPI_FIELDS]
+
+    with open(os.path.join(feeds_dir, 'dreal.csv')) as csv_file:
+        reader = csv.DictReader(csv_file, delimiter=';')
+        for line in reader:
+            corpus += [line[field] for field in DREAL_FIELDS]
+
+    return corpus
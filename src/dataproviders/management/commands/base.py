@@ -1,14 +1,27 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from xml.etree import ElementTree
+
 import scrapy
 from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.utils import IntegrityError
+from django.db.utils import DatabaseError
 from django.db.models import CharField
 from django.utils import timezone
 
 from aids.models import Aid
+from tags.models import Tag
 from aids.forms import AidEditForm
+from aids.search_cache import invalidate_search_cache
+from aids.search_documents import refresh_search_documents
+from dataproviders.scrapers.base import SeenIds
+from dataproviders.utils import FETCH_TIMEOUT, get_http_session
 
 
 # Call for projects will often contain those words
@@ -23,6 +36,58 @@ AAP_SYNONYMS = [
 
 ADMIN_ID = 1
 
+# Fields that are updated when an aid is imported again.
+# Other fields could have been manually modified on our side.
+UPDATED_FIELDS = ('origin_url', 'start_date', 'submission_deadline')
+
+# Number of rows inserted or updated in a single query
+BATCH_SIZE = 500
+
+CRAWLER_SETTINGS = {
+    'USER_AGENT': 'Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1)',
+    'LOG_LEVEL': 'INFO',
+    'DOWNLOAD_TIMEOUT': 120,
+    'RETRY_TIMES': 3,
+    'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+    'AUTOTHROTTLE_START_DELAY': 1,
+}
+
+# In incremental mode, crawled pages are stored in a persistent cache, and
+# revalidated with conditional requests.
+INCREMENTAL_CRAWLER_SETTINGS = {
+    'HTTPCACHE_ENABLED': True,
+    'HTTPCACHE_POLICY': 'dataproviders.scrapers.base.RevalidationPolicy',
+    'HTTPCACHE_GZIP': True,
+}
+
+
+def get_crawler_settings(incremental=False, concurrency=None,
+                         autothrottle=None):
+    """Return the settings of a crawler process.
+
+    Spiders define their own concurrency and throttling settings, that are
+    overridden by the `concurrency` and `autothrottle` values if given.
+    """
+    crawler_settings = Settings(CRAWLER_SETTINGS)
+    if incremental:
+        crawler_settings.setdict(INCREMENTAL_CRAWLER_SETTINGS)
+        crawler_settings.set(
+            'HTTPCACHE_DIR', os.path.join(settings.CRAWLER_CACHE_DIR, 'http'))
+
+    overrides = {}
+    if concurrency:
+        overrides['CONCURRENT_REQUESTS_PER_DOMAIN'] = concurrency
+        overrides['AUTOTHROTTLE_TARGET_CONCURRENCY'] = concurrency
+    if autothrottle is not None:
+        overrides['AUTOTHROTTLE_ENABLED'] = autothrottle
+    crawler_settings.setdict(overrides, priority='cmdline')
+    return crawler_settings
+
+
+def unique(objects):
+    """Remove duplicates from a list of model instances, keeping order."""
+    return list(OrderedDict((obj.pk, obj) for obj in objects).values())
+
 
 class BaseImportCommand(BaseCommand):
     """Base data import command.
@@ -30,20 +95,57 @@ class BaseImportCommand(BaseCommand):
     This base commands, meant to be inherited, provides a common structure
     for all commands that import aid data from third-party providers (Ademe,
     Dreal, etc.)
+
+    Lines that were already fetched (e.g by the `import_all` command) can be
+    passed with the `data` option.
     """
 
+    # The url of the data feed, for providers that publish one
+    FEED_URI = None
+
+    # The `requests` session used to download the feed
+    session = None
+
+    stealth_options = ('data',)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--changed-only', action='store_true',
+            help='Skip the records that did not change since the last import')
+
     def populate_cache(self, *args, **options):
         pass
 
     def handle(self, *args, **options):
         self.populate_cache(*args, **options)
-        data = self.fetch_data(**options)
-        aid_and_financers = []
+        data = options.get('data')
+        if data is None:
+            data = self.fetch_data(**options)
+
+        # In "changed only" mode, records whose raw data is exactly the same
+        # as during the previous import are not processed at all.
+        changed_only = options.get('changed_only', False)
+        known_hashes = self.get_known_hashes() if changed_only else {}
+        lines = []
+        skipped_uniqueids = []
         for line in data:
-            if self.line_should_be_processed(line):
-                aid_and_financers.append(self.process_line(line))
+            if not self.line_should_be_processed(line):
+                continue
+
+            line_hash = self.get_line_hash(line)
+            if changed_only:
+                uniqueid = self.extract_import_uniqueid(line)
+                if known_hashes.get(uniqueid) == line_hash:
+                    skipped_uniqueids.append(uniqueid)
+                    continue
+
+            processed_line = self.process_line(line)
+            processed_line[0].import_raw_hash = line_hash
+            lines.append(processed_line)
 
-        # Let's try to actually save the imported aid.
+        skipped_uniqueids += self.get_skipped_uniqueids()
+
+        # Let's try to actually save the imported aids.
         #
         # For each aid, we have two cases:
         #   1) The aid is actually new, so we just create it.
@@ -51,54 +153,238 @@ class BaseImportCommand(BaseCommand):
         #      we just update a few fields but we don't overwrite some
         #      manual modifications that could have been made from our side.
         #
-        # For the moment, since the data is not huge (there are probably a few
-        # dozains aids per provider at best), I decided to focus on code
-        # readability and not to focus on optimizing the number of db queries.
-        created_counter = 0
-        updated_counter = 0
+        # Some feeds contain thousands of aids, so everything is done in
+        # batches: a single query to find existing aids, then bulk inserts
+        # and updates.
         with transaction.atomic():
-            for aid, financers, instructors, categories in aid_and_financers:
-                try:
-                    with transaction.atomic():
-                        aid.set_search_vector(financers, instructors)
-                        aid.save()
-                        aid.financers.set(financers)
-                        aid.instructors.set(instructors)
-                        aid.categories.set(categories)
-                        aid.populate_tags()
-                        created_counter += 1
-                        self.stdout.write(self.style.SUCCESS(
-                            'New aid: {}'.format(aid.name)))
-
-                except IntegrityError as e:
-                    self.stdout.write(self.style.ERROR(str(e)))
-                    Aid.objects \
-                        .filter(import_uniqueid=aid.import_uniqueid) \
-                        .update(
-                            origin_url=aid.origin_url,
-                            start_date=aid.start_date,
-                            submission_deadline=aid.submission_deadline,
-                            date_updated=timezone.now(),
-                            import_last_access=timezone.now())
-                    updated_counter += 1
-                    self.stdout.write(self.style.SUCCESS(
-                        'Updated aid: {}'.format(aid.name)))
-
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(
-                        'Cannot import aid {}: {}'.format(aid.name, e)))
+            lines = self.deduplicate_lines(lines)
+            existing_aids = self.get_existing_aids(lines)
+            new_lines = [
+                line for line in lines
+                if line[0].import_uniqueid not in existing_aids]
+            known_aids = [
+                line[0] for line in lines
+                if line[0].import_uniqueid in existing_aids]
+
+            created_aids = self.create_aids(new_lines)
+            updated_aids, unchanged_aids = self.update_aids(
+                known_aids, existing_aids)
+            self.touch_skipped_aids(skipped_uniqueids)
+
+            # Bulk queries do not send any signal
+            refresh_search_documents(
+                [aid.id for aid in created_aids + updated_aids])
+            invalidate_search_cache()
 
         self.stdout.write(self.style.SUCCESS(
-            '{} aids created, {} aids updated'.format(
-                created_counter, updated_counter)))
+            '{} aids created, {} aids updated, {} aids unchanged, '
+            '{} aids skipped'.format(
+                len(created_aids), len(updated_aids), len(unchanged_aids),
+                len(skipped_uniqueids))))
+
+    def serialize_line(self, line):
+        """Return a canonical text version of a raw data line.
+
+        Lines are xml elements, or dict-like objects (json objects, csv rows,
+        scrapy items). Override this method for other formats.
+
+        Whitespace is normalized, so a reformatted feed is not considered
+        modified.
+        """
+        if isinstance(line, ElementTree.Element):
+            xml = ElementTree.tostring(line, encoding='unicode')
+            return ' '.join(xml.split())
+
+        values = {
+            key: ' '.join(value.split()) if isinstance(value, str) else value
+            for key, value in dict(line).items()}
+        return json.dumps(values, sort_keys=True, default=str)
+
+    def get_line_hash(self, line):
+        """Return a hash of the line raw data."""
+
+        serialized = self.serialize_line(line)
+        return hashlib.sha256(serialized.encode()).hexdigest()
 
-    def fetch_data(self):
+    def get_known_hashes(self):
+        """Return the raw data hashes of imported aids, by unique id."""
+
+        known_aids = Aid.all_aids \
+            .filter(is_imported=True, import_raw_hash__isnull=False) \
+            .values_list('import_uniqueid', 'import_raw_hash')
+        return dict(known_aids)
+
+    def get_skipped_uniqueids(self):
+        """Return the unique ids of records skipped while fetching data."""
+        return []
+
+    def touch_skipped_aids(self, uniqueids):
+        """Records unchanged upstream are still present in the feed."""
+
+        if uniqueids:
+            Aid.all_aids \
+                .filter(import_uniqueid__in=uniqueids) \
+                .update(import_last_access=timezone.now())
+
+    def deduplicate_lines(self, lines):
+        """Only keep the first occurrence of every imported aid."""
+
+        unique_lines = OrderedDict()
+        for line in lines:
+            unique_lines.setdefault(line[0].import_uniqueid, line)
+        return list(unique_lines.values())
+
+    def get_existing_aids(self, lines):
+        """Return the aids that were already imported, by unique id."""
+
+        uniqueids = [line[0].import_uniqueid for line in lines]
+        existing_aids = Aid.all_aids \
+            .filter(import_uniqueid__in=uniqueids) \
+            .only('id', 'import_uniqueid', 'import_raw_hash', *UPDATED_FIELDS)
+        return {aid.import_uniqueid: aid for aid in existing_aids}
+
+    def create_aids(self, lines):
+        """Insert new aids and their relations in bulk."""
+
+        aids = []
+        for aid, financers, instructors, categories in lines:
+            aid.set_slug()
+            aid.set_publication_date()
+            aids.append(aid)
+
+        try:
+            with transaction.atomic():
+                Aid.objects.bulk_create(aids, batch_size=BATCH_SIZE)
+        except DatabaseError:
+            # A single invalid aid makes the whole batch fail, so we fall
+            # back to creating aids one at a time.
+            aids = self.create_aids_one_by_one(aids)
+
+        # Aids that could not be created don't have a pk
+        self.create_relations([line for line in lines if line[0].pk])
+
+        for aid in aids:
+            self.stdout.write(self.style.SUCCESS(
+                'New aid: {}'.format(aid.name)))
+        return aids
+
+    def create_aids_one_by_one(self, aids):
+        created_aids = []
+        for aid in aids:
+            aid.pk = None
+            try:
+                with transaction.atomic():
+                    aid.save()
+                created_aids.append(aid)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(
+                    'Cannot import aid {}: {}'.format(aid.name, e)))
+        return created_aids
+
+    def create_relations(self, lines):
+        """Insert the m2m relations of new aids with through models."""
+
+        Financers = Aid.financers.through
+        Instructors = Aid.instructors.through
+        Categories = Aid.categories.through
+        Tags = Aid._tags_m2m.through
+
+        tags = self.get_tags(
+            tag for line in lines for tag in line[0].tags or [])
+
+        financer_rows = []
+        instructor_rows = []
+        category_rows = []
+        tag_rows = []
+        for aid, financers, instructors, categories in lines:
+            financer_rows += [
+                Financers(aid_id=aid.id, backer_id=backer.id)
+                for backer in unique(financers)]
+            instructor_rows += [
+                Instructors(aid_id=aid.id, backer_id=backer.id)
+                for backer in unique(instructors)]
+            category_rows += [
+                Categories(aid_id=aid.id, category_id=category.id)
+                for category in unique(categories)]
+            tag_rows += [
+                Tags(aid_id=aid.id, tag_id=tags[name].id)
+                for name in set(aid.tags or [])]
+
+        Financers.objects.bulk_create(financer_rows, batch_size=BATCH_SIZE)
+        Instructors.objects.bulk_create(instructor_rows, batch_size=BATCH_SIZE)
+        Categories.objects.bulk_create(category_rows, batch_size=BATCH_SIZE)
+        Tags.objects.bulk_create(tag_rows, batch_size=BATCH_SIZE)
+
+    def get_tags(self, names):
+        """Return a {name: Tag} dict, missing tags are created."""
+
+        names = set(names)
+        tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+        missing_tags = [Tag(name=name) for name in names - set(tags)]
+        for tag in Tag.objects.bulk_create(missing_tags):
+            tags[tag.name] = tag
+        return tags
+
+    def update_aids(self, aids, existing_aids):
+        """Update the known aids that were modified upstream.
+
+        Returns the lists of updated and unchanged aids.
+        """
+        now = timezone.now()
+        updated_aids = []
+        unchanged_aids = []
+        for aid in aids:
+            existing_aid = existing_aids[aid.import_uniqueid]
+            changed = False
+            for field in UPDATED_FIELDS:
+                value = getattr(aid, field)
+                if getattr(existing_aid, field) != value:
+                    setattr(existing_aid, field, value)
+                    changed = True
+
+            # The hash must be stored even if none of the updated fields
+            # were modified, for the record to be skipped next time.
+            if existing_aid.import_raw_hash != aid.import_raw_hash:
+                existing_aid.import_raw_hash = aid.import_raw_hash
+                changed = True
+
+            existing_aid.import_last_access = now
+            if changed:
+                existing_aid.date_updated = now
+                updated_aids.append(existing_aid)
+                self.stdout.write(self.style.SUCCESS(
+                    'Updated aid: {}'.format(aid.name)))
+            else:
+                unchanged_aids.append(existing_aid)
+
+        Aid.all_aids.bulk_update(
+            updated_aids,
+            UPDATED_FIELDS + (
+                'import_raw_hash', 'date_updated', 'import_last_access'),
+            batch_size=BATCH_SIZE)
+        Aid.all_aids \
+            .filter(id__in=[aid.id for aid in unchanged_aids]) \
+            .update(import_last_access=now)
+        return updated_aids, unchanged_aids
+
+    def fetch_data(self, **options):
         """Download and / or parse the data file.
 
         Must return an iterator.
         """
         raise NotImplementedError
 
+    def download_feed(self):
+        """Download the provider data feed.
+
+        Returns a `requests` response. Connection and server errors are
+        retried, other errors raise an exception.
+        """
+        session = self.session or get_http_session()
+        response = session.get(self.FEED_URI, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response
+
     def line_should_be_processed(self, line):
         return True
 
@@ -188,23 +474,81 @@ class BaseImportCommand(BaseCommand):
 
 
 class CrawlerImportCommand(BaseImportCommand):
-    """An import task that uses a crawler to fetch data."""
+    """An import task that uses a crawler to fetch data.
 
-    def fetch_data(self, **options):
-        results = []
-        process = CrawlerProcess({
-            'USER_AGENT': 'Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1)',
-            'LOG_LEVEL': 'INFO',
-        })
-        process.crawl(self.SPIDER_CLASS)
+    In incremental mode, crawled pages are cached on disk and revalidated
+    with conditional requests. The detail pages of aids that were already
+    crawled are not fetched at all, unless their data in the listing pages
+    changed.
+    """
 
-        def add_to_results(item, response, spider):
-            results.append(item)
+    # The signatures of the crawled aids, in incremental mode
+    seen_ids = None
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only crawl the pages modified since the last import')
+        parser.add_argument(
+            '--concurrency', type=int,
+            help='Number of concurrent requests (overrides spider settings)')
+        parser.add_argument(
+            '--no-autothrottle', action='store_false', dest='autothrottle',
+            default=None, help='Disable the automatic requests throttling')
 
-        for p in process.crawlers:
-            p.signals.connect(
-                add_to_results, signal=scrapy.signals.item_scraped)
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+
+        # Signatures are only stored once aids were successfully imported
+        if self.seen_ids is not None:
+            self.seen_ids.save()
+
+    def fetch_data(self, **options):
+        incremental = options.get('incremental', False)
+        process = CrawlerProcess(get_crawler_settings(
+            incremental,
+            options.get('concurrency'),
+            options.get('autothrottle')))
+        results = self.crawl(process, incremental)
         process.start()
 
         for result in results:
             yield result
+
+    def crawl(self, process, incremental=False):
+        """Schedule the spider in the given crawler process.
+
+        Returns the list that scraped items are appended to, once the
+        process is started.
+        """
+        results = []
+
+        def add_to_results(item, response, spider):
+            results.append(item)
+
+        self.seen_ids = self.load_seen_ids() if incremental else None
+        self.crawler = process.create_crawler(self.SPIDER_CLASS)
+        # Signal receivers are weak references by default, and this one
+        # would be garbage collected as soon as this method returns.
+        self.crawler.signals.connect(
+            add_to_results, signal=scrapy.signals.item_scraped, weak=False)
+        process.crawl(self.crawler, seen_ids=self.seen_ids)
+        return results
+
+    def load_seen_ids(self):
+        """Return the aids found during the previous crawls."""
+
+        path = os.path.join(
+            settings.CRAWLER_CACHE_DIR, 'seen_ids',
+            '{}.json'.format(self.SPIDER_CLASS.name))
+        return SeenIds(path, self.get_import_uniqueid)
+
+    def get_import_uniqueid(self, uniqueid):
+        """Return the import unique id from the spider's id."""
+        return self.extract_import_uniqueid({'uniqueid': uniqueid})
+
+    def get_skipped_uniqueids(self):
+        if self.seen_ids is None:
+            return []
+        return self.seen_ids.skipped
@@ -0,0 +1,69 @@
+"""Compare the BeautifulSoup and the streaming html sanitizers."""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from dataproviders.benchmark import (
+    FEEDS_DIR, RICH_TEXT_TAGS, beautifulsoup_prettify, load_corpus)
+from dataproviders.utils import cached_content_prettify, content_prettify
+
+
+class Command(BaseCommand):
+    """Benchmark the cleaning of imported html content.
+
+    Every text of the recorded feeds corpus is cleaned with the original
+    BeautifulSoup implementation, with the sanitizer (memoization
+    disabled), and with the memoized `content_prettify` (as during an
+    import of the same feed again). Outputs are checked to be identical.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--feeds-dir', default=FEEDS_DIR,
+            help='Directory of the recorded feeds')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Number of runs for each implementation')
+
+    def handle(self, *args, **options):
+        corpus = load_corpus(options['feeds_dir'])
+        nb_chars = sum(len(text) for text in corpus)
+        self.stdout.write('Cleaning {} texts ({} chars)\n'.format(
+            len(corpus), nb_chars))
+
+        def sanitizer_prettify(raw_text, more_allowed_tags=[]):
+            return cached_content_prettify.__wrapped__(
+                raw_text or '', tuple(more_allowed_tags))
+
+        cached_content_prettify.cache_clear()
+        implementations = (
+            ('bs4', beautifulsoup_prettify),
+            ('sanitizer', sanitizer_prettify),
+            ('memoized', content_prettify),
+        )
+        outputs = []
+        timings = []
+        for name, prettify in implementations:
+            outputs.append([
+                prettify(text, more_allowed_tags)
+                for text in corpus
+                for more_allowed_tags in ([], RICH_TEXT_TAGS)])
+
+            runs = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                for text in corpus:
+                    prettify(text)
+                    prettify(text, RICH_TEXT_TAGS)
+                runs.append((time.perf_counter() - start) * 1000)
+            timings.append(statistics.median(runs))
+
+            self.stdout.write('  {:<10} {:8.2f}ms  x{:.1f}'.format(
+                name, timings[-1], timings[0] / timings[-1]))
+
+        if all(output == outputs[0] for output in outputs):
+            self.stdout.write(self.style.SUCCESS('Outputs are identical'))
+        else:
+            self.stdout.write(self.style.ERROR('Outputs differ!'))
@@ -1,7 +1,6 @@
 import os
 from datetime import datetime
 from xml.etree import ElementTree
-import requests
 
 from dataproviders.utils import content_prettify
 from dataproviders.management.commands.base import BaseImportCommand
@@ -52,7 +51,10 @@ ADEME_URL = 'https://www.ademe.fr/'
 class Command(BaseImportCommand):
     """Import data from the Ademe data feed."""
 
+    FEED_URI = FEED_URI
+
     def add_arguments(self, parser):
+        super().add_arguments(parser)
         parser.add_argument('data-file', nargs='?', type=str)
 
     def fetch_data(self, **options):
@@ -63,8 +65,8 @@ class Command(BaseImportCommand):
             xml_tree = ElementTree.parse(data_file)
             xml_root = xml_tree.getroot()
         else:
-            req = requests.get(FEED_URI)
-            xml_root = ElementTree.fromstring(req.text)
+            response = self.download_feed()
+            xml_root = ElementTree.fromstring(response.text)
 
         for xml_elt in xml_root:
             if xml_elt.tag == 'appel':
@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from scrapy.crawler import CrawlerProcess
+
+from django.core.management import call_command, load_command_class
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from dataproviders.management.commands.base import (
+    CrawlerImportCommand, get_crawler_settings)
+from dataproviders.utils import get_http_session
+
+
+# The Loire-Bretagne data file was manually built, so it's not part of the
+# regular imports.
+PROVIDERS = ('ademe', 'bpi', 'dreal', 'grand_est', 'occitanie', 'rmc')
+
+
+class Command(BaseCommand):
+    """Import data from all the providers at once.
+
+    Downloading the feeds takes most of the time, so all feeds are
+    fetched concurrently: http feeds are downloaded in a pool of threads
+    sharing a single connection pool, and all websites are crawled in a
+    single crawler process.
+
+    Aids are then saved serially, one provider after the other, each one
+    in its own transaction.
+
+    A provider that cannot be fetched or saved does not prevent other
+    providers from being imported.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--providers', nargs='+', choices=PROVIDERS, default=PROVIDERS,
+            help='Only import data from those providers')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of feeds downloaded in parallel')
+        parser.add_argument(
+            '--changed-only', action='store_true',
+            help='Skip the records that did not change since the last import')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only crawl the pages modified since the last import')
+
+    def handle(self, *args, **options):
+        commands = OrderedDict(
+            (provider, load_command_class(
+                'dataproviders', 'import_{}'.format(provider)))
+            for provider in options['providers'])
+        feeds = OrderedDict(
+            (provider, command) for provider, command in commands.items()
+            if not isinstance(command, CrawlerImportCommand))
+        crawlers = OrderedDict(
+            (provider, command) for provider, command in commands.items()
+            if isinstance(command, CrawlerImportCommand))
+
+        # The crawler process must run in the main thread, while the http
+        # feeds are downloaded in the background.
+        session = get_http_session(pool_size=options['workers'])
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = OrderedDict(
+                (provider, executor.submit(self.fetch, command, session))
+                for provider, command in feeds.items())
+            fetched = self.crawl(crawlers, options['incremental'])
+
+            for provider, future in futures.items():
+                try:
+                    fetched[provider] = future.result()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(
+                        'Cannot fetch {} data: {}'.format(provider, e)))
+
+        timings = []
+        for provider, command in commands.items():
+            if provider not in fetched:
+                continue
+
+            lines, fetch_duration = fetched[provider]
+            start = time.monotonic()
+            try:
+                call_command(
+                    command,
+                    data=lines,
+                    changed_only=options['changed_only'],
+                    stdout=self.stdout)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(
+                    'Cannot import {} data: {}'.format(provider, e)))
+                continue
+            save_duration = time.monotonic() - start
+            timings.append((provider, len(lines), fetch_duration,
+                            save_duration))
+
+        for provider, nb_lines, fetch_duration, save_duration in timings:
+            self.stdout.write(self.style.SUCCESS(
+                '{}: {} lines fetched in {:.2f}s, saved in {:.2f}s'.format(
+                    provider, nb_lines, fetch_duration, save_duration)))
+
+    def fetch(self, command, session):
+        """Download and parse a single feed.
+
+        Returns the (lines, duration) tuple.
+        """
+        start = time.monotonic()
+        command.session = session
+        try:
+            lines = list(command.fetch_data(**{'data-file': None}))
+        finally:
+            # Every thread has its own db connection
+            connection.close()
+        return lines, time.monotonic() - start
+
+    def crawl(self, commands, incremental=False):
+        """Run all the spiders in a single crawler process.
+
+        Returns a {provider: (lines, duration)} dict.
+        """
+        if not commands:
+            return {}
+
+        process = CrawlerProcess(get_crawler_settings(incremental))
+        results = OrderedDict(
+            (provider, command.crawl(process, incremental))
+            for provider, command in commands.items())
+        process.start()
+
+        fetched = {}
+        for provider, command in commands.items():
+            duration = command.crawler.stats.get_value(
+                'elapsed_time_seconds', 0)
+            fetched[provider] = results[provider], duration
+        return fetched
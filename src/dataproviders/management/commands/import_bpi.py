@@ -1,5 +1,4 @@
 import os
-import requests
 import json
 
 from dataproviders.utils import content_prettify
@@ -29,7 +28,10 @@ CONTACT_URL = 'https://www.bpifrance.fr/Contactez-nous'
 class Command(BaseImportCommand):
     """Import data from the DREAL data feed."""
 
+    FEED_URI = FEED_URI
+
     def add_arguments(self, parser):
+        super().add_arguments(parser)
         parser.add_argument('data-file', nargs='?', type=str)
 
     def fetch_data(self, **options):
@@ -40,9 +42,10 @@ class Command(BaseImportCommand):
                 yield line
 
         else:
-            req = requests.get(FEED_URI)
-            req.encoding = 'utf-8-sig'  # We need this to take care of the bom
-            data = json.loads(req.text)
+            response = self.download_feed()
+            # We need this to take care of the bom
+            response.encoding = 'utf-8-sig'
+            data = json.loads(response.text)
             for line in data['data']:
                 yield line
 
@@ -1,7 +1,6 @@
 import os
 from datetime import date, datetime
 import re
-import requests
 import csv
 
 from django.contrib.postgres.search import TrigramSimilarity
@@ -31,7 +30,10 @@ ADDNA_URL = 'http://aides-dd-na.fr/'
 class Command(BaseImportCommand):
     """Import data from the DREAL data feed."""
 
+    FEED_URI = FEED_URI
+
     def add_arguments(self, parser):
+        super().add_arguments(parser)
         parser.add_argument('data-file', nargs='?', type=str)
 
     def fetch_data(self, **options):
@@ -46,10 +48,11 @@ class Command(BaseImportCommand):
                     yield csv_line
 
         else:
-            req = requests.get(FEED_URI)
-            req.encoding = 'utf-8-sig'  # We need this to take care of the bom
+            response = self.download_feed()
+            # We need this to take care of the bom
+            response.encoding = 'utf-8-sig'
             csv_reader = csv.DictReader(
-                req.iter_lines(decode_unicode=True),
+                response.iter_lines(decode_unicode=True),
                 delimiter=';',
                 lineterminator='\r\n')
 
@@ -98,7 +101,7 @@ class Command(BaseImportCommand):
 
     def extract_description(self, line):
         description = content_prettify(line['objet'])
-        return content_prettify(description)
+        return description
 
     def extract_eligibility(self, line):
         eligibility = line['publicsBeneficiairesDetails']
@@ -33,6 +33,7 @@ class Command(BaseImportCommand):
     """
 
     def add_arguments(self, parser):
+        super().add_arguments(parser)
         parser.add_argument('data-file', nargs=1, type=str)
 
     def fetch_data(self, **options):
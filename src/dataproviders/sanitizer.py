@@ -0,0 +1,458 @@
+"""A fast html sanitizer.
+
+This is a lightweight replacement for the BeautifulSoup based cleaning of
+imported content, with exactly the same output as BeautifulSoup's
+`prettify` (with the `html.parser` feature).
+
+Well-formed html is split on tags with a regular expression, and every
+distinct tag is only parsed once. As soon as something unusual is met
+(script tags, doctypes, invalid tags, etc.), the markup is parsed again
+with the standard library parser, which is what BeautifulSoup uses. In
+both cases, the tree is built with the same rules as BeautifulSoup, then
+cleaned and serialized in a single pass.
+
+Only a minimal tree is built, because the cleaning rules need to know if
+a tag has some content before deciding to keep it.
+"""
+
+import re
+from functools import lru_cache
+from html import unescape
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Tags that never have any content
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'menuitem', 'meta', 'param', 'source', 'track', 'wbr',
+    'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex', 'nextid',
+    'spacer',
+}
+
+# Tags whose content is not indented
+PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+
+# Tags whose content is not parsed as html, depending on the python version
+RAW_TEXT_TAGS = {
+    'script', 'style', 'xmp', 'iframe', 'noembed', 'noframes', 'noscript',
+    'textarea', 'title', 'plaintext',
+}
+
+SPACE = r'[ \t\n\r\f]'
+
+ATTRIBUTE = r"""
+    [a-zA-Z_:][-a-zA-Z0-9_:.]*
+    (?:{space}*={space}*(?:"[^"]*"|'[^']*'|[^ \t\n\r\f"'=<>`]+))?
+""".format(space=SPACE)
+
+# Html is split on everything that looks like a tag, text and tags are then
+# tokenized separately. Tags are few and repeated over and over in imported
+# content, so they are parsed once (see `parse_tag`).
+SPLIT_RE = re.compile(r'(<[^<>]*>)')
+
+# The subset of html that is tokenized without the standard library parser.
+# Script and style tags are only supported if they contain no markup at
+# all (they are removed anyway).
+TAG_RE = re.compile(r"""
+    <(?P<start>[a-zA-Z][a-zA-Z0-9]*)
+        (?P<attrs>(?:{space}+{attribute})*)
+        {space}*(?P<closed>/?)>
+    | </(?P<end>[a-zA-Z][a-zA-Z0-9]*){space}*>
+    | <!--(?P<comment>(?![->])(?:(?!--)[^\x00])*)-->
+""".format(space=SPACE, attribute=ATTRIBUTE), re.VERBOSE)
+
+TEXT_RE = re.compile(r"""
+    (?P<text>[^<&]+)
+    | &\#(?P<decimal>[0-9]+);
+    | &\#(?P<hexadecimal>[xX][0-9a-fA-F]+);
+    | &(?P<entity>[a-zA-Z][a-zA-Z0-9]*);
+    | (?P<char>[<&])(?={space})
+    | (?P<unsupported>[\s\S])
+""".format(space=SPACE), re.VERBOSE)
+
+ATTR_RE = re.compile(r"""
+    ([a-zA-Z_:][-a-zA-Z0-9_:.]*)
+    (?:{space}*={space}*("[^"]*"|'[^']*'|[^ \t\n\r\f"'=<>`]+))?
+""".format(space=SPACE), re.VERBOSE)
+
+INDENT = ' '
+
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+def get_character(codepoint):
+    """Return the character of a numeric character reference.
+
+    Invalid code points are replaced, and references in the 128-159 range
+    are considered as windows-1252 characters (following the html spec).
+    """
+    if codepoint == 0 or codepoint > 0x10ffff or \
+            0xd800 <= codepoint <= 0xdfff:
+        return '\ufffd'
+    if 0x80 <= codepoint <= 0x9f:
+        try:
+            return bytes([codepoint]).decode('windows-1252')
+        except UnicodeDecodeError:
+            pass
+    return chr(codepoint)
+
+
+class Element:
+    """An html tag."""
+
+    __slots__ = ('name', 'attrs', 'children')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children = []
+
+
+class Markup(str):
+    """Some text that is rendered without escaping (comments, etc.)."""
+
+    def __new__(cls, text, template):
+        markup = super().__new__(cls, text)
+        markup.template = template
+        return markup
+
+
+class UnsupportedMarkup(Exception):
+    pass
+
+
+class TreeBuilder(HTMLParser):
+    """Build a tree of `Element` objects, strings and `Markup` objects."""
+
+    def __init__(self):
+        # The standard library parser is only initialized when needed
+        self.init_tree()
+
+    def init_tree(self):
+        self.root = Element(None, {})
+        self.stack = [self.root]
+        self.data = []
+        self.already_closed_void_tags = []
+
+    def build(self, html):
+        try:
+            self.tokenize(html)
+        except UnsupportedMarkup:
+            super().__init__(convert_charrefs=False)
+            self.init_tree()
+            self.feed(html)
+            self.close()
+        self.flush()
+        return self.root
+
+    def tokenize(self, html):
+        """Send parser events for well-formed html.
+
+        Events are the same as the ones the standard library parser would
+        send, otherwise an `UnsupportedMarkup` exception is raised.
+        """
+        data = self.data
+        stack = self.stack
+        pieces = iter(SPLIT_RE.split(html))
+        for text in pieces:
+            if '<' in text or '&' in text:
+                self.tokenize_text(text)
+            elif text:
+                data.append(text)
+
+            tag = next(pieces, None)
+            if tag is None:
+                break
+            token = parse_tag(tag)
+            if token is None:
+                raise UnsupportedMarkup()
+
+            # Most frequent events are handled inline
+            kind = token[0]
+            if kind == 'start':
+                if data:
+                    self.flush()
+                name = token[1]
+                element = Element(name, dict(token[2]))
+                stack[-1].children.append(element)
+                if name in VOID_TAGS:
+                    self.already_closed_void_tags.append(name)
+                else:
+                    stack.append(element)
+            elif kind == 'end':
+                name = token[1]
+                if stack[-1].name == name and len(stack) > 1:
+                    if data:
+                        self.flush()
+                    stack.pop()
+                else:
+                    self.handle_endtag(name)
+            elif kind == 'startend':
+                self.handle_startendtag(token[1], token[2])
+            elif kind == 'comment':
+                self.handle_comment(token[1])
+            else:
+                # Raw text tags are closed right away, with the same name
+                raw_text = next(pieces)
+                end_tag = next(pieces, None)
+                if '<' in raw_text or end_tag is None or \
+                        end_tag[:2] != '</' or \
+                        end_tag[2:-1].rstrip(ASCII_SPACES) != token[2]:
+                    raise UnsupportedMarkup()
+                self.handle_starttag(token[1], [])
+                if raw_text:
+                    data.append(raw_text)
+                self.handle_endtag(token[1])
+
+    def tokenize_text(self, text):
+        data = self.data
+        for match in TEXT_RE.finditer(text):
+            kind = match.lastgroup
+            if kind == 'text':
+                data.append(match.group('text'))
+            elif kind in ('decimal', 'hexadecimal'):
+                self.handle_charref(match.group(kind))
+            elif kind == 'entity':
+                self.handle_entityref(match.group('entity'))
+            elif kind == 'char':
+                data.append(match.group('char'))
+            else:
+                raise UnsupportedMarkup()
+
+    def flush(self, template=None):
+        data = self.data
+        if data:
+            text = data[0] if len(data) == 1 else ''.join(data)
+            data.clear()
+
+            # Whitespace only strings are collapsed (even empty ones)
+            if not text.strip(ASCII_SPACES) and not any(
+                    element.name in PRESERVE_WHITESPACE_TAGS
+                    for element in self.stack):
+                text = '\n' if '\n' in text else ' '
+            node = Markup(text, template) if template else text
+            self.stack[-1].children.append(node)
+
+    def handle_starttag(self, tag, attrs, is_void=True):
+        if self.data:
+            self.flush()
+        element = Element(tag, {
+            name: '' if value is None else value
+            for name, value in attrs} if attrs else {})
+        self.stack[-1].children.append(element)
+        self.stack.append(element)
+        if is_void and tag in VOID_TAGS:
+            self.stack.pop()
+            self.already_closed_void_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, is_void=False)
+        self.close_tag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.already_closed_void_tags:
+            self.already_closed_void_tags.remove(tag)
+        else:
+            self.close_tag(tag)
+
+    def close_tag(self, tag):
+        """Close the most recent open tag with this name, if any."""
+
+        if self.data:
+            self.flush()
+        stack = self.stack
+        if len(stack) > 1 and stack[-1].name == tag:
+            stack.pop()
+            return
+        for index in range(len(stack) - 2, 0, -1):
+            if stack[index].name == tag:
+                del stack[index:]
+                break
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        if name[:1] in ('x', 'X'):
+            codepoint = int(name[1:], 16)
+        else:
+            codepoint = int(name)
+        self.data.append(get_character(codepoint))
+
+    def handle_entityref(self, name):
+        self.data.append(html5.get(name + ';', '&' + name))
+
+    def handle_comment(self, data):
+        self.add_markup(data, '<!--{}-->')
+
+    def handle_decl(self, decl):
+        self.add_markup(decl[len('DOCTYPE '):], '<!DOCTYPE {}>\n')
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self.add_markup(data[len('CDATA['):], '<![CDATA[{}]]>')
+        else:
+            self.add_markup(data, '<?{}?>')
+
+    def handle_pi(self, data):
+        self.add_markup(data, '<?{}>')
+
+    def add_markup(self, text, template):
+        self.flush()
+        self.data.append(text)
+        self.flush(template)
+
+
+def parse_attr_value(value):
+    """Unquote and unescape an attribute value, like the standard parser."""
+
+    if not value:
+        return None
+    if value[:1] in ('"', "'"):
+        value = value[1:-1]
+    return unescape(value) if value else value
+
+
+@lru_cache(maxsize=1024)
+def parse_tag(tag):
+    """Return the parser event of a tag, as a `(kind, name, ...)` tuple.
+
+    Return None if the tag is not supported.
+    """
+    match = TAG_RE.fullmatch(tag)
+    if match is None:
+        return None
+
+    kind = match.lastgroup
+    if kind == 'end':
+        return ('end', match.group('end').lower())
+    if kind == 'comment':
+        return ('comment', match.group('comment'))
+
+    name = match.group('start')
+    attrs = tuple(
+        (attr.lower(), parse_attr_value(value) or '')
+        for attr, value in ATTR_RE.findall(match.group('attrs')))
+    if name.lower() in ('script', 'style') and not match.group('closed'):
+        return ('raw', name.lower(), name)
+    if name.lower() in RAW_TEXT_TAGS:
+        return None
+    if match.group('closed'):
+        return ('startend', name.lower(), attrs)
+    return ('start', name.lower(), attrs)
+
+
+def get_string(element):
+    """Return the single string in an element, like BeautifulSoup's
+    `Tag.string`."""
+
+    while len(element.children) == 1:
+        child = element.children[0]
+        if isinstance(child, str):
+            return child
+        element = child
+    return None
+
+
+def escape(text):
+    return text \
+        .replace('&', '&amp;') \
+        .replace('<', '&lt;') \
+        .replace('>', '&gt;')
+
+
+def quote_attribute(value):
+    value = escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"{}"'.format(value.replace('"', '&quot;'))
+        return "'{}'".format(value)
+    return '"{}"'.format(value)
+
+
+class Sanitizer:
+    """Remove unwanted tags and attributes, and pretty print the html.
+
+    Tags are handled like this:
+
+     * `removable_tags` are removed with their content;
+     * `allowed_tags` are kept (if they're not empty), with only the
+       `allowed_attrs` attributes;
+     * other tags are removed, but their content is kept.
+    """
+
+    def __init__(self, allowed_tags, allowed_attrs, removable_tags):
+        self.allowed_tags = frozenset(allowed_tags)
+        self.allowed_attrs = frozenset(allowed_attrs)
+        self.removable_tags = frozenset(removable_tags)
+
+    def sanitize(self, html):
+        root = TreeBuilder().build(html)
+        output = []
+        for child in root.children:
+            self.render(child, 0, output, False)
+        return ''.join(output)
+
+    def render(self, node, level, output, literal):
+        """Clean a node and render it in the `output` list.
+
+        When `literal` is True, we are inside a tag whose content must not
+        be modified (e.g <pre>).
+        """
+        if isinstance(node, str):
+            if type(node) is str:
+                # Blank strings are common, don't escape them for nothing
+                text = node if literal else node.strip()
+                if text:
+                    text = escape(text)
+            else:
+                text = node.template.format(node)
+                if not literal:
+                    text = text.strip()
+            if text:
+                output.append(
+                    text if literal else INDENT * level + text + '\n')
+            return
+
+        name = node.name
+        if name in self.removable_tags:
+            return
+
+        # Tags that are not allowed are replaced with their content
+        if name not in self.allowed_tags:
+            for child in node.children:
+                self.render(child, level, output, literal)
+            return
+
+        # Remove allowed tags without content
+        if not node.children:
+            if name != 'br':
+                return
+        else:
+            string = get_string(node)
+            if string and not string.strip():
+                return
+
+        indent = '' if literal else INDENT * level
+        newline = '' if literal else '\n'
+        attrs = ''.join(
+            ' ' + attr + '=' + quote_attribute(value)
+            for attr, value in sorted(node.attrs.items())
+            if attr in self.allowed_attrs) if node.attrs else ''
+
+        if not node.children and name in VOID_TAGS:
+            output.append(indent + '<' + name + attrs + '/>' + newline)
+            return
+
+        # Content of `pre` tags is rendered as is
+        enters_literal = not literal and name in PRESERVE_WHITESPACE_TAGS
+        if enters_literal:
+            output.append(indent + '<' + name + attrs + '>')
+        else:
+            output.append(indent + '<' + name + attrs + '>' + newline)
+        for child in node.children:
+            self.render(child, level + 1, output, literal or enters_literal)
+        if enters_literal:
+            output.append('</' + name + '>' + newline)
+        else:
+            output.append(indent + '</' + name + '>' + newline)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+
+import scrapy
+from scrapy.extensions.httpcache import RFC2616Policy
+
+
+class RevalidationPolicy(RFC2616Policy):
+    """Http cache policy for incremental crawls.
+
+    Cached pages are never considered fresh, but they are always revalidated
+    with conditional requests (`If-Modified-Since`, `If-None-Match`). Pages
+    that were not modified are not downloaded again.
+    """
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+
+class SeenIds:
+    """The aids found during the previous crawls.
+
+    For every aid, we store a signature of the data found in the listing
+    pages (e.g a modification date), by import unique id. If the signature
+    did not change, the aid detail page does not need to be fetched again.
+
+    Delete the store file to force a full crawl.
+    """
+
+    def __init__(self, path, get_import_uniqueid):
+        self.path = path
+        self.get_import_uniqueid = get_import_uniqueid
+        try:
+            with open(path) as store_file:
+                self.signatures = json.load(store_file)
+        except (FileNotFoundError, ValueError):
+            self.signatures = {}
+
+        self.new_signatures = {}
+        self.skipped = []
+
+    def is_unchanged(self, uniqueid, signature):
+        """Tell if the aid signature is known already."""
+
+        import_uniqueid = self.get_import_uniqueid(uniqueid)
+        signature = hashlib.sha256(signature.encode()).hexdigest()
+        if self.signatures.get(import_uniqueid) == signature:
+            self.skipped.append(import_uniqueid)
+            return True
+        return False
+
+    def add(self, uniqueid, signature):
+        """Record the signature of an aid whose detail page was scraped."""
+
+        import_uniqueid = self.get_import_uniqueid(uniqueid)
+        signature = hashlib.sha256(signature.encode()).hexdigest()
+        self.new_signatures[import_uniqueid] = signature
+
+    def save(self):
+        signatures = dict(self.signatures, **self.new_signatures)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = '{}.tmp'.format(self.path)
+        with open(tmp_path, 'w') as store_file:
+            json.dump(signatures, store_file)
+        os.replace(tmp_path, self.path)
+
+
+class IncrementalSpider(scrapy.Spider):
+    """A spider that can skip the detail pages of unchanged aids.
+
+    Concurrency and throttling settings can be customized for every spider
+    with the `custom_settings` attribute.
+    """
+
+    # Set by the import command in incremental mode
+    seen_ids = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(
+            spider.item_scraped, signal=scrapy.signals.item_scraped)
+        return spider
+
+    def detail_request(self, url, uniqueid, signature=None, **kwargs):
+        """Return the request for an aid detail page.
+
+        `signature` is some data from the listing page that changes when the
+        aid is modified. Returns None if the aid was already crawled and its
+        signature did not change.
+
+        The signature is only recorded once the detail page is scraped, so
+        pages that could not be fetched are crawled again next time.
+        """
+        tracked = self.seen_ids is not None and signature is not None
+        if tracked and self.seen_ids.is_unchanged(uniqueid, signature):
+            return None
+
+        request = scrapy.Request(url, **kwargs)
+        if tracked:
+            request.meta['seen_ids_signature'] = (uniqueid, signature)
+        return request
+
+    def item_scraped(self, item, response, spider):
+        pending_signature = response.meta.get('seen_ids_signature')
+        if self.seen_ids is not None and pending_signature is not None:
+            self.seen_ids.add(*pending_signature)
@@ -1,6 +1,7 @@
 from datetime import datetime
 
 import scrapy
+from dataproviders.scrapers.base import IncrementalSpider
 from dataproviders.utils import content_prettify
 
 
@@ -10,9 +11,15 @@ from dataproviders.utils import content_prettify
 EPCI_AUDIANCE_CODE = '63'
 
 
-class GrandEstSpider(scrapy.Spider):
+class GrandEstSpider(IncrementalSpider):
     name = 'grand_est'
 
+    custom_settings = {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'AUTOTHROTTLE_ENABLED': True,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 2,
+    }
+
     BASE_URL = 'https://www.grandest.fr/'
     start_urls = [
         'https://www.grandest.fr/aides/?beneficiaire={}'.format(
@@ -22,8 +29,7 @@ class GrandEstSpider(scrapy.Spider):
     def parse(self, response):
         links = response.css('a.card')
         for link in links:
-            link_url = link.css('::attr("href")').get()
-            request = scrapy.Request(link_url, callback=self.aid_parse)
+            link_url = response.urljoin(link.css('::attr("href")').get())
 
             card_header = link.css('div.txt.new_txt span.new_type::text').get()
             if 'Date limite de dépôt' in card_header:
@@ -40,10 +46,19 @@ class GrandEstSpider(scrapy.Spider):
                 is_call_for_project = False
                 submission_deadline = ''
 
-            request.meta['category'] = category
-            request.meta['is_call_for_project'] = is_call_for_project
-            request.meta['submission_deadline'] = submission_deadline
-            yield request
+            # The card contains all the listed data about the aid
+            request = self.detail_request(
+                link_url,
+                uniqueid=link_url.split('/')[-2],
+                signature=link.get(),
+                callback=self.aid_parse,
+                meta={
+                    'category': category,
+                    'is_call_for_project': is_call_for_project,
+                    'submission_deadline': submission_deadline,
+                })
+            if request:
+                yield request
 
         # The web site pagination is completely broken without javascript
         # so we have to pass a weird combination of paramaters to the url
@@ -1,6 +1,6 @@
 import json
-import scrapy
 from datetime import datetime
+from dataproviders.scrapers.base import IncrementalSpider
 from dataproviders.utils import content_prettify
 from bs4 import BeautifulSoup as bs
 
@@ -15,22 +15,32 @@ def custom_prettify(raw_text):
     return content_prettify(soup.prettify())
 
 
-class OccitanieSpider(scrapy.Spider):
+class OccitanieSpider(IncrementalSpider):
     name = 'occitanie'
 
+    custom_settings = {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+        'AUTOTHROTTLE_ENABLED': True,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 4,
+    }
+
     BASE_URL = 'https://www.laregion.fr/'
     start_urls = [
         'https://data.laregion.fr/explore/dataset/aides-et-appels-a-projets-de-la-region-occitanie/download/?format=json&timezone=Europe/Berlin',  # noqa
     ]
 
     def parse(self, response):
-        json_data = json.loads(response.body_as_unicode())
+        json_data = json.loads(response.text)
         for data in json_data:
-            request = scrapy.Request(
-                data['fields']['url'], callback=self.aid_parse)
-            request.meta['uniqueid'] = data['recordid']
-            request.meta['fields'] = data['fields']
-            yield request
+            request = self.detail_request(
+                response.urljoin(data['fields']['url']),
+                uniqueid=data['recordid'],
+                signature=data['fields'].get('date_modification'),
+                callback=self.aid_parse)
+            if request:
+                request.meta['uniqueid'] = data['recordid']
+                request.meta['fields'] = data['fields']
+                yield request
 
     def aid_parse(self, response):
         title = response.css('article h1::text').get()
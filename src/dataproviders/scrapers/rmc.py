@@ -1,10 +1,19 @@
 import scrapy
+from dataproviders.scrapers.base import IncrementalSpider
 from dataproviders.utils import content_prettify
 
 
-class RMCSpider(scrapy.Spider):
+class RMCSpider(IncrementalSpider):
     name = 'rmc'
 
+    # The listing page does not tell when aids are modified, so detail pages
+    # are always fetched (but not downloaded again if they're not modified).
+    custom_settings = {
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        'AUTOTHROTTLE_ENABLED': True,
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': 1,
+    }
+
     BASE_URL = 'https://www.eaurmc.fr/'
     start_urls = [
         'https://www.eaurmc.fr/jcms/gbr_5503/fr/les-aides-financieres-primes-et-appels-a-projets?cids=cbl_43675&PortalAction_ppi_6464_start=0&PortalAction_ppi_6464_pageSize=12&PortalAction_ppi_6464_pagerAll=true&PortalAction_ppi_6464_sort=&PortalAction_ppi_6464_reverse=false',  # noqa
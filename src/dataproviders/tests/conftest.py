@@ -0,0 +1,75 @@
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+FEEDS_DIR = os.path.join(os.path.dirname(__file__), 'feeds')
+
+
+class FeedRequestHandler(SimpleHTTPRequestHandler):
+    """Serve the recorded feeds and web pages.
+
+    Requests to `/unavailable/*` fail once with a server error before
+    being served. Requests to `broken_paths` always fail.
+
+    Served paths and response statuses are recorded in `requests`.
+    """
+
+    failed_paths = set()
+    broken_paths = set()
+    requests = []
+
+    def do_GET(self):
+        if self.path in self.broken_paths:
+            self.send_error(500)
+            return
+        if self.path.startswith('/unavailable/'):
+            if self.path not in self.failed_paths:
+                self.failed_paths.add(self.path)
+                self.send_error(503)
+                return
+            self.path = self.path[len('/unavailable'):]
+        super().do_GET()
+
+    def send_response(self, code, message=None):
+        self.requests.append((self.path, code))
+        super().send_response(code, message)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def feeds_dir():
+    return FEEDS_DIR
+
+
+@pytest.fixture
+def feed_requests():
+    """The requests received by the feed server."""
+
+    return FeedRequestHandler.requests
+
+
+@pytest.fixture
+def broken_paths():
+    """The paths of the feed server that always fail."""
+
+    return FeedRequestHandler.broken_paths
+
+
+@pytest.fixture
+def feed_server(feeds_dir):
+    handler = partial(FeedRequestHandler, directory=str(feeds_dir))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+    FeedRequestHandler.failed_paths.clear()
+    FeedRequestHandler.broken_paths.clear()
+    FeedRequestHandler.requests.clear()
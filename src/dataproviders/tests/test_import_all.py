@@ -0,0 +1,72 @@
+import pytest
+from django.core.management import call_command
+
+from dataproviders.management.commands import import_ademe, import_bpi
+from dataproviders.utils import get_http_session
+from accounts.factories import UserFactory
+from backers.factories import BackerFactory
+from geofr.factories import PerimeterFactory
+from geofr.models import Perimeter
+from aids.models import Aid
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def providers_data():
+    UserFactory(id=1)
+    PerimeterFactory(scale=Perimeter.TYPES.country, code='FRA')
+    BackerFactory(id=22, name='Ademe')
+    BackerFactory(name='BPI France', slug='bpi-france')
+
+
+def test_failing_requests_are_retried(feed_server):
+    session = get_http_session()
+    response = session.get('{}/unavailable/bpi.json'.format(feed_server))
+    assert response.status_code == 200
+    assert response.json()['data'][0]['ref_partenaire'] == '42'
+
+
+def test_import_all_feeds(feed_server, providers_data, monkeypatch, capsys):
+    monkeypatch.setattr(
+        import_ademe.Command, 'FEED_URI', feed_server + '/ademe.xml')
+    monkeypatch.setattr(
+        import_bpi.Command, 'FEED_URI', feed_server + '/unavailable/bpi.json')
+
+    call_command('import_all', providers=['ademe', 'bpi'])
+
+    assert set(Aid.objects.values_list('import_uniqueid', flat=True)) == {
+        'ADEME_1234', 'BPI_42', 'BPI_43'}
+    out = capsys.readouterr().out
+    assert 'ademe: 2 lines fetched in' in out
+    assert 'bpi: 2 lines fetched in' in out
+
+
+def test_import_all_skips_unavailable_providers(
+        feed_server, providers_data, monkeypatch, capsys):
+    monkeypatch.setattr(
+        import_ademe.Command, 'FEED_URI', feed_server + '/ademe.xml')
+    monkeypatch.setattr(
+        import_bpi.Command, 'FEED_URI', feed_server + '/missing.json')
+
+    call_command('import_all', providers=['ademe', 'bpi'])
+
+    assert list(Aid.objects.values_list('import_uniqueid', flat=True)) == [
+        'ADEME_1234']
+    out = capsys.readouterr().out
+    assert 'Cannot fetch bpi data' in out
+    assert 'ademe: 2 lines fetched in' in out
+
+
+def test_import_all_changed_only(
+        feed_server, providers_data, monkeypatch, capsys):
+    monkeypatch.setattr(
+        import_ademe.Command, 'FEED_URI', feed_server + '/ademe.xml')
+
+    call_command('import_all', providers=['ademe'])
+    capsys.readouterr()
+
+    call_command('import_all', providers=['ademe'], changed_only=True)
+    assert '0 aids created, 0 aids updated, 0 aids unchanged, ' \
+        '1 aids skipped' in capsys.readouterr().out
@@ -1,4 +1,7 @@
+import json
+
 import pytest
+from django.contrib.postgres.search import SearchQuery
 
 from dataproviders.management.commands.base import BaseImportCommand
 from accounts.factories import UserFactory
@@ -21,7 +24,7 @@ class ImportStub(BaseImportCommand):
     def populate_cache(self, *args, **kwargs):
         self.author = UserFactory()
 
-    def fetch_data(self):
+    def fetch_data(self, **options):
         return self.aids
 
     def extract_name(self, line):
@@ -54,6 +57,16 @@ class ImportStub(BaseImportCommand):
     def extract_contact(self, line):
         return ''
 
+    def extract_origin_url(self, line):
+        return line.origin_url
+
+    def serialize_line(self, line):
+        return json.dumps({
+            'name': line.name,
+            'description': line.description,
+            'origin_url': line.origin_url,
+        })
+
 
 def test_importing_new_aids():
     """The import commands create the aids from provided data."""
@@ -92,3 +105,98 @@ def test_importing_existing_aids():
     # no new aid are created
     stub.handle()
     assert aids.count() == 5
+
+
+def test_importing_aids_relations():
+    """Relations of new aids are created."""
+
+    financer = BackerFactory(name='Gloubiboulga')
+    aids = AidFactory.build_batch(3)
+    for aid in aids:
+        aid.set_slug()
+
+    stub = ImportStub(aids=aids, financer=financer)
+    stub.handle()
+
+    for aid in Aid.objects.all():
+        assert list(aid.financers.all()) == [financer]
+
+    # Financer names are part of the search vector
+    query = SearchQuery('gloubiboulga', config='french')
+    assert Aid.objects.filter(search_vector=query).count() == 3
+
+
+def test_importing_updated_aids(capsys):
+    """Only aids modified upstream are updated."""
+
+    financer = BackerFactory()
+    aids = AidFactory.build_batch(3, origin_url='https://example.com/')
+    for aid in aids:
+        aid.set_slug()
+
+    stub = ImportStub(aids=aids, financer=financer)
+    stub.handle()
+    assert '3 aids created, 0 aids updated, 0 aids unchanged' in \
+        capsys.readouterr().out
+
+    aids[0].origin_url = 'https://example.com/updated/'
+    stub.handle()
+    assert '0 aids created, 1 aids updated, 2 aids unchanged' in \
+        capsys.readouterr().out
+
+    updated_aid = Aid.objects.get(import_uniqueid=aids[0].slug)
+    assert updated_aid.origin_url == 'https://example.com/updated/'
+
+
+def test_import_query_count_does_not_depend_on_feed_size(
+        django_assert_max_num_queries):
+    financer = BackerFactory()
+    aids = AidFactory.build_batch(50)
+    for aid in aids:
+        aid.set_slug()
+
+    stub = ImportStub(aids=aids, financer=financer)
+    with django_assert_max_num_queries(20):
+        stub.handle()
+    assert Aid.objects.count() == 50
+
+
+def test_import_stores_raw_data_hash():
+    financer = BackerFactory()
+    aids = AidFactory.build_batch(2)
+    for aid in aids:
+        aid.set_slug()
+
+    stub = ImportStub(aids=aids, financer=financer)
+    stub.handle()
+
+    imported_aid = Aid.objects.get(import_uniqueid=aids[0].slug)
+    assert imported_aid.import_raw_hash == stub.get_line_hash(aids[0])
+    assert imported_aid.import_raw_hash != stub.get_line_hash(aids[1])
+
+
+def test_line_hash_ignores_whitespace_and_key_order():
+    stub = BaseImportCommand()
+    assert stub.get_line_hash({'a': 'Une aide', 'b': 1}) == \
+        stub.get_line_hash({'b': 1, 'a': 'Une  aide\n'})
+    assert stub.get_line_hash({'a': 'Une aide'}) != \
+        stub.get_line_hash({'a': 'Une autre aide'})
+
+
+def test_changed_only_mode_skips_unchanged_records(capsys):
+    financer = BackerFactory()
+    aids = AidFactory.build_batch(3)
+    for aid in aids:
+        aid.set_slug()
+
+    stub = ImportStub(aids=aids, financer=financer)
+    stub.handle(changed_only=True)
+    assert '3 aids created, 0 aids updated, 0 aids unchanged, ' \
+        '0 aids skipped' in capsys.readouterr().out
+
+    aids[0].description = 'Une description modifiée'
+    stub.handle(changed_only=True)
+    assert '0 aids created, 1 aids updated, 0 aids unchanged, ' \
+        '2 aids skipped' in capsys.readouterr().out
+    updated_aid = Aid.objects.get(import_uniqueid=aids[0].slug)
+    assert updated_aid.import_raw_hash == stub.get_line_hash(aids[0])
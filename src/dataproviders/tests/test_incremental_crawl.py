@@ -0,0 +1,125 @@
+import os
+import shutil
+import time
+
+import pytest
+from django.core.management import call_command
+from scrapy.crawler import CrawlerProcess
+
+from dataproviders.management.commands import import_grand_est
+from dataproviders.management.commands.base import get_crawler_settings
+from dataproviders.scrapers.base import SeenIds
+from dataproviders.scrapers.grand_est import GrandEstSpider
+from accounts.factories import UserFactory
+from backers.factories import BackerFactory
+from geofr.factories import PerimeterFactory
+from geofr.models import Perimeter
+from aids.models import Aid
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def feeds_dir(feeds_dir, tmp_path):
+    """Serve a copy of the feeds, so pages can be modified."""
+
+    copy_dir = tmp_path / 'feeds'
+    shutil.copytree(feeds_dir, str(copy_dir))
+    return copy_dir
+
+
+@pytest.fixture
+def grand_est_data(settings, tmp_path, feed_server, monkeypatch):
+    settings.CRAWLER_CACHE_DIR = str(tmp_path / 'crawler')
+    monkeypatch.setattr(
+        GrandEstSpider, 'start_urls', [feed_server + '/grand_est/'])
+    UserFactory(id=1)
+    PerimeterFactory(scale=Perimeter.TYPES.region, code='44')
+    BackerFactory(name='Région Grand Est')
+
+
+def test_seen_ids_store(tmp_path):
+    path = str(tmp_path / 'seen_ids' / 'spider.json')
+    seen_ids = SeenIds(path, 'TEST_{}'.format)
+    assert not seen_ids.is_unchanged('1', '2020-01-01')
+    assert not seen_ids.is_unchanged('2', '2020-01-01')
+    assert not seen_ids.is_unchanged('3', '2020-01-01')
+    seen_ids.add('1', '2020-01-01')
+    seen_ids.add('2', '2020-01-01')
+    seen_ids.save()
+
+    # Only scraped aids are recorded
+    seen_ids = SeenIds(path, 'TEST_{}'.format)
+    assert seen_ids.is_unchanged('1', '2020-01-01')
+    assert not seen_ids.is_unchanged('2', '2020-06-01')
+    assert not seen_ids.is_unchanged('3', '2020-01-01')
+    assert seen_ids.skipped == ['TEST_1']
+
+
+def test_incremental_crawl(feeds_dir, grand_est_data, feed_requests,
+                           broken_paths, capsys):
+    """Unchanged pages are not fetched again.
+
+    The twisted reactor cannot be restarted, so all the crawls are run in
+    the same crawler process.
+    """
+    command = import_grand_est.Command()
+    process = CrawlerProcess(get_crawler_settings(
+        incremental=True, autothrottle=False))
+
+    def modify_listing():
+        # The deadline of the first aid is modified in the listing page
+        listing = feeds_dir / 'grand_est' / 'index.html'
+        listing.write_text(listing.read_text().replace(
+            '31/12/2030', '30/06/2031'))
+        modified = time.time() + 60
+        os.utime(str(listing), (modified, modified))
+
+    changes = [
+        # The detail page of the second aid can't be fetched
+        lambda: broken_paths.add('/grand_est/aide-2/'),
+        broken_paths.clear,
+        modify_listing,
+    ]
+    crawls = []
+    requests = []
+
+    def crawl_next(_=None):
+        if crawls:
+            call_command(command, data=crawls[-1])
+            requests.append(sorted(set(feed_requests)))
+            feed_requests.clear()
+        if changes:
+            changes.pop(0)()
+            crawls.append(command.crawl(process, incremental=True))
+            process.join().addCallback(crawl_next)
+
+    crawl_next()
+    process.start()
+
+    assert requests[0] == [
+        ('/grand_est/', 200),
+        ('/grand_est/aide-1/', 200),
+        ('/grand_est/aide-2/', 500)]
+
+    # The second aid was not scraped, so it is crawled again
+    assert requests[1] == [
+        ('/grand_est/', 304),
+        ('/grand_est/aide-2/', 200)]
+
+    # The second aid is skipped, the first one is not modified
+    assert requests[2] == [
+        ('/grand_est/', 200),
+        ('/grand_est/aide-1/', 304)]
+    assert len(crawls[2]) == 1
+
+    out = capsys.readouterr().out
+    assert '1 aids created, 0 aids updated, 0 aids unchanged, ' \
+        '0 aids skipped' in out
+    assert '1 aids created, 0 aids updated, 0 aids unchanged, ' \
+        '1 aids skipped' in out
+    assert '0 aids created, 1 aids updated, 0 aids unchanged, ' \
+        '1 aids skipped' in out
+    aid = Aid.objects.get(import_uniqueid='GE_aide-1')
+    assert str(aid.submission_deadline) == '2031-06-30'
@@ -0,0 +1,69 @@
+import pytest
+from django.core.management import call_command
+
+from dataproviders.benchmark import (
+    RICH_TEXT_TAGS, beautifulsoup_prettify, load_corpus)
+from dataproviders.sanitizer import TreeBuilder
+from dataproviders.utils import cached_content_prettify, content_prettify
+
+
+SNIPPETS = [
+    '',
+    'Du texte sans balise',
+    '<p>Une <strong>aide</strong> <em>importante</em></p>',
+    '<p><span style="color: red">Du texte</span> coloré</p>',
+    '<p>   </p><p></p><br><p>&nbsp;</p>',
+    '<ul><li>Un</li><li><b>Deux</b></li><li> </li></ul>',
+    '<p><script>alert("toto")</script>Texte<style>p {}</style></p>',
+    '<p><style></style></p>',
+    '<a href="https://example.com/?a=1&amp;b=2" target="_blank">Lien</a>',
+    '<table><tr><td>Cellule</td></tr></table>',
+    '<pre>  du   code\n  indenté </pre>',
+    '<p>Un <!-- commentaire --> texte</p>',
+    '<p>Caractères &#233; &#x41; &#150; &eacute; &foo; x < y & z</p>',
+    '<p>Balises <b>mal <i>fermées</b> ici</p></i>',
+    '<!DOCTYPE html><html><body><h3>Titre</h3></body></html>',
+    '<p title=\'a>b\' class="c">Attributs</p><img src="a.png">',
+    '<P>Majuscules<BR>et <A HREF="x">lien</A></P>',
+    '<p>Retour<br>à la</br>ligne<br/>ici</p>',
+    '<p>“Guillemets” et l’apostrophe</p>',
+]
+
+
+@pytest.mark.parametrize('html', SNIPPETS)
+@pytest.mark.parametrize('more_allowed_tags', [[], RICH_TEXT_TAGS])
+def test_sanitizer_output_matches_beautifulsoup(html, more_allowed_tags):
+    assert content_prettify(html, more_allowed_tags) == \
+        beautifulsoup_prettify(html, more_allowed_tags)
+
+
+def test_sanitizer_output_matches_beautifulsoup_on_feeds():
+    for html in load_corpus():
+        for more_allowed_tags in ([], RICH_TEXT_TAGS):
+            assert content_prettify(html, more_allowed_tags) == \
+                beautifulsoup_prettify(html, more_allowed_tags)
+
+
+def test_unusual_markup_falls_back_to_the_standard_parser():
+    root = TreeBuilder().build('<p>Texte <script>if (a < b) {}</script></p>')
+    paragraph = root.children[0]
+    script = paragraph.children[1]
+    assert paragraph.name == 'p'
+    assert script.name == 'script'
+    assert script.children == ['if (a < b) {}']
+
+
+def test_content_prettify_is_memoized():
+    cached_content_prettify.cache_clear()
+    content_prettify('<p>Une aide</p>')
+    content_prettify('<p>Une aide</p>')
+    content_prettify('<p>Une aide</p>', ['a'])
+
+    cache_info = cached_content_prettify.cache_info()
+    assert cache_info.hits == 1
+    assert cache_info.misses == 2
+
+
+def test_benchmark_command(capsys):
+    call_command('benchmark_content_prettify', repeat=1)
+    assert 'Outputs are identical' in capsys.readouterr().out
@@ -1,6 +1,11 @@
+from functools import lru_cache
 from html import unescape
 from unicodedata import normalize
-from bs4 import BeautifulSoup as bs
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dataproviders.sanitizer import Sanitizer
 
 REMOVABLE_TAGS = ['script', 'style']
 ALLOWED_TAGS = [
@@ -9,6 +14,18 @@ ALLOWED_TAGS = [
 ]
 ALLOWED_ATTRS = ['href']
 
+# Number of cleaned texts kept in memory
+PRETTIFY_CACHE_SIZE = 512
+
+# (connect, read) timeouts for feed downloads, in seconds
+FETCH_TIMEOUT = (10, 120)
+
+# Failing downloads are retried with an exponential backoff
+FETCH_RETRIES = Retry(
+    total=3,
+    backoff_factor=1,
+    status_forcelist=(500, 502, 503, 504))
+
 
 def content_prettify(raw_text, more_allowed_tags=[]):
     """Clean imported data.
@@ -25,45 +42,40 @@ def content_prettify(raw_text, more_allowed_tags=[]):
      * removes all html tag attributes
      * autoindent existing html
 
+    Feeds contain many identical texts (and are imported again and again),
+    so results are memoized.
     """
-    allowed_tags = ALLOWED_TAGS + more_allowed_tags
+    return cached_content_prettify(raw_text or '', tuple(more_allowed_tags))
+
 
-    unescaped = unescape(raw_text or '')
+@lru_cache(maxsize=PRETTIFY_CACHE_SIZE)
+def cached_content_prettify(raw_text, more_allowed_tags):
+    unescaped = unescape(raw_text)
     unquoted = unescaped \
         .replace('“', '"') \
         .replace('”', '"') \
         .replace('’', "'")
     normalized = normalize('NFKC', unquoted)
+    return get_sanitizer(more_allowed_tags).sanitize(normalized)
 
-    # Cleaning html markup
-    soup = bs(normalized, features='html.parser')
-    tags = soup.find_all()
-    for tag in tags:
-        # Some tags must be removed altogether
-        # We remove the tag and all it's content.
-        # We alse clear empty tags.
-        if tag.name in REMOVABLE_TAGS or not tag.name:
-            tag.decompose()
-
-        # Remaining tags must be cleaned
-        else:
-            if tag.name in allowed_tags:
-                attrs = list(tag.attrs.keys())
-                for attr in attrs:
-                    if attr not in ALLOWED_ATTRS:
-                        tag.attrs.pop(attr)
-
-                # Remove tags with no content
-                if not tag.contents and not tag.name == 'br':
-                    tag.decompose()
-
-                # Remove tags with empty strings (or newlines, etc.)
-                elif tag.string and not tag.string.strip():
-                    tag.decompose()
-
-            # Some tags are not allowed, but we do not want to remove
-            # their content.
-            else:
-                tag.unwrap()
-    prettified = soup.prettify()
-    return prettified
+
+@lru_cache(maxsize=None)
+def get_sanitizer(more_allowed_tags):
+    return Sanitizer(
+        ALLOWED_TAGS + list(more_allowed_tags), ALLOWED_ATTRS, REMOVABLE_TAGS)
+
+
+def get_http_session(pool_size=10):
+    """Return a `requests` session to download data feeds.
+
+    The session keeps a connection pool for every host, and retries
+    requests failing because of connection errors or server errors.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=FETCH_RETRIES)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
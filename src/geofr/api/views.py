@@ -1,8 +1,9 @@
 from rest_framework import viewsets
-from django.contrib.postgres.search import TrigramSimilarity
 
+from geofr import autocomplete
 from geofr.models import Perimeter
 from geofr.api.serializers import PerimeterSerializer
+from geofr.zipcodes import commune_ids_from_zipcode
 
 
 MIN_SEARCH_LENGTH = 1
@@ -12,14 +13,31 @@ class PerimeterViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PerimeterSerializer
 
     def get_queryset(self):
-        """Filter data according to search query."""
+        """Filter data according to the `zipcode` parameter."""
 
         qs = Perimeter.objects.order_by('-scale', 'name')
-        q = self.request.query_params.get('q', '')
-        if len(q) >= MIN_SEARCH_LENGTH:
-            qs = qs \
-                .annotate(similarity=TrigramSimilarity('name', q)) \
-                .filter(name__trigram_similar=q) \
-                .order_by('-similarity', '-scale', 'name')
+        zipcode = self.request.query_params.get('zipcode', '')
+        if zipcode:
+            qs = qs.filter(id__in=commune_ids_from_zipcode(zipcode))
 
         return qs
+
+    def list(self, request, *args, **kwargs):
+        """Search perimeters using the in-memory autocomplete index.
+
+        Results are serialized when the index is built, so this never hits
+        the database.
+
+        Communes with a given zipcode can also be listed with the `zipcode`
+        parameter.
+        """
+        if self.request.query_params.get('zipcode', ''):
+            return super().list(request, *args, **kwargs)
+
+        q = self.request.query_params.get('q', '')
+        if len(q) < MIN_SEARCH_LENGTH:
+            q = ''
+
+        results = autocomplete.search(q)
+        page = self.paginate_queryset(results)
+        return self.get_paginated_response(page)
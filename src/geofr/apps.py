@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class GeofrConfig(AppConfig):
     name = 'geofr'
+
+    def ready(self):
+        import geofr.signals  # noqa
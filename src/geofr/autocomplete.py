@@ -0,0 +1,225 @@
+"""In-memory index for the perimeter autocomplete api.
+
+The autocomplete endpoint is called on every keystroke, but the perimeter
+list (~40k perimeters) changes only a few times a year. Hence, every worker
+builds a read-only index from the perimeter list, and answers queries
+without any db round-trip.
+
+Names are accent-folded and split into words. The index contains:
+
+ - a sorted array of (word, perimeter) pairs, i.e a flattened prefix trie,
+   so "gely fes" finds "Saint-Gély-du-Fesc" instantly;
+ - trigram postings (trigram → perimeters), so "monpelier" still finds
+   "Montpellier" (this is slower, so it's only done when there are few
+   prefix matches);
+ - a sorted array of (zipcode, commune) pairs, for numeric queries.
+
+Results are ranked by trigram similarity (computed like `pg_trgm` does), then
+by scale and name. Results of the most recent queries are memoized.
+
+Like the perimeter graph (see `geofr.graph`), the index is tagged with a
+version stamp stored in the cache, that is bumped every time a perimeter is
+modified. Workers rebuild the index upon next access.
+"""
+
+import math
+import sys
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+
+from core.autocomplete import SearchResults, prefix_range, split_words
+from core.cache import VersionedSingleton
+from geofr.models import Perimeter
+
+
+VERSION_CACHE_KEY = 'geofr:perimeter_autocomplete_version'
+
+# Same as the `pg_trgm.similarity_threshold` default value
+SIMILARITY_THRESHOLD = 0.3
+
+# Looking for similar names is much slower than looking for prefixes, so
+# we only do it when there are fewer prefix matches than this
+MIN_PREFIX_MATCHES = 10
+
+# Number of distinct queries to remember the results of
+CACHE_SIZE = 1024
+
+RESULT_FIELDS = ('id', 'name', 'scale', 'text')
+
+
+def trigrams(words):
+    """Return the set of trigrams of the given words.
+
+    Like `pg_trgm`, every word is padded with two spaces at the beginning and
+    one space at the end.
+    """
+    result = set()
+    for word in words:
+        padded = '  {} '.format(word)
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class PerimeterIndex:
+    """A read-only search index of all perimeters."""
+
+    def __init__(self, version, perimeters):
+        """Build the index.
+
+        `perimeters` is a list of `Perimeter` objects, with at least the
+        `id`, `scale`, `name` and `zipcodes` fields.
+        """
+        self.version = version
+
+        # Perimeters are stored in the default order (scale, then name), so
+        # we can compare positions instead of names when ranking results
+        perimeters = sorted(
+            perimeters,
+            key=lambda perimeter: (-perimeter.scale, perimeter.name))
+        self.results = [
+            (perimeter.id_slug, perimeter.name,
+             perimeter.get_scale_display(), str(perimeter))
+            for perimeter in perimeters]
+        self.trigrams = []
+
+        words = []
+        postings = defaultdict(list)
+        zipcodes = []
+        for position, perimeter in enumerate(perimeters):
+            perimeter_words = split_words(perimeter.name)
+            words.extend((word, position) for word in set(perimeter_words))
+
+            # Trigram strings are shared between perimeters
+            perimeter_trigrams = tuple(
+                sys.intern(trigram) for trigram in trigrams(perimeter_words))
+            self.trigrams.append(perimeter_trigrams)
+            for trigram in perimeter_trigrams:
+                postings[trigram].append(position)
+
+            for zipcode in set(perimeter.zipcodes or []):
+                zipcodes.append((zipcode, position))
+
+        words.sort()
+        self.words = [word for word, _ in words]
+        self.word_positions = array('l', (position for _, position in words))
+        self.postings = {
+            trigram: array('l', positions)
+            for trigram, positions in postings.items()}
+        zipcodes.sort()
+        self.zipcodes = [zipcode for zipcode, _ in zipcodes]
+        self.zipcode_positions = array(
+            'l', (position for _, position in zipcodes))
+
+        self.search = lru_cache(maxsize=CACHE_SIZE)(self._search)
+
+    @classmethod
+    def load(cls, version):
+        perimeters = Perimeter.objects.only(
+            'id', 'scale', 'name', 'zipcodes')
+        return cls(version, list(perimeters))
+
+    def __len__(self):
+        return len(self.results)
+
+    def prefix_matches(self, words):
+        """Perimeters with a word starting with each of the given words."""
+
+        matches = None
+        for word in words:
+            start, end = prefix_range(self.words, word)
+            positions = set(self.word_positions[start:end])
+            matches = positions if matches is None else matches & positions
+        return matches or set()
+
+    def zipcode_matches(self, zipcode_prefixes):
+        """Communes with a zipcode starting with each of the given codes."""
+
+        matches = None
+        for prefix in zipcode_prefixes:
+            start, end = prefix_range(self.zipcodes, prefix)
+            positions = set(self.zipcode_positions[start:end])
+            matches = positions if matches is None else matches & positions
+        return matches or set()
+
+    def similar_names(self, query_trigrams):
+        """Perimeters that may be similar enough to the query.
+
+        This is a superset of the perimeters that are at least
+        `SIMILARITY_THRESHOLD` similar to the query.
+        """
+        nb_query_trigrams = len(query_trigrams)
+
+        # The similarity is at most `nb_common_trigrams / nb_query_trigrams`,
+        # so similar perimeters share at least `min_count` trigrams with the
+        # query, hence they contain one of the `nb_query_trigrams -
+        # min_count + 1` rarest query trigrams. This way, we never go through
+        # the (huge) postings of trigrams such as "  s" or "int".
+        min_count = math.ceil(SIMILARITY_THRESHOLD * nb_query_trigrams)
+        rarest = sorted(
+            query_trigrams,
+            key=lambda trigram: len(self.postings.get(trigram, ())))
+        return set(chain.from_iterable(
+            self.postings.get(trigram, ())
+            for trigram in rarest[:nb_query_trigrams - min_count + 1]))
+
+    def similarities(self, words, candidates):
+        """Return the trigram similarity of the query for every perimeter.
+
+        Only perimeters from `candidates`, or that are at least
+        `SIMILARITY_THRESHOLD` similar to the query, are returned.
+        """
+        query_trigrams = frozenset(trigrams(words))
+        nb_query_trigrams = len(query_trigrams)
+
+        positions = set(candidates)
+        if len(candidates) < MIN_PREFIX_MATCHES:
+            positions.update(self.similar_names(query_trigrams))
+
+        similarities = {}
+        for position in positions:
+            perimeter_trigrams = self.trigrams[position]
+            count = len(query_trigrams.intersection(perimeter_trigrams))
+            similarity = count / (
+                nb_query_trigrams + len(perimeter_trigrams) - count)
+            if similarity >= SIMILARITY_THRESHOLD or position in candidates:
+                similarities[position] = similarity
+        return similarities
+
+    def _search(self, query):
+        """Return the positions of the perimeters matching the query."""
+
+        tokens = split_words(query)
+        zipcode_prefixes = [token for token in tokens if token.isdigit()]
+        words = [token for token in tokens if not token.isdigit()]
+
+        if zipcode_prefixes:
+            matches = self.zipcode_matches(zipcode_prefixes)
+            if words:
+                matches &= self.prefix_matches(words)
+            return tuple(sorted(matches))
+
+        if not words:
+            return tuple(range(len(self)))
+
+        similarities = self.similarities(words, self.prefix_matches(words))
+        return tuple(sorted(
+            similarities,
+            key=lambda position: (-similarities[position], position)))
+
+
+perimeter_index = VersionedSingleton(VERSION_CACHE_KEY, PerimeterIndex.load)
+
+
+def get_index():
+    """Return an up-to-date index, building it if necessary."""
+
+    return perimeter_index.get()
+
+
+def search(query):
+    """Return the serialized perimeters matching the query."""
+
+    index = get_index()
+    return SearchResults(index.results, index.search(query), RESULT_FIELDS)
@@ -0,0 +1,147 @@
+"""In-memory copy of the perimeter containment graph.
+
+The perimeter graph (~40k nodes, a few hundred thousands links) changes only
+a few times a year, but it is queried by almost every search. Hence, we load
+it once per worker in a compact structure and answer "which perimeters are
+related to this one?" without any db round-trip.
+
+Links are stored in two CSR-like (compressed sparse row) arrays: for the node
+at index `i`, the ids of its ancestors are stored in
+`ancestors[ancestor_offsets[i]:ancestor_offsets[i + 1]]`, and the same goes
+for descendants.
+
+The graph is tagged with a version stamp stored in the cache. Every time the
+perimeter links are modified, the stamp is bumped (see
+`geofr.utils.refresh_perimeter_closure`) and workers reload the graph upon
+next access.
+"""
+
+from array import array
+
+from core.cache import VersionedSingleton
+from geofr.models import Perimeter
+
+
+VERSION_CACHE_KEY = 'geofr:perimeter_graph_version'
+
+
+def build_csr(nb_nodes, index, pairs):
+    """Build the offsets and values arrays from (source, target) pairs."""
+
+    counts = [0] * (nb_nodes + 1)
+    for source, _ in pairs:
+        counts[index[source] + 1] += 1
+
+    offsets = array('l', counts)
+    for i in range(nb_nodes):
+        offsets[i + 1] += offsets[i]
+
+    values = array('l', bytes(offsets[-1] * offsets.itemsize))
+    cursor = array('l', offsets)
+    for source, target in pairs:
+        position = index[source]
+        values[cursor[position]] = target
+        cursor[position] += 1
+
+    return offsets, values
+
+
+class PerimeterGraph:
+    """A read-only snapshot of the perimeter containment graph."""
+
+    def __init__(self, version, nodes, links):
+        """Build the graph.
+
+        `nodes` is a list of (id, scale, code) tuples;
+        `links` is a list of (contained_id, container_id) tuples.
+        """
+        self.version = version
+        self.ids = array('l', (node[0] for node in nodes))
+        self.scales = array('B', (node[1] for node in nodes))
+        self.codes = [node[2] for node in nodes]
+        self.index = {perimeter_id: i for i, perimeter_id in enumerate(
+            self.ids)}
+
+        nb_nodes = len(self.ids)
+        self.ancestor_offsets, self.ancestors = build_csr(
+            nb_nodes, self.index, links)
+        self.descendant_offsets, self.descendants = build_csr(
+            nb_nodes, self.index, [(to, frm) for frm, to in links])
+
+    @classmethod
+    def load(cls, version):
+        nodes = list(Perimeter.objects
+                     .order_by('id')
+                     .values_list('id', 'scale', 'code'))
+        links = list(Perimeter.contained_in.through.objects
+                     .values_list('from_perimeter_id', 'to_perimeter_id'))
+        return cls(version, nodes, links)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, perimeter_id):
+        return perimeter_id in self.index
+
+    def ancestor_ids(self, perimeter_id):
+        """Ids of the perimeters that contain the given perimeter."""
+
+        i = self.index[perimeter_id]
+        start, end = self.ancestor_offsets[i], self.ancestor_offsets[i + 1]
+        return frozenset(self.ancestors[start:end])
+
+    def descendant_ids(self, perimeter_id):
+        """Ids of the perimeters contained in the given perimeter."""
+
+        i = self.index[perimeter_id]
+        start, end = \
+            self.descendant_offsets[i], self.descendant_offsets[i + 1]
+        return frozenset(self.descendants[start:end])
+
+    def related_ids(self, perimeter_id):
+        """The perimeter, its ancestors and its descendants.
+
+        This is the set of perimeters the search engine must consider.
+        """
+        return self.ancestor_ids(perimeter_id) \
+            | self.descendant_ids(perimeter_id) \
+            | {perimeter_id}
+
+    def scale(self, perimeter_id):
+        return self.scales[self.index[perimeter_id]]
+
+    def code(self, perimeter_id):
+        return self.codes[self.index[perimeter_id]]
+
+
+perimeter_graph = VersionedSingleton(VERSION_CACHE_KEY, PerimeterGraph.load)
+
+
+def get_graph(force_reload=False):
+    """Return an up-to-date graph, loading it if necessary."""
+
+    return perimeter_graph.get(force_reload)
+
+
+def _lookup(method_name, perimeter_id):
+    """Call a graph method, reloading the graph once on unknown ids.
+
+    An id can be missing if the perimeter was created very recently and the
+    version stamp change was not visible yet.
+    """
+    graph = get_graph()
+    if perimeter_id not in graph:
+        graph = get_graph(force_reload=True)
+    return getattr(graph, method_name)(perimeter_id)
+
+
+def ancestor_ids(perimeter_id):
+    return _lookup('ancestor_ids', perimeter_id)
+
+
+def descendant_ids(perimeter_id):
+    return _lookup('descendant_ids', perimeter_id)
+
+
+def related_ids(perimeter_id):
+    return _lookup('related_ids', perimeter_id)
@@ -5,6 +5,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from geofr.models import Perimeter
+from geofr.utils import (get_perimeter_ids, refresh_perimeter_closure,
+                         sync_perimeter_links, upsert_perimeters)
 from geofr.constants import OVERSEAS_REGIONS
 
 
@@ -29,105 +31,89 @@ class Command(BaseCommand):
         overseas = Perimeter.objects.get(
             scale=Perimeter.TYPES.adhoc,
             code='FRA-OM')
-        regions_qs = Perimeter.objects \
-            .filter(scale=Perimeter.TYPES.region) \
-            .values_list('code', 'id')
-        regions = dict(regions_qs)
-        departments_qs = Perimeter.objects \
-            .filter(scale=Perimeter.TYPES.department) \
-            .values_list('code', 'id')
-        departments = dict(departments_qs)
-        adhoc_qs = Perimeter.objects \
-            .filter(scale=Perimeter.TYPES.adhoc) \
-            .values_list('code', 'id')
-        adhoc = dict(adhoc_qs)
-
-        PerimeterContainedIn = Perimeter.contained_in.through
-        perimeter_links = []
+        regions = get_perimeter_ids(Perimeter.TYPES.region)
+        departments = get_perimeter_ids(Perimeter.TYPES.department)
+        adhoc = get_perimeter_ids(Perimeter.TYPES.adhoc)
 
         data_file = settings.DJANGO_ROOT + DATA_PATH
-        data = json.loads(data_file.read_file())
-        nb_created = 0
-        nb_updated = 0
-
-        for entry in data:
-
-            # There are several types of entries in the file:
-            #  - communes
-            #  - communes déléguées
-            #  - arrondissements municipaux
-            # At this stage, we only handle communes
-            if entry['type'] != 'commune-actuelle':
-                continue
-
-            # In the files, actual communes can be of two types:
-            # 1. Communes that belong in a region / department
-            # 2. Communes from "collectivités d'Outre-mer"
-
+        with open(data_file) as json_file:
+            data = json.load(json_file)
+
+        # There are several types of entries in the file:
+        #  - communes
+        #  - communes déléguées
+        #  - arrondissements municipaux
+        # At this stage, we only handle communes
+        entries = [
+            entry for entry in data if entry['type'] == 'commune-actuelle']
+
+        # In the files, actual communes can be of two types:
+        # 1. Communes that belong in a region / department
+        # 2. Communes from "collectivités d'Outre-mer"
+        communes_data = []
+        for entry in entries:
             if 'region' in entry:
-                data = {
+                communes_data.append({
+                    'code': entry['code'],
+                    'name': entry['nom'],
                     'regions': [entry['region']],
                     'departments': [entry['departement']],
                     'zipcodes': entry['codesPostaux'],
                     'is_overseas': (entry['region'] in OVERSEAS_REGIONS)
-                }
+                })
             else:
-                data = {
+                communes_data.append({
+                    'code': entry['code'],
+                    'name': entry['nom'],
+                    'regions': [],
+                    'departments': [],
                     'zipcodes': entry.get('codesPostaux', []),
                     'is_overseas': True
-                }
-
-            defaults = {
-                'name': entry['nom']
-            }
-            defaults.update(data)
-
-            # Create or update the commune perimeter
-            commune, created = Perimeter.objects.update_or_create(
-                scale=Perimeter.TYPES.commune,
-                code=entry['code'],
-                defaults=defaults)
-            if created:
-                nb_created += 1
-            else:
-                nb_updated += 1
-
-            # Link perimeter to france, europe, regions, departements,
-            # "collectivités d'outre-mer", mainland / overseas, etc.
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=commune.id,
-                to_perimeter_id=europe.id))
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=commune.id,
-                to_perimeter_id=france.id))
-
-            for region_code in commune.regions:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=commune.id,
-                    to_perimeter_id=regions[region_code]))
-            for department_code in commune.departments:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=commune.id,
-                    to_perimeter_id=departments[department_code]))
-
-            if commune.is_overseas:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=commune.id,
-                    to_perimeter_id=overseas.id))
+                })
+
+        # Create or update the commune perimeters
+        nb_created, nb_updated = upsert_perimeters(
+            Perimeter.TYPES.commune, communes_data)
+        communes = get_perimeter_ids(Perimeter.TYPES.commune)
+
+        # Link perimeter to france, europe, regions, departements,
+        # "collectivités d'outre-mer", mainland / overseas, etc.
+        commune_ids = []
+        perimeter_links = []
+        collectivity_ids = set()
+        for entry, commune in zip(entries, communes_data):
+            commune_id = communes[commune['code']]
+            commune_ids.append(commune_id)
+            perimeter_links.append((commune_id, europe.id))
+            perimeter_links.append((commune_id, france.id))
+
+            for region_code in commune['regions']:
+                perimeter_links.append((commune_id, regions[region_code]))
+            for department_code in commune['departments']:
+                perimeter_links.append(
+                    (commune_id, departments[department_code]))
+
+            if commune['is_overseas']:
+                perimeter_links.append((commune_id, overseas.id))
             else:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=commune.id,
-                    to_perimeter_id=mainland.id))
+                perimeter_links.append((commune_id, mainland.id))
 
             if 'collectiviteOutremer' in entry:
                 code = entry['collectiviteOutremer']['code']
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=commune.id,
-                    to_perimeter_id=adhoc[code]))
-
-        # Create the links between the perimeters
-        PerimeterContainedIn.objects.bulk_create(
-            perimeter_links, ignore_conflicts=True)
+                collectivity_ids.add(adhoc[code])
+                perimeter_links.append((commune_id, adhoc[code]))
+
+        # Create the links between the perimeters, and remove the stale ones
+        container_ids = [europe.id, france.id, mainland.id, overseas.id]
+        container_ids += list(regions.values())
+        container_ids += list(departments.values())
+        container_ids += list(collectivity_ids)
+        nb_links_created, nb_links_deleted = sync_perimeter_links(
+            perimeter_links, commune_ids, container_ids)
+        refresh_perimeter_closure()
 
         self.stdout.write(self.style.SUCCESS(
             '%d communes created, %d updated.' % (nb_created, nb_updated)))
+        self.stdout.write(self.style.SUCCESS(
+            '%d links created, %d deleted.' % (
+                nb_links_created, nb_links_deleted)))
@@ -3,6 +3,7 @@ from django.db import transaction
 
 
 from geofr.models import Perimeter
+from geofr.utils import refresh_perimeter_closure
 
 
 class Command(BaseCommand):
@@ -24,3 +25,4 @@ class Command(BaseCommand):
         PerimeterContainedIn.objects.update_or_create(
             from_perimeter_id=france.id,
             to_perimeter_id=europe.id)
+        refresh_perimeter_closure([france.id, europe.id])
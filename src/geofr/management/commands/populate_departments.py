@@ -5,6 +5,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from geofr.models import Perimeter
+from geofr.utils import (get_perimeter_ids, refresh_perimeter_closure,
+                         sync_perimeter_links, upsert_perimeters)
 from geofr.constants import OVERSEAS_REGIONS
 
 
@@ -23,48 +25,39 @@ class Command(BaseCommand):
         europe = Perimeter.objects.get(
             scale=Perimeter.TYPES.continent,
             code='EU')
-        regions_qs = Perimeter.objects \
-            .filter(scale=Perimeter.TYPES.region) \
-            .values_list('code', 'id')
-        regions = dict(regions_qs)
-
-        PerimeterContainedIn = Perimeter.contained_in.through
-        perimeter_links = []
+        regions = get_perimeter_ids(Perimeter.TYPES.region)
 
         data_file = settings.DJANGO_ROOT + DATA_PATH
-        data = json.loads(data_file.read_file())
-        nb_created = 0
-        nb_updated = 0
-
+        with open(data_file) as json_file:
+            data = json.load(json_file)
+
+        nb_created, nb_updated = upsert_perimeters(
+            Perimeter.TYPES.department,
+            [{
+                'code': entry['code'],
+                'name': entry['nom'],
+                'regions': [entry['region']],
+                'is_overseas': (entry['region'] in OVERSEAS_REGIONS),
+            } for entry in data])
+        departments = get_perimeter_ids(Perimeter.TYPES.department)
+
+        # Create the links between the departments and their containers
+        department_ids = []
+        perimeter_links = []
         for entry in data:
-            department, created = Perimeter.objects.update_or_create(
-                scale=Perimeter.TYPES.department,
-                code=entry['code'],
-                defaults={
-                    'name': entry['nom'],
-                    'regions': [entry['region']],
-                    'is_overseas': (entry['region'] in OVERSEAS_REGIONS)
-                }
-            )
-            if created:
-                nb_created += 1
-            else:
-                nb_updated += 1
-
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=department.id,
-                to_perimeter_id=europe.id))
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=department.id,
-                to_perimeter_id=france.id))
-            for region_code in department.regions:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=department.id,
-                    to_perimeter_id=regions[region_code]))
+            department_id = departments[entry['code']]
+            department_ids.append(department_id)
+            perimeter_links.append((department_id, europe.id))
+            perimeter_links.append((department_id, france.id))
+            perimeter_links.append((department_id, regions[entry['region']]))
 
-        # Create the links between the regions and France / Europe
-        PerimeterContainedIn.objects.bulk_create(
-            perimeter_links, ignore_conflicts=True)
+        container_ids = [europe.id, france.id] + list(regions.values())
+        nb_links_created, nb_links_deleted = sync_perimeter_links(
+            perimeter_links, department_ids, container_ids)
+        refresh_perimeter_closure()
 
         self.stdout.write(self.style.SUCCESS(
             '%d departments created, %d updated.' % (nb_created, nb_updated)))
+        self.stdout.write(self.style.SUCCESS(
+            '%d links created, %d deleted.' % (
+                nb_links_created, nb_links_deleted)))
@@ -5,6 +5,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from geofr.models import Perimeter
+from geofr.utils import (get_perimeter_ids, refresh_perimeter_closure,
+                         sync_perimeter_links, upsert_perimeters)
 
 
 DATA_PATH = '/node_modules/@etalab/decoupage-administratif/data/epci.json'
@@ -28,87 +30,88 @@ class Command(BaseCommand):
         overseas = Perimeter.objects.get(
             scale=Perimeter.TYPES.adhoc,
             code='FRA-OM')
-        regions_qs = Perimeter.objects \
-            .filter(scale=Perimeter.TYPES.region) \
-            .values_list('code', 'id')
-        regions = dict(regions_qs)
-        departments_qs = Perimeter.objects \
-            .filter(scale=Perimeter.TYPES.department) \
-            .values_list('code', 'id')
-        departments = dict(departments_qs)
-
-        PerimeterContainedIn = Perimeter.contained_in.through
-        perimeter_links = []
+        regions = get_perimeter_ids(Perimeter.TYPES.region)
+        departments = get_perimeter_ids(Perimeter.TYPES.department)
+
+        # Load all the communes at once, instead of querying the members
+        # of each epci
+        communes_qs = Perimeter.objects \
+            .filter(scale=Perimeter.TYPES.commune) \
+            .values('code', 'id', 'departments', 'regions', 'is_overseas')
+        communes = {commune['code']: commune for commune in communes_qs}
 
         data_file = settings.DJANGO_ROOT + DATA_PATH
-        data = json.loads(data_file.read_file())
-        nb_created = 0
-        nb_updated = 0
+        with open(data_file) as json_file:
+            data = json.load(json_file)
 
+        epcis_data = []
+        epcis_members = []
         for entry in data:
 
             member_codes = [m['code'] for m in entry['membres']]
-            members = Perimeter.objects.filter(code__in=member_codes)
-            member_depts = []
-            member_regions = []
+            members = [
+                communes[code] for code in member_codes if code in communes]
+            member_depts = set()
+            member_regions = set()
             for member in members:
-                member_depts += member.departments
-                member_regions += member.regions
-
-            epci_name = entry['nom']
-            epci_code = entry['code']
-            is_overseas = members[0].is_overseas
-
-            epci, created = Perimeter.objects.update_or_create(
-                scale=Perimeter.TYPES.epci,
-                code=epci_code,
-                defaults={
-                    'name': epci_name,
-                    'departments': list(set(member_depts)),
-                    'regions': list(set(member_regions)),
-                    'is_overseas': is_overseas,
-                })
-            if created:
-                nb_created += 1
-            else:
-                nb_updated += 1
-
-            # Link perimeter to france, europe, regions, departements,
-            # "collectivités d'outre-mer", mainland / overseas, etc.
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=epci.id,
-                to_perimeter_id=europe.id))
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=epci.id,
-                to_perimeter_id=france.id))
-
-            for region_code in epci.regions:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=epci.id,
-                    to_perimeter_id=regions[region_code]))
-            for department_code in epci.departments:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=epci.id,
-                    to_perimeter_id=departments[department_code]))
-
-            if epci.is_overseas:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=epci.id,
-                    to_perimeter_id=overseas.id))
+                member_depts.update(member['departments'])
+                member_regions.update(member['regions'])
+
+            epcis_data.append({
+                'code': entry['code'],
+                'name': entry['nom'],
+                'departments': sorted(member_depts),
+                'regions': sorted(member_regions),
+                'is_overseas': members[0]['is_overseas'],
+            })
+            epcis_members.append([member['id'] for member in members])
+
+        nb_created, nb_updated = upsert_perimeters(
+            Perimeter.TYPES.epci, epcis_data)
+        epcis = get_perimeter_ids(Perimeter.TYPES.epci)
+
+        # Link perimeter to france, europe, regions, departements,
+        # "collectivités d'outre-mer", mainland / overseas, etc.
+        epci_ids = []
+        epci_links = []
+        member_links = []
+        for epci, members in zip(epcis_data, epcis_members):
+            epci_id = epcis[epci['code']]
+            epci_ids.append(epci_id)
+            epci_links.append((epci_id, europe.id))
+            epci_links.append((epci_id, france.id))
+
+            for region_code in epci['regions']:
+                epci_links.append((epci_id, regions[region_code]))
+            for department_code in epci['departments']:
+                epci_links.append((epci_id, departments[department_code]))
+
+            if epci['is_overseas']:
+                epci_links.append((epci_id, overseas.id))
             else:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=epci.id,
-                    to_perimeter_id=mainland.id))
+                epci_links.append((epci_id, mainland.id))
 
             # Link epci members to the epci
-            for member in members:
-                perimeter_links.append(PerimeterContainedIn(
-                    from_perimeter_id=member.id,
-                    to_perimeter_id=epci.id))
-
-        # Create the links between the perimeters
-        PerimeterContainedIn.objects.bulk_create(
-            perimeter_links, ignore_conflicts=True)
+            for member_id in members:
+                member_links.append((member_id, epci_id))
+
+        # Create the links between the perimeters, and remove the stale ones
+        container_ids = [europe.id, france.id, mainland.id, overseas.id]
+        container_ids += list(regions.values())
+        container_ids += list(departments.values())
+        nb_links_created, nb_links_deleted = sync_perimeter_links(
+            epci_links, epci_ids, container_ids)
+
+        # Communes can move from an epci to another
+        member_ids = [commune['id'] for commune in communes.values()]
+        nb_created_, nb_deleted_ = sync_perimeter_links(
+            member_links, member_ids, epci_ids)
+        nb_links_created += nb_created_
+        nb_links_deleted += nb_deleted_
+        refresh_perimeter_closure()
 
         self.stdout.write(self.style.SUCCESS(
             '%d epci created, %d updated.' % (nb_created, nb_updated)))
+        self.stdout.write(self.style.SUCCESS(
+            '%d links created, %d deleted.' % (
+                nb_links_created, nb_links_deleted)))
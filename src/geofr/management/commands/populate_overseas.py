@@ -5,6 +5,7 @@ from django.db import transaction
 from django.conf import settings
 
 from geofr.models import Perimeter
+from geofr.utils import refresh_perimeter_closure
 
 DATA_PATH = '/node_modules/@etalab/decoupage-administratif/data/communes.json'  # noqa
 
@@ -77,7 +78,8 @@ class Command(BaseCommand):
 
         # Import the "collectivités d'Outre-Mer"
         data_file = settings.DJANGO_ROOT + DATA_PATH
-        data = json.loads(data_file.read_file())
+        with open(data_file) as json_file:
+            data = json.load(json_file)
         coms = filter(lambda entry: 'collectiviteOutremer' in entry, data)
         for entry in coms:
             com, created = Perimeter.objects.update_or_create(
@@ -100,3 +102,4 @@ class Command(BaseCommand):
         # Create the links between the perimeters
         PerimeterContainedIn.objects.bulk_create(
             perimeter_links, ignore_conflicts=True)
+        refresh_perimeter_closure()
@@ -5,6 +5,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 from geofr.models import Perimeter
+from geofr.utils import (get_perimeter_ids, refresh_perimeter_closure,
+                         sync_perimeter_links, upsert_perimeters)
 from geofr.constants import OVERSEAS_REGIONS
 
 
@@ -24,40 +26,32 @@ class Command(BaseCommand):
             scale=Perimeter.TYPES.continent,
             code='EU')
 
-        PerimeterContainedIn = Perimeter.contained_in.through
-        perimeter_links = []
-
         data_file = settings.DJANGO_ROOT + DATA_PATH
-        data = json.loads(data_file.read_file())
-        nb_created = 0
-        nb_updated = 0
-
-        for entry in data:
-
-            # Create or update the region perimeters
-            region, created = Perimeter.objects.update_or_create(
-                scale=Perimeter.TYPES.region,
-                code=entry['code'],
-                defaults={
-                    'name': entry['nom'],
-                    'is_overseas': (entry['code'] in OVERSEAS_REGIONS),
-                }
-            )
-            if created:
-                nb_created += 1
-            else:
-                nb_updated += 1
-
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=region.id,
-                to_perimeter_id=europe.id))
-            perimeter_links.append(PerimeterContainedIn(
-                from_perimeter_id=region.id,
-                to_perimeter_id=france.id))
+        with open(data_file) as json_file:
+            data = json.load(json_file)
+
+        # Create or update the region perimeters
+        nb_created, nb_updated = upsert_perimeters(
+            Perimeter.TYPES.region,
+            [{
+                'code': entry['code'],
+                'name': entry['nom'],
+                'is_overseas': (entry['code'] in OVERSEAS_REGIONS),
+            } for entry in data])
+        regions = get_perimeter_ids(Perimeter.TYPES.region)
 
         # Create the links between the regions and France / Europe
-        PerimeterContainedIn.objects.bulk_create(
-            perimeter_links, ignore_conflicts=True)
+        region_ids = [regions[entry['code']] for entry in data]
+        perimeter_links = []
+        for region_id in region_ids:
+            perimeter_links.append((region_id, europe.id))
+            perimeter_links.append((region_id, france.id))
+        nb_links_created, nb_links_deleted = sync_perimeter_links(
+            perimeter_links, region_ids, [europe.id, france.id])
+        refresh_perimeter_closure()
 
         self.stdout.write(self.style.SUCCESS(
             '%d regions created, %d updated.' % (nb_created, nb_updated)))
+        self.stdout.write(self.style.SUCCESS(
+            '%d links created, %d deleted.' % (
+                nb_links_created, nb_links_deleted)))
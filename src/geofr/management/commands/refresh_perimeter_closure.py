@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from geofr.models import PerimeterClosure
+from geofr.utils import refresh_perimeter_closure
+
+
+class Command(BaseCommand):
+    """Rebuild the whole perimeter closure table.
+
+    The table is kept up to date by the `populate_*` commands and by the
+    perimeter admin, so this command should only be needed when links
+    were edited manually in the database.
+    """
+
+    def handle(self, *args, **options):
+        refresh_perimeter_closure()
+        nb_rows = PerimeterClosure.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            'Perimeter closure rebuilt ({} rows).'.format(nb_rows)))
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+BUILD_CLOSURE_SQL = '''
+    INSERT INTO geofr_perimeterclosure (perimeter_id, related_id)
+    SELECT id, id FROM geofr_perimeter
+    UNION
+    SELECT from_perimeter_id, to_perimeter_id
+    FROM geofr_perimeter_contained_in
+    UNION
+    SELECT to_perimeter_id, from_perimeter_id
+    FROM geofr_perimeter_contained_in
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geofr', '0028_auto_20200616_1117'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerimeterClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('perimeter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closure', to='geofr.Perimeter', verbose_name='Perimeter')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='geofr.Perimeter', verbose_name='Related perimeter')),
+            ],
+            options={
+                'verbose_name': 'Perimeter closure',
+                'verbose_name_plural': 'Perimeter closures',
+                'unique_together': {('perimeter', 'related')},
+            },
+        ),
+        migrations.RunSQL(
+            BUILD_CLOSURE_SQL,
+            'DELETE FROM geofr_perimeterclosure'),
+    ]
@@ -121,3 +121,40 @@ class Perimeter(models.Model):
     @property
     def id_slug(self):
         return '{}-{}'.format(self.id, slugify(self.name))
+
+
+class PerimeterClosure(models.Model):
+    """Precomputed closure of the perimeter containment graph.
+
+    For each perimeter, we store a row for the perimeter itself, a row for
+    every perimeter that contains it and a row for every perimeter it
+    contains.
+
+    E.g for Hérault, we would find rows for Hérault, Occitanie, France,
+    Europe, but also for Montpellier, Vic-la-Gardiole and all other communes
+    and epcis in Hérault.
+
+    This way, finding all the perimeters related to a given one is a single
+    index lookup, which is what the search engine needs.
+
+    This table is derived from the `contained_in` links and must never be
+    edited by hand. See `geofr.utils.refresh_perimeter_closure`.
+    """
+
+    perimeter = models.ForeignKey(
+        'geofr.Perimeter',
+        verbose_name=_('Perimeter'),
+        on_delete=models.CASCADE,
+        related_name='closure')
+    related = models.ForeignKey(
+        'geofr.Perimeter',
+        verbose_name=_('Related perimeter'),
+        on_delete=models.CASCADE,
+        related_name='+')
+
+    class Meta:
+        verbose_name = _('Perimeter closure')
+        verbose_name_plural = _('Perimeter closures')
+        unique_together = (
+            ('perimeter', 'related'),
+        )
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from geofr.models import Perimeter
+from geofr.utils import invalidate_perimeter_indexes, refresh_perimeter_closure
+
+
+@receiver(post_save, sender=Perimeter)
+def add_new_perimeter_to_closure(sender, instance, created, raw=False,
+                                 **kwargs):
+    """New perimeters must at least be related to themselves."""
+
+    if created and not raw:
+        refresh_perimeter_closure([instance.id])
+
+
+@receiver(post_save, sender=Perimeter)
+@receiver(post_delete, sender=Perimeter)
+def update_perimeter_indexes(sender, instance, raw=False, **kwargs):
+    """Names and zipcodes are searched with in-memory indexes."""
+
+    if not raw:
+        invalidate_perimeter_indexes()
+
+
+@receiver(m2m_changed, sender=Perimeter.contained_in.through)
+def update_perimeter_closure(sender, instance, action, pk_set, **kwargs):
+    """Keep the closure table in sync with `contained_in` links.
+
+    Note: `bulk_create` on the through model does not send this signal, so
+    code that creates links in bulk must refresh the closure by itself.
+    """
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        perimeter_ids = set(pk_set or []) | {instance.id}
+        refresh_perimeter_closure(perimeter_ids)
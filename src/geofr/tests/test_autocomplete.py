@@ -0,0 +1,110 @@
+import pytest
+from django.urls import reverse
+
+from geofr import autocomplete
+from core.autocomplete import SearchResults, fold
+from geofr.autocomplete import PerimeterIndex, RESULT_FIELDS
+from geofr.factories import PerimeterFactory
+from geofr.models import Perimeter
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def zipcodes(perimeters):
+    perimeters['montpellier'].zipcodes = ['34000', '34070', '34080']
+    perimeters['montpellier'].save()
+    perimeters['vic'].zipcodes = ['34110']
+    perimeters['vic'].save()
+
+
+@pytest.fixture
+def index(zipcodes):
+    return PerimeterIndex.load('test')
+
+
+def search(index, query, field='name'):
+    results = SearchResults(index.results, index.search(query), RESULT_FIELDS)
+    return [result[field] for result in results]
+
+
+def test_fold():
+    assert fold('Hérault') == 'herault'
+    assert fold('Île-de-France') == 'ile-de-france'
+
+
+def test_prefix_search(index):
+    assert search(index, 'montp') == ['Montpellier']
+    assert search(index, 'MONTP') == ['Montpellier']
+    assert search(index, 'gard vic') == ['Vic-la-Gardiole']
+
+
+def test_search_ignores_accents(index):
+    assert search(index, 'herault') == ['Hérault']
+    assert search(index, 'Hêrault') == ['Hérault']
+
+
+def test_fuzzy_search(index):
+    assert search(index, 'Monpelier') == ['Montpellier']
+
+
+def test_search_by_zipcode(index):
+    assert search(index, '34000') == ['Montpellier']
+    assert search(index, '341') == ['Vic-la-Gardiole']
+    assert search(index, '34') == ['Montpellier', 'Vic-la-Gardiole']
+    assert search(index, '34 vic') == ['Vic-la-Gardiole']
+
+
+def test_results_are_ranked_by_similarity_then_scale(perimeters):
+    commune = PerimeterFactory(
+        scale=Perimeter.TYPES.commune, code='99999', name='Occitanie')
+    adhoc = PerimeterFactory(
+        scale=Perimeter.TYPES.adhoc, code='OCC-LIT',
+        name='Occitanie littorale')
+    index = PerimeterIndex.load('test')
+
+    assert search(index, 'occitani', 'id') == [
+        perimeters['occitanie'].id_slug, commune.id_slug, adhoc.id_slug]
+
+
+def test_index_is_rebuilt_when_perimeters_change(perimeters):
+    """Modifying a perimeter invalidates the in-memory index."""
+
+    old_index = autocomplete.get_index()
+    assert autocomplete.get_index() is old_index
+
+    perimeters['vic'].name = 'Vic-la-Gardiole-sur-Mer'
+    perimeters['vic'].save()
+    new_index = autocomplete.get_index()
+    assert new_index is not old_index
+    assert search(new_index, 'vic') == ['Vic-la-Gardiole-sur-Mer']
+
+
+def test_api_search(client, zipcodes, perimeters,
+                    django_assert_num_queries):
+    autocomplete.get_index()
+    url = reverse('perimeters-list')
+
+    with django_assert_num_queries(0):
+        res = client.get(url, {'q': 'montpe'})
+    assert res.status_code == 200
+    assert res.json() == {
+        'count': 1,
+        'next': None,
+        'previous': None,
+        'results': [{
+            'id': perimeters['montpellier'].id_slug,
+            'name': 'Montpellier',
+            'scale': perimeters['montpellier'].get_scale_display(),
+            'text': str(perimeters['montpellier']),
+        }],
+    }
+
+
+def test_api_lists_all_perimeters_without_query(client, perimeters):
+    url = reverse('perimeters-list')
+    res = client.get(url)
+    results = res.json()['results']
+    assert res.json()['count'] == Perimeter.objects.count()
+    assert results[0]['name'] == 'Europe'
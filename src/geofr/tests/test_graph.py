@@ -0,0 +1,56 @@
+import pytest
+
+from geofr import graph
+from geofr.factories import Perimeter, PerimeterFactory
+from geofr.utils import combine_perimeters
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_related_ids(perimeters):
+    """The graph lists containers and contained perimeters."""
+
+    expected = {
+        perimeters[name].id for name in (
+            'herault', 'occitanie', 'france', 'europe', 'métropole',
+            'montpellier', 'vic')
+    }
+    assert graph.related_ids(perimeters['herault'].id) == expected
+
+
+def test_ancestor_and_descendant_ids(perimeters):
+    ancestors = graph.ancestor_ids(perimeters['montpellier'].id)
+    assert perimeters['herault'].id in ancestors
+    assert perimeters['montpellier'].id not in ancestors
+
+    descendants = graph.descendant_ids(perimeters['herault'].id)
+    assert descendants == {
+        perimeters['montpellier'].id, perimeters['vic'].id}
+
+
+def test_graph_is_reloaded_when_links_change(perimeters):
+    """Modifying perimeter links invalidates the in-memory graph."""
+
+    old_graph = graph.get_graph()
+    adhoc = PerimeterFactory(
+        name='Communes littorales',
+        scale=Perimeter.TYPES.adhoc)
+    perimeters['vic'].contained_in.add(adhoc)
+
+    assert graph.get_graph() is not old_graph
+    assert adhoc.id in graph.related_ids(perimeters['vic'].id)
+    assert perimeters['vic'].id in graph.related_ids(adhoc.id)
+
+
+def test_graph_is_not_reloaded_without_changes(perimeters):
+    current_graph = graph.get_graph()
+    assert graph.get_graph() is current_graph
+
+
+def test_combine_perimeters(perimeters):
+    """Combining perimeters returns the correct city codes."""
+
+    codes = combine_perimeters(
+        [perimeters['occitanie']], [perimeters['aveyron']])
+    assert set(codes) == {'34172', '34333'}
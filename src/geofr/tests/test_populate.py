@@ -0,0 +1,193 @@
+import json
+
+import pytest
+from unipath import Path
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from geofr.factories import PerimeterFactory
+from geofr.models import Perimeter, PerimeterClosure
+
+
+pytestmark = pytest.mark.django_db
+
+
+REGIONS = [
+    {'code': '76', 'nom': 'Occitanie'},
+    {'code': '01', 'nom': 'Guadeloupe'},
+]
+
+DEPARTMENTS = [
+    {'code': '34', 'nom': 'Hérault', 'region': '76'},
+    {'code': '12', 'nom': 'Aveyron', 'region': '76'},
+    {'code': '971', 'nom': 'Guadeloupe', 'region': '01'},
+]
+
+COMMUNES = [
+    {'code': '34172', 'nom': 'Montpellier', 'type': 'commune-actuelle',
+     'region': '76', 'departement': '34', 'codesPostaux': ['34000']},
+    {'code': '34333', 'nom': 'Vic-la-Gardiole', 'type': 'commune-actuelle',
+     'region': '76', 'departement': '34', 'codesPostaux': ['34110']},
+    {'code': '12202', 'nom': 'Rodez', 'type': 'commune-actuelle',
+     'region': '76', 'departement': '12', 'codesPostaux': ['12000']},
+    {'code': '97101', 'nom': 'Abymes', 'type': 'commune-actuelle',
+     'region': '01', 'departement': '971', 'codesPostaux': ['97139']},
+    {'code': '12300', 'nom': 'Rodez (ancienne)', 'type': 'commune-deleguee',
+     'region': '76', 'departement': '12', 'codesPostaux': ['12000']},
+]
+
+EPCIS = [
+    {'code': '243400017', 'nom': 'Montpellier Méditerranée Métropole',
+     'membres': [{'code': '34172'}, {'code': '34333'}]},
+    {'code': '241200187', 'nom': 'Rodez Agglomération',
+     'membres': [{'code': '12202'}]},
+]
+
+
+def write_data(data_dir, regions=REGIONS, departments=DEPARTMENTS,
+               communes=COMMUNES, epcis=EPCIS):
+    files = {
+        'regions.json': regions,
+        'departements.json': departments,
+        'communes.json': communes,
+        'epci.json': epcis,
+    }
+    for filename, data in files.items():
+        data_dir.child(filename).write_file(json.dumps(data))
+
+
+def populate():
+    for command in ('populate_regions', 'populate_departments',
+                    'populate_communes', 'populate_epcis'):
+        call_command(command)
+
+
+@pytest.fixture
+def data_dir(settings, tmp_path):
+    settings.DJANGO_ROOT = Path(str(tmp_path))
+    data_dir = settings.DJANGO_ROOT.child(
+        'node_modules', '@etalab', 'decoupage-administratif', 'data')
+    data_dir.mkdir(parents=True)
+    write_data(data_dir)
+    return data_dir
+
+
+@pytest.fixture
+def countries():
+    PerimeterFactory(scale=Perimeter.TYPES.continent, code='EU')
+    PerimeterFactory(scale=Perimeter.TYPES.country, code='FRA')
+    PerimeterFactory(scale=Perimeter.TYPES.adhoc, code='FRA-MET')
+    PerimeterFactory(scale=Perimeter.TYPES.adhoc, code='FRA-OM')
+
+
+def get_containers(scale, code):
+    perimeter = Perimeter.objects.get(scale=scale, code=code)
+    containers = perimeter.contained_in.values_list('code', flat=True)
+    return sorted(containers)
+
+
+def test_populate_perimeters(data_dir, countries, capsys):
+    populate()
+
+    out = capsys.readouterr().out
+    assert '2 regions created, 0 updated.' in out
+    assert '3 departments created, 0 updated.' in out
+    assert '4 communes created, 0 updated.' in out
+    assert '2 epci created, 0 updated.' in out
+
+    abymes = Perimeter.objects.get(
+        scale=Perimeter.TYPES.commune, code='97101')
+    assert abymes.name == 'Abymes'
+    assert abymes.zipcodes == ['97139']
+    assert abymes.is_overseas
+    assert not Perimeter.objects.filter(code='12300').exists()
+
+    epci = Perimeter.objects.get(
+        scale=Perimeter.TYPES.epci, code='243400017')
+    assert epci.departments == ['34']
+    assert epci.regions == ['76']
+    assert not epci.is_overseas
+
+    assert get_containers(Perimeter.TYPES.commune, '34172') == [
+        '243400017', '34', '76', 'EU', 'FRA', 'FRA-MET']
+    assert get_containers(Perimeter.TYPES.commune, '97101') == [
+        '01', '971', 'EU', 'FRA', 'FRA-OM']
+    assert get_containers(Perimeter.TYPES.epci, '241200187') == [
+        '12', '76', 'EU', 'FRA', 'FRA-MET']
+
+    # The closure table was refreshed
+    montpellier = Perimeter.objects.get(
+        scale=Perimeter.TYPES.commune, code='34172')
+    assert PerimeterClosure.objects \
+        .filter(perimeter=montpellier, related__code='243400017') \
+        .exists()
+
+
+def test_populate_is_idempotent(data_dir, countries, capsys):
+    populate()
+    capsys.readouterr()
+    populate()
+
+    out = capsys.readouterr().out
+    assert '0 regions created, 0 updated.' in out
+    assert '0 departments created, 0 updated.' in out
+    assert '0 communes created, 0 updated.' in out
+    assert '0 epci created, 0 updated.' in out
+    assert out.count('0 links created, 0 deleted.') == 4
+
+
+def test_populate_removes_stale_links(data_dir, countries, capsys):
+    populate()
+    capsys.readouterr()
+
+    # Vic-la-Gardiole moves to the Aveyron, and to Rodez Agglomération
+    communes = [dict(commune) for commune in COMMUNES]
+    communes[1]['departement'] = '12'
+    epcis = [
+        {'code': '243400017', 'nom': 'Montpellier Méditerranée Métropole',
+         'membres': [{'code': '34172'}]},
+        {'code': '241200187', 'nom': 'Rodez Agglomération',
+         'membres': [{'code': '12202'}, {'code': '34333'}]},
+    ]
+    write_data(data_dir, communes=communes, epcis=epcis)
+    populate()
+
+    out = capsys.readouterr().out
+    assert '0 communes created, 1 updated.' in out
+    assert '0 epci created, 0 updated.' in out
+    assert out.count('1 links created, 1 deleted.') == 2
+
+    assert get_containers(Perimeter.TYPES.commune, '34333') == [
+        '12', '241200187', '76', 'EU', 'FRA', 'FRA-MET']
+    assert get_containers(Perimeter.TYPES.epci, '241200187') == [
+        '12', '76', 'EU', 'FRA', 'FRA-MET']
+
+    vic = Perimeter.objects.get(scale=Perimeter.TYPES.commune, code='34333')
+    related = PerimeterClosure.objects \
+        .filter(perimeter=vic) \
+        .values_list('related__code', flat=True)
+    assert '34' not in related
+    assert '243400017' not in related
+
+
+def test_populate_communes_queries_do_not_depend_on_size(
+        data_dir, countries):
+    populate()
+
+    def count_queries(nb_communes):
+        communes = [{
+            'code': '34{:03}'.format(i),
+            'nom': 'Commune {}'.format(i),
+            'type': 'commune-actuelle',
+            'region': '76',
+            'departement': '34',
+            'codesPostaux': ['34000'],
+        } for i in range(nb_communes)]
+        write_data(data_dir, communes=communes)
+        with CaptureQueriesContext(connection) as queries:
+            call_command('populate_communes')
+        return len(queries)
+
+    # Links are created in batches of 1000 rows
+    assert count_queries(3) == count_queries(150)
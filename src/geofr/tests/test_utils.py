@@ -1,6 +1,12 @@
 import pytest
-from geofr.utils import department_from_zipcode, is_overseas, attach_perimeters
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from geofr.utils import (department_from_zipcode, is_overseas,
+                         attach_perimeters, combine_perimeters,
+                         refresh_perimeter_closure)
 from geofr.factories import Perimeter, PerimeterFactory
+from geofr.models import PerimeterClosure
 
 
 pytestmark = pytest.mark.django_db
@@ -56,3 +62,97 @@ def test_attach_perimeters_cleans_old_data(perimeters):
         ['34333', '97209'])  # Vic-la-gardiole, Fort-de-France
 
     assert adhoc not in perimeters['rodez'].contained_in.all()
+
+
+def test_attach_perimeters_without_cities(perimeters):
+    adhoc = PerimeterFactory(
+        name='Communes littorales',
+        scale=Perimeter.TYPES.adhoc)
+    perimeters['rodez'].contained_in.add(adhoc)
+    attach_perimeters(adhoc, [])
+
+    assert not adhoc.contained_in.through.objects \
+        .filter(to_perimeter=adhoc) \
+        .exists()
+
+
+def attach_new_adhoc(city_codes):
+    """Attach a new ad-hoc perimeter, and count the queries."""
+
+    adhoc = PerimeterFactory(scale=Perimeter.TYPES.adhoc)
+    with CaptureQueriesContext(connection) as queries:
+        attach_perimeters(adhoc, city_codes)
+    return adhoc, len(queries)
+
+
+def test_attach_combined_perimeters(perimeters):
+    """Combined perimeters are attached without loading the communes."""
+
+    city_codes = combine_perimeters(
+        [perimeters['occitanie']], [perimeters['aveyron']])
+    adhoc, nb_queries = attach_new_adhoc(city_codes)
+
+    assert adhoc in perimeters['vic'].contained_in.all()
+    assert adhoc in perimeters['montpellier'].contained_in.all()
+    assert adhoc in perimeters['herault'].contained_in.all()
+    assert adhoc in perimeters['occitanie'].contained_in.all()
+    assert adhoc not in perimeters['rodez'].contained_in.all()
+    assert adhoc not in perimeters['aveyron'].contained_in.all()
+    assert adhoc not in perimeters['france'].contained_in.all()
+    assert {perimeters[name].id for name in (
+        'vic', 'montpellier', 'herault', 'occitanie')} < related_ids(adhoc)
+    assert perimeters['rodez'].id not in related_ids(adhoc)
+
+    # The number of queries does not depend on the number of communes
+    communes = PerimeterFactory.create_batch(
+        10,
+        scale=Perimeter.TYPES.commune,
+        contained_in=[perimeters['herault'], perimeters['occitanie']])
+    adhoc, more_communes_nb_queries = attach_new_adhoc(city_codes)
+    assert more_communes_nb_queries == nb_queries
+    assert all(adhoc in commune.contained_in.all() for commune in communes)
+    assert {commune.id for commune in communes} < related_ids(adhoc)
+
+
+def related_ids(perimeter):
+    return set(PerimeterClosure.objects
+               .filter(perimeter=perimeter)
+               .values_list('related_id', flat=True))
+
+
+def test_perimeter_closure(perimeters):
+    """The closure table lists containers and contained perimeters."""
+
+    expected = {
+        perimeters[name].id for name in (
+            'herault', 'occitanie', 'france', 'europe', 'métropole',
+            'montpellier', 'vic')
+    }
+    assert related_ids(perimeters['herault']) == expected
+
+
+def test_perimeter_closure_is_updated_on_attach(perimeters):
+    """Attaching perimeters updates the closure table."""
+
+    adhoc = PerimeterFactory(
+        name='Communes littorales',
+        scale=Perimeter.TYPES.adhoc)
+    assert related_ids(adhoc) == {adhoc.id}
+
+    attach_perimeters(adhoc, ['34333'])  # Vic-la-gardiole
+    assert perimeters['vic'].id in related_ids(adhoc)
+    assert adhoc.id in related_ids(perimeters['vic'])
+    assert adhoc.id in related_ids(perimeters['herault'])
+    assert adhoc.id not in related_ids(perimeters['montpellier'])
+
+
+def test_refresh_perimeter_closure(perimeters):
+    """The closure table can be rebuilt from scratch."""
+
+    before = set(PerimeterClosure.objects.values_list(
+        'perimeter_id', 'related_id'))
+    PerimeterClosure.objects.all().delete()
+    refresh_perimeter_closure()
+    after = set(PerimeterClosure.objects.values_list(
+        'perimeter_id', 'related_id'))
+    assert before == after
@@ -0,0 +1,63 @@
+import pytest
+from django.urls import reverse
+
+from geofr import zipcodes
+from geofr.factories import PerimeterFactory
+from geofr.models import Perimeter
+from geofr.zipcodes import ZipcodeIndex, commune_ids_from_zipcode
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def communes(perimeters):
+    perimeters['montpellier'].zipcodes = ['34000', '34070', '34080']
+    perimeters['montpellier'].save()
+    perimeters['vic'].zipcodes = ['34110']
+    perimeters['vic'].save()
+    frontignan = PerimeterFactory(
+        scale=Perimeter.TYPES.commune,
+        name='Frontignan',
+        code='34108',
+        zipcodes=['34110'])
+    return dict(perimeters, frontignan=frontignan)
+
+
+def test_zipcode_index():
+    index = ZipcodeIndex('test', [
+        (1, ['34000', '34070']),
+        (2, ['34110']),
+        (3, ['34110', '34110']),
+        (4, None),
+    ])
+    assert len(index) == 4
+    assert index.commune_ids_for('34000') == {1}
+    assert index.commune_ids_for('34110') == {2, 3}
+    assert index.commune_ids_for('34') == set()
+    assert index.commune_ids_for('99999') == set()
+
+
+def test_commune_ids_from_zipcode(communes):
+    assert commune_ids_from_zipcode('34070') == {communes['montpellier'].id}
+    assert commune_ids_from_zipcode('34110') == {
+        communes['vic'].id, communes['frontignan'].id}
+
+
+def test_index_is_reloaded_when_zipcodes_change(communes):
+    old_index = zipcodes.get_index()
+    assert zipcodes.get_index() is old_index
+
+    communes['rodez'].zipcodes = ['12000']
+    communes['rodez'].save()
+    assert zipcodes.get_index() is not old_index
+    assert commune_ids_from_zipcode('12000') == {communes['rodez'].id}
+
+
+def test_api_lists_communes_by_zipcode(client, communes):
+    url = reverse('perimeters-list')
+    res = client.get(url, {'zipcode': '34110'})
+    assert res.status_code == 200
+    results = res.json()['results']
+    assert [result['name'] for result in results] == [
+        'Frontignan', 'Vic-la-Gardiole']
@@ -1,6 +1,12 @@
-from django.db import transaction
+from django.core.exceptions import EmptyResultSet
+from django.db import transaction, connection
 from geofr.constants import OVERSEAS_PREFIX, DEPARTMENT_TO_REGION
-from geofr.models import Perimeter
+from geofr.models import Perimeter, PerimeterClosure
+from geofr import autocomplete, graph, zipcodes
+
+
+# Number of rows inserted or updated in a single query
+BATCH_SIZE = 1000
 
 
 def department_from_zipcode(zipcode):
@@ -37,6 +43,11 @@ def attach_perimeters(adhoc, city_codes):
     "Vic-la-Gardiole" city perimeter, we add "Communes littorales" to
     "Vic-la-Gardiole".contained_in, but also to "Herault".contained_in,
     "Occitanie".contained_in…
+
+    `city_codes` can also be a queryset of codes (see `combine_perimeters`),
+    in which case the communes are never loaded in python.
+
+    The links are created with a single `INSERT … SELECT` query.
     """
     # Delete existing links
     PerimeterContainedIn = Perimeter.contained_in.through
@@ -44,30 +55,47 @@ def attach_perimeters(adhoc, city_codes):
         .filter(to_perimeter_id=adhoc.id) \
         .delete()
 
-    # Fetch perimeters corresponding to the given city codes
-    perimeters = Perimeter.objects \
+    # Select perimeters corresponding to the given city codes
+    commune_ids = Perimeter.objects \
         .filter(code__in=city_codes) \
         .filter(scale=Perimeter.TYPES.commune) \
-        .prefetch_related('contained_in')
-
-    # Put the adhoc perimeter in the cities `contained_in` lists
-    containing = []
-    for perimeter in perimeters:
-        containing.append(PerimeterContainedIn(
-            from_perimeter_id=perimeter.id,
-            to_perimeter_id=adhoc.id))
-
-        # Perimeters that contain the cities must contain the adhoc perimeter
-        # except for France and Europe.
-        for container in perimeter.contained_in.all():
-            if container != adhoc and container.scale <= Perimeter.TYPES.adhoc:
-                containing.append(PerimeterContainedIn(
-                    from_perimeter_id=container.id,
-                    to_perimeter_id=adhoc.id))
-
-    # Bulk create the links
-    PerimeterContainedIn.objects.bulk_create(
-        containing, ignore_conflicts=True)
+        .order_by() \
+        .values('id')
+
+    # Perimeters that contain the cities must contain the adhoc perimeter
+    # except for France and Europe.
+    container_ids = PerimeterContainedIn.objects \
+        .filter(from_perimeter_id__in=commune_ids) \
+        .filter(to_perimeter__scale__lte=Perimeter.TYPES.adhoc) \
+        .exclude(to_perimeter_id=adhoc.id) \
+        .values('to_perimeter_id')
+
+    try:
+        communes_sql, communes_params = commune_ids.query.sql_with_params()
+        containers_sql, containers_params = \
+            container_ids.query.sql_with_params()
+    except EmptyResultSet:
+        # There is no city code at all
+        pass
+    else:
+        insert_sql = '''
+            INSERT INTO {links} (from_perimeter_id, to_perimeter_id)
+            SELECT communes.id, %s
+            FROM ({communes}) AS communes
+            UNION
+            SELECT containers.to_perimeter_id, %s
+            FROM ({containers}) AS containers
+            ON CONFLICT DO NOTHING
+        '''.format(
+            links=PerimeterContainedIn._meta.db_table,
+            communes=communes_sql,
+            containers=containers_sql)
+        params = [adhoc.id, *communes_params, adhoc.id, *containers_params]
+        with connection.cursor() as cursor:
+            cursor.execute(insert_sql, params)
+
+    # Only the rows involving the adhoc perimeter need to be updated
+    refresh_perimeter_closure([adhoc.id])
 
 
 def combine_perimeters(add_perimeters, rm_perimeters):
@@ -75,15 +103,228 @@ def combine_perimeters(add_perimeters, rm_perimeters):
 
     Return the city codes that are in `add_perimeters` and not in
     `rm_perimeters`.
+
+    The result is a lazy queryset computed from the closure table, so it can
+    be passed to `attach_perimeters` without going through python.
     """
-    in_city_codes = Perimeter.objects \
+    added_ids = PerimeterClosure.objects \
+        .filter(related__in=add_perimeters) \
+        .values('perimeter_id')
+    removed_ids = PerimeterClosure.objects \
+        .filter(related__in=rm_perimeters) \
+        .values('perimeter_id')
+    city_codes = Perimeter.objects \
         .filter(scale=Perimeter.TYPES.commune) \
-        .filter(contained_in__in=add_perimeters) \
+        .filter(id__in=added_ids) \
+        .exclude(id__in=removed_ids) \
+        .order_by() \
         .values_list('code', flat=True)
+    return city_codes
 
-    out_city_codes = Perimeter.objects \
-        .filter(scale=Perimeter.TYPES.commune) \
-        .filter(contained_in__in=rm_perimeters) \
-        .values_list('code', flat=True)
 
-    return set(in_city_codes) - set(out_city_codes)
+@transaction.atomic
+def refresh_perimeter_closure(perimeter_ids=None):
+    """Update the `PerimeterClosure` table from the `contained_in` links.
+
+    If `perimeter_ids` is None, the whole table is rebuilt. Otherwise, only
+    the rows involving the given perimeters are recomputed.
+
+    Since the `contained_in` links are already flattened (a commune is
+    directly linked to its department, region, country, etc.), the closure
+    rows involving a perimeter can be derived from the links involving that
+    same perimeter, and we don't need any recursive query.
+    """
+    closure_table = PerimeterClosure._meta.db_table
+    links_table = Perimeter.contained_in.through._meta.db_table
+    perimeter_table = Perimeter._meta.db_table
+
+    if perimeter_ids is None:
+        delete_where = 'TRUE'
+        self_where = 'TRUE'
+        links_where = 'TRUE'
+        delete_params = []
+        insert_params = []
+    else:
+        ids = list(perimeter_ids)
+        if not ids:
+            return
+
+        delete_where = 'perimeter_id = ANY(%s) OR related_id = ANY(%s)'
+        self_where = 'id = ANY(%s)'
+        links_where = \
+            'from_perimeter_id = ANY(%s) OR to_perimeter_id = ANY(%s)'
+        delete_params = [ids, ids]
+        insert_params = [ids, ids, ids, ids, ids]
+
+    delete_sql = 'DELETE FROM {closure} WHERE {where}'.format(
+        closure=closure_table,
+        where=delete_where)
+    insert_sql = '''
+        INSERT INTO {closure} (perimeter_id, related_id)
+        SELECT id, id
+        FROM {perimeter} WHERE {self_where}
+        UNION
+        SELECT from_perimeter_id, to_perimeter_id
+        FROM {links} WHERE {links_where}
+        UNION
+        SELECT to_perimeter_id, from_perimeter_id
+        FROM {links} WHERE {links_where}
+        ON CONFLICT DO NOTHING
+    '''.format(
+        closure=closure_table,
+        perimeter=perimeter_table,
+        links=links_table,
+        self_where=self_where,
+        links_where=links_where)
+
+    with connection.cursor() as cursor:
+        cursor.execute(delete_sql, delete_params)
+        cursor.execute(insert_sql, insert_params)
+
+    # In-memory copies of the graph must be reloaded
+    graph.perimeter_graph.invalidate()
+
+
+def invalidate_perimeter_indexes():
+    """Make sure all workers rebuild the in-memory perimeter indexes.
+
+    The autocomplete and zipcode indexes are built from the perimeter names
+    and zipcodes.
+    """
+    autocomplete.perimeter_index.invalidate()
+    zipcodes.zipcode_index.invalidate()
+
+
+def get_perimeter_ids(scale):
+    """Return the ids of all perimeters of a given scale, by code."""
+
+    perimeters = Perimeter.objects \
+        .filter(scale=scale) \
+        .values_list('code', 'id')
+    return dict(perimeters)
+
+
+@transaction.atomic
+def upsert_perimeters(scale, perimeters):
+    """Create or update perimeters of a given scale, in bulk.
+
+    `perimeters` is a list of dicts of field values, all with the same keys,
+    including the `code` key. Existing perimeters (with the same scale and
+    code) are only updated if one of those values changed. Other fields of
+    new perimeters get their default value.
+
+    Note: the `post_save` signal is not sent, so the closure table must be
+    refreshed afterwards.
+
+    Returns the (nb_created, nb_updated) tuple.
+    """
+    if not perimeters:
+        return 0, 0
+
+    # A row cannot be updated twice in the same query
+    perimeters = list({
+        perimeter['code']: perimeter for perimeter in perimeters}.values())
+
+    fields = [
+        field for field in Perimeter._meta.concrete_fields
+        if not field.primary_key]
+    updated_fields = [
+        field for field in fields
+        if field.name in perimeters[0] and field.name != 'code']
+
+    columns = ', '.join(field.column for field in fields)
+    placeholders = '({})'.format(', '.join(['%s'] * len(fields)))
+    updates = ', '.join(
+        '{column} = EXCLUDED.{column}'.format(column=field.column)
+        for field in updated_fields)
+    current_values = ', '.join(
+        '{table}.{column}'.format(
+            table=Perimeter._meta.db_table, column=field.column)
+        for field in updated_fields)
+    new_values = ', '.join(
+        'EXCLUDED.{}'.format(field.column) for field in updated_fields)
+
+    nb_created = 0
+    nb_updated = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(perimeters), BATCH_SIZE):
+            batch = perimeters[start:start + BATCH_SIZE]
+            params = []
+            for perimeter in batch:
+                values = dict(perimeter, scale=scale)
+                params += [
+                    field.get_db_prep_save(
+                        values.get(field.name, field.get_default()),
+                        connection)
+                    for field in fields]
+
+            # `xmax` is zero for inserted rows
+            upsert_sql = '''
+                INSERT INTO {table} ({columns})
+                VALUES {values}
+                ON CONFLICT (scale, code) DO UPDATE SET {updates}
+                WHERE ({current_values}) IS DISTINCT FROM ({new_values})
+                RETURNING xmax = 0
+            '''.format(
+                table=Perimeter._meta.db_table,
+                columns=columns,
+                values=', '.join([placeholders] * len(batch)),
+                updates=updates,
+                current_values=current_values,
+                new_values=new_values)
+            cursor.execute(upsert_sql, params)
+            for created, in cursor.fetchall():
+                if created:
+                    nb_created += 1
+                else:
+                    nb_updated += 1
+
+    if nb_created or nb_updated:
+        invalidate_perimeter_indexes()
+
+    return nb_created, nb_updated
+
+
+@transaction.atomic
+def sync_perimeter_links(links, from_ids, to_ids):
+    """Make the `contained_in` links match the given ones, in bulk.
+
+    `links` is an iterable of (from_perimeter_id, to_perimeter_id) tuples.
+
+    Only existing links from the `from_ids` perimeters to the `to_ids`
+    perimeters are considered, so links managed by other means (e.g ad-hoc
+    perimeters) are not affected. The ones that are not in `links` anymore
+    are deleted.
+
+    Note: the `m2m_changed` signal is not sent, so the closure table must be
+    refreshed afterwards.
+
+    Returns the (nb_created, nb_deleted) tuple.
+    """
+    PerimeterContainedIn = Perimeter.contained_in.through
+
+    links = set(links)
+    existing_links = PerimeterContainedIn.objects \
+        .filter(from_perimeter_id__in=list(from_ids)) \
+        .filter(to_perimeter_id__in=list(to_ids)) \
+        .values_list('from_perimeter_id', 'to_perimeter_id', 'id')
+    existing_ids = {
+        (from_id, to_id): link_id
+        for from_id, to_id, link_id in existing_links}
+
+    stale_ids = [
+        link_id for link, link_id in existing_ids.items()
+        if link not in links]
+    for start in range(0, len(stale_ids), BATCH_SIZE):
+        PerimeterContainedIn.objects \
+            .filter(id__in=stale_ids[start:start + BATCH_SIZE]) \
+            .delete()
+
+    new_links = [
+        PerimeterContainedIn(from_perimeter_id=from_id, to_perimeter_id=to_id)
+        for from_id, to_id in links
+        if (from_id, to_id) not in existing_ids]
+    PerimeterContainedIn.objects.bulk_create(
+        new_links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    return len(new_links), len(stale_ids)
@@ -0,0 +1,72 @@
+"""In-memory zipcode → commune index.
+
+A zipcode can be shared by several communes, and a commune can have several
+zipcodes. Finding the communes of a zipcode in the db requires a scan of the
+`Perimeter.zipcodes` array field. Since the zipcodes only change when the
+communes are imported (see `populate_communes`), every worker loads all of
+them once, in two sorted arrays: `zipcodes[i]` is a zipcode of the commune
+with id `commune_ids[i]`.
+
+Like the perimeter graph (see `geofr.graph`), the index is tagged with a
+version stamp stored in the cache, that is bumped every time a perimeter is
+modified. Workers reload the index upon next access.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from core.cache import VersionedSingleton
+from geofr.models import Perimeter
+
+
+VERSION_CACHE_KEY = 'geofr:zipcode_index_version'
+
+
+class ZipcodeIndex:
+    """A read-only snapshot of the commune zipcodes."""
+
+    def __init__(self, version, communes):
+        """Build the index.
+
+        `communes` is a list of (id, zipcodes) tuples.
+        """
+        self.version = version
+        pairs = sorted(
+            (zipcode, commune_id)
+            for commune_id, zipcodes in communes
+            for zipcode in set(zipcodes or []))
+        self.zipcodes = [zipcode for zipcode, _ in pairs]
+        self.commune_ids = array('l', (commune_id for _, commune_id in pairs))
+
+    @classmethod
+    def load(cls, version):
+        communes = list(Perimeter.objects
+                        .filter(scale=Perimeter.TYPES.commune)
+                        .exclude(zipcodes=None)
+                        .values_list('id', 'zipcodes'))
+        return cls(version, communes)
+
+    def __len__(self):
+        return len(self.zipcodes)
+
+    def commune_ids_for(self, zipcode):
+        """Ids of the communes with the given zipcode."""
+
+        start = bisect_left(self.zipcodes, zipcode)
+        end = bisect_right(self.zipcodes, zipcode, start)
+        return frozenset(self.commune_ids[start:end])
+
+
+zipcode_index = VersionedSingleton(VERSION_CACHE_KEY, ZipcodeIndex.load)
+
+
+def get_index():
+    """Return an up-to-date index, loading it if necessary."""
+
+    return zipcode_index.get()
+
+
+def commune_ids_from_zipcode(zipcode):
+    """Ids of the communes with the given zipcode."""
+
+    return get_index().commune_ids_for(zipcode)
@@ -81,6 +81,7 @@ class SiteHome(MinisiteMixin, SearchView):
     """A static search page with admin-customizable content."""
 
     template_name = 'minisites/search_page.html'
+    facet_fields = ('targeted_audiances', 'categories')
 
     def get_form_kwargs(self):
         """Set the data passed to the form.
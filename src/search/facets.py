@@ -0,0 +1,107 @@
+"""Count matching aids by theme and by category.
+
+The multi-step search form displays, for the current search, the number of
+matching aids for every theme and every category, and the total number of
+matching aids.
+
+Grouping by theme and by category requires two costly queries, since each of
+them has to run the full search query first. Instead, we fetch the
+(aid, category, theme) tuples of the matching aids in a single query, and we
+compute all the counts in memory. Counts are cached alongside the search
+results (see `aids.search_cache`).
+"""
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from aids.models import Aid
+from aids.search_cache import get_search_cache_key
+
+
+class AidFacets:
+    """Theme counts, category counts and total of a search.
+
+    `filter_form` is the `AidSearchForm` used to filter aids.
+    """
+
+    def __init__(self, filter_form):
+        self.filter_form = filter_form
+        self.counts = self.get_counts()
+
+    def get_counts(self):
+        filtered_qs = self.filter_form.filter_queryset()
+        cache_key = get_search_cache_key(self.filter_form, 'facets')
+        counts = cache.get(cache_key)
+        if counts is None:
+            counts = self.compute_counts(filtered_qs)
+            cache.set(cache_key, counts, settings.SEARCH_CACHE_TIMEOUT)
+        return counts
+
+    def compute_counts(self, filtered_qs):
+        """Compute all counts from a single query.
+
+        We join on categories from a subquery, because the search query
+        may already have joined on categories (e.g to filter by theme), and
+        this existing join would be reused otherwise.
+        """
+        matching_ids = filtered_qs.order_by().values('id')
+        rows = Aid.objects \
+            .filter(id__in=matching_ids) \
+            .order_by('categories__theme__name', 'categories__name') \
+            .values_list(
+                'id',
+                'categories__theme__slug',
+                'categories__theme__name',
+                'categories__slug',
+                'categories__name')
+
+        aid_ids = set()
+        themes = OrderedDict()
+        categories = OrderedDict()
+        for aid_id, theme_slug, theme_name, slug, name in rows:
+            aid_ids.add(aid_id)
+            if slug is None:
+                continue
+
+            theme = themes.setdefault(theme_slug, (theme_name, set()))
+            theme[1].add(aid_id)
+            category = categories.setdefault(
+                slug, (theme_slug, theme_name, name, set()))
+            category[3].add(aid_id)
+
+        return {
+            'total': len(aid_ids),
+            'themes': [
+                {'slug': slug, 'name': name, 'nb_aids': len(ids)}
+                for slug, (name, ids) in themes.items()],
+            'categories': [
+                {'theme_slug': theme_slug, 'theme_name': theme_name,
+                 'slug': slug, 'name': name, 'nb_aids': len(ids)}
+                for slug, (theme_slug, theme_name, name, ids)
+                in categories.items()],
+        }
+
+    @property
+    def total(self):
+        """Number of distinct matching aids, with or without categories."""
+        return self.counts['total']
+
+    @property
+    def themes(self):
+        """Themes of matching aids, ordered by name."""
+        return self.counts['themes']
+
+    def get_categories(self, themes=None):
+        """Categories of matching aids, ordered by theme and name.
+
+        If a list of theme slugs is given, only the categories of those
+        themes are returned.
+        """
+        categories = self.counts['categories']
+        if themes:
+            categories = [
+                category for category in categories
+                if category['theme_slug'] in themes]
+        return categories
@@ -2,7 +2,6 @@ from itertools import groupby
 from operator import itemgetter
 
 from django import forms
-from django.db.models import Count
 from django.contrib.admin.widgets import FilteredSelectMultiple
 from django.utils.translation import ugettext_lazy as _
 
@@ -11,6 +10,7 @@ from categories.models import Theme, Category
 from categories.fields import CategoryMultipleChoiceField
 from geofr.models import Perimeter
 from aids.forms import AidSearchForm
+from search.facets import AidFacets
 
 
 AUDIANCES = [
@@ -53,17 +53,28 @@ class PerimeterSearchForm(forms.Form):
         required=False)
 
 
-class ThemeChoiceIterator(forms.models.ModelChoiceIterator):
-    """Custom iterator for the `Theme` queryset.
+class FacetChoiceIterator(forms.models.ModelChoiceIterator):
+    """Custom iterator over precomputed facets.
 
     This class generates the list of choices to be rendered by the widget.
 
-    We need to create a custom iterator because the theme queryset is
-    a bit peculiar. See below.
+    Choices are not generated from the field queryset, but from the list of
+    facets (dicts with the aid count for every value, see
+    `search.facets.AidFacets`) that is assigned to the field.
     """
+    def __iter__(self):
+        for obj in self.field.facets:
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.facets)
+
+    def __bool__(self):
+        return bool(self.field.facets)
+
     def choice(self, obj):
         return (
-            obj['categories__theme__slug'],
+            obj['slug'],
             self.field.label_from_instance(obj),
         )
 
@@ -74,11 +85,11 @@ class ThemeChoiceField(forms.ModelMultipleChoiceField):
     We override the iterator and display the number of matching aids
     in the widget.
     """
-    iterator = ThemeChoiceIterator
+    iterator = FacetChoiceIterator
+    facets = []
 
     def label_from_instance(self, obj):
-        return '{} ({})'.format(
-            obj['categories__theme__name'], obj['nb_aids'])
+        return '{} ({})'.format(obj['name'], obj['nb_aids'])
 
 
 class ThemeWidget(forms.widgets.ChoiceWidget):
@@ -102,44 +113,26 @@ class ThemeSearchForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # We have a problem here.
         # We want to return the list of existing themes, but we also want to
         # count the number of aids **matching the current search** for each
-        # theme.
-        #
-        # Since the search query is already quite complex to generate, we
-        # use it as a base and then we do a join on categories and themes,
-        # then we group by theme and count.
+        # theme. See `search.facets` for the details.
         filter_form = AidSearchForm(self.initial)
-        themes_with_aid_count = filter_form.filter_queryset() \
-            .exclude(categories__isnull=True) \
-            .values('categories__theme__slug', 'categories__theme__name') \
-            .annotate(nb_aids=Count('id', distinct=True)) \
-            .order_by('categories__theme__name')
-        self.fields['themes'].queryset = themes_with_aid_count
+        self.facets = AidFacets(filter_form)
+        self.fields['themes'].facets = self.facets.themes
 
 
-class CategoryIterator(forms.models.ModelChoiceIterator):
+class CategoryIterator(FacetChoiceIterator):
     """Custom iterator for the category list.
 
-    We do several custom things here:
-      - handle the peculiar queryset that was used to select categories
-      - group the categories by the associated theme
-      - pass the correct parameters to the widget renderer.
+    Categories are grouped by the associated theme.
     """
-    groupby = 'categories__theme__name'  # as selected in the queryset
+    groupby = 'theme_name'
 
     def __iter__(self):
-
-        for group, objs in groupby(self.queryset, itemgetter(self.groupby)):
+        facets = self.field.facets
+        for group, objs in groupby(facets, itemgetter(self.groupby)):
             yield (group, [self.choice(obj) for obj in objs])
 
-    def choice(self, obj):
-        return (
-            obj['categories__slug'],
-            self.field.label_from_instance(obj),
-        )
-
 
 class CategoryChoiceField(forms.ModelMultipleChoiceField):
     """Custom choice field for the category list.
@@ -147,10 +140,10 @@ class CategoryChoiceField(forms.ModelMultipleChoiceField):
     We override the iterator and pass the aid count to the widget label.
     """
     iterator = CategoryIterator
+    facets = []
 
     def label_from_instance(self, obj):
-        return '{} ({})'.format(
-            obj['categories__name'], obj['nb_aids'])
+        return '{} ({})'.format(obj['name'], obj['nb_aids'])
 
 
 class CategoryWidget(forms.widgets.ChoiceWidget):
@@ -180,24 +173,12 @@ class CategorySearchForm(forms.Form):
 
         # See `ThemeSearchForm` for explanation about the following lines.
         filter_form = AidSearchForm(self.initial)
-        filtered_qs = filter_form.filter_queryset() \
-            .exclude(categories__isnull=True)
+        self.facets = AidFacets(filter_form)
 
         # We list categories for selected themes
         # Special case: if no theme was selected, we return all of them
         themes = self.initial.get('themes', [])
-        if themes:
-            filtered_qs = filtered_qs \
-                .filter(categories__theme__slug__in=themes)
-
-        categories_with_aid_count = filtered_qs \
-            .values(
-                'categories__theme__name',
-                'categories__name',
-                'categories__slug') \
-            .annotate(nb_aids=Count('id', distinct=True)) \
-            .order_by('categories__theme__name', 'categories__name')
-        self.fields['categories'].queryset = categories_with_aid_count
+        self.fields['categories'].facets = self.facets.get_categories(themes)
 
 
 class SearchPageAdminForm(forms.ModelForm):
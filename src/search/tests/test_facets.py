@@ -0,0 +1,102 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from aids.factories import AidFactory
+from aids.forms import AidSearchForm
+from categories.models import Theme, Category
+from search.facets import AidFacets
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def categories():
+    nature = Theme.objects.create(name='Nature', slug='nature')
+    culture = Theme.objects.create(name='Culture', slug='culture')
+    return {
+        'forest': Category.objects.create(
+            name='Forêt', slug='forest', theme=nature),
+        'water': Category.objects.create(
+            name='Eau', slug='water', theme=nature),
+        'music': Category.objects.create(
+            name='Musique', slug='music', theme=culture),
+    }
+
+
+@pytest.fixture
+def aids(categories):
+    aids_categories = [
+        ('published', ['commune'], ['forest', 'water']),
+        ('published', ['commune'], ['forest']),
+        ('published', ['department'], ['music']),
+        ('published', ['commune'], []),
+        ('draft', ['commune'], ['music']),
+    ]
+    for status, audiances, slugs in aids_categories:
+        aid = AidFactory(status=status, targeted_audiances=audiances)
+        aid.categories.set([categories[slug] for slug in slugs])
+
+
+def test_facet_counts(aids):
+    facets = AidFacets(AidSearchForm({}))
+
+    assert facets.total == 4
+    assert facets.themes == [
+        {'slug': 'culture', 'name': 'Culture', 'nb_aids': 1},
+        {'slug': 'nature', 'name': 'Nature', 'nb_aids': 2},
+    ]
+    assert facets.get_categories() == [
+        {'theme_slug': 'culture', 'theme_name': 'Culture',
+         'slug': 'music', 'name': 'Musique', 'nb_aids': 1},
+        {'theme_slug': 'nature', 'theme_name': 'Nature',
+         'slug': 'water', 'name': 'Eau', 'nb_aids': 1},
+        {'theme_slug': 'nature', 'theme_name': 'Nature',
+         'slug': 'forest', 'name': 'Forêt', 'nb_aids': 2},
+    ]
+    assert [c['slug'] for c in facets.get_categories(['nature'])] == [
+        'water', 'forest']
+
+
+def test_facet_counts_with_filters(aids):
+    facets = AidFacets(AidSearchForm({'themes': ['nature']}))
+    assert facets.total == 2
+    assert [t['slug'] for t in facets.themes] == ['nature']
+
+    facets = AidFacets(AidSearchForm({
+        'targeted_audiances': ['department']}))
+    assert facets.total == 1
+    assert facets.themes == [
+        {'slug': 'culture', 'name': 'Culture', 'nb_aids': 1}]
+
+
+def test_facet_counts_are_cached(aids):
+    with CaptureQueriesContext(connection) as queries:
+        AidFacets(AidSearchForm({}))
+    assert len(queries) == 1
+
+    with CaptureQueriesContext(connection) as queries:
+        facets = AidFacets(AidSearchForm({}))
+    assert len(queries) == 0
+    assert facets.total == 4
+
+
+def test_theme_step_displays_counts(client, aids):
+    url = reverse('search_step_theme')
+    res = client.get(url, {'targeted_audiances': 'commune'})
+    assert res.status_code == 200
+    content = res.content.decode()
+    assert 'Nature (2)' in content
+    assert 'Culture' not in content
+
+
+def test_category_step_displays_counts(client, aids):
+    url = reverse('search_step_category')
+    res = client.get(url, {'themes': 'nature'})
+    assert res.status_code == 200
+    content = res.content.decode()
+    assert '<span class="counter">2</span>' in content
+    assert 'Forêt (2)' in content
+    assert 'Eau (1)' in content
+    assert 'Musique' not in content
@@ -1,6 +1,5 @@
 from django.views.generic import FormView
 
-from aids.forms import AidSearchForm
 from search.forms import (AudianceSearchForm, PerimeterSearchForm,
                           ThemeSearchForm, CategorySearchForm)
 
@@ -66,12 +65,6 @@ class CategorySearch(SearchMixin, FormView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        initial = self.get_initial()
-        filter_form = AidSearchForm(initial)
-        theme_aids = filter_form.filter_queryset()
-
-        context['total_aids'] = theme_aids \
-            .values('id') \
-            .distinct() \
-            .count()
+        # The total was already computed along with the category counts
+        context['total_aids'] = context['form'].facets.total
         return context
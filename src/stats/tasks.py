@@ -0,0 +1,18 @@
+from django.utils.dateparse import parse_datetime
+
+from core.celery import app
+from stats.models import Event
+
+
+@app.task
+def save_events(events):
+    """Save a batch of buffered events."""
+
+    Event.objects.bulk_create([
+        Event(
+            category=event['category'],
+            event=event['event'],
+            meta=event['meta'],
+            value=event['value'],
+            date_created=parse_datetime(event['date_created']))
+        for event in events])
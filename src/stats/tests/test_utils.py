@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from aids.factories import AidFactory
+from stats.models import Event
+from stats.utils import EventBuffer, log_event, flush_events
+
+pytestmark = pytest.mark.django_db
+
+
+def build_event(meta='test'):
+    return Event(category='aid', event='viewed', meta=meta, value=1)
+
+
+def test_buffer_is_flushed_when_full():
+    buffer = EventBuffer(max_size=3, max_age=60, background=False)
+    buffer.add(build_event())
+    buffer.add(build_event())
+    assert not buffer.is_due()
+
+    buffer.add(build_event())
+    assert buffer.is_due()
+    assert Event.objects.count() == 0
+
+    buffer.flush()
+    assert Event.objects.count() == 3
+    assert not buffer.is_due()
+
+
+def test_buffer_is_flushed_when_old_enough():
+    buffer = EventBuffer(max_size=100, max_age=0, background=False)
+    assert not buffer.is_due()
+
+    buffer.add(build_event())
+    assert buffer.is_due()
+
+
+def test_buffer_flush_with_celery():
+    buffer = EventBuffer(
+        max_size=100, max_age=60, use_celery=True, background=False)
+    buffer.add(build_event('first'))
+    buffer.add(build_event('second'))
+    buffer.flush()
+    assert sorted(Event.objects.values_list('meta', flat=True)) == [
+        'first', 'second']
+
+
+def test_events_are_kept_when_they_cannot_be_saved(monkeypatch):
+    buffer = EventBuffer(max_size=100, max_age=60, background=False)
+    buffer.add(build_event('first'))
+
+    def fail(events):
+        raise RuntimeError('Database is down')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Event.objects, 'bulk_create', fail)
+        buffer.flush()
+    assert Event.objects.count() == 0
+    assert [event.meta for event in buffer.events] == ['first']
+
+    buffer.add(build_event('second'))
+    buffer.flush()
+    assert list(Event.objects.order_by('id').values_list('meta', flat=True)) \
+        == ['first', 'second']
+
+
+def test_stop_waits_for_the_running_flush(monkeypatch):
+    """Events being flushed in the background are not lost on shutdown."""
+
+    saved = []
+    flushing = threading.Event()
+
+    def slow_bulk_create(events):
+        flushing.set()
+        time.sleep(0.2)
+        saved.extend(event.meta for event in events)
+
+    monkeypatch.setattr(Event.objects, 'bulk_create', slow_bulk_create)
+    buffer = EventBuffer(max_size=2, max_age=60)
+    buffer.add(build_event('first'))
+    buffer.add(build_event('second'))
+    assert flushing.wait(timeout=5)
+
+    buffer.add(build_event('third'))
+    buffer.stop()
+    assert not buffer.flusher.is_alive()
+    assert saved == ['first', 'second', 'third']
+
+
+def test_aid_views_are_buffered(client, settings, monkeypatch):
+    settings.STATS_BUFFER_EVENTS = True
+    buffer = EventBuffer(max_size=100, max_age=60, background=False)
+    monkeypatch.setattr('stats.utils._buffer', buffer)
+
+    aid = AidFactory()
+    res = client.get(aid.get_absolute_url())
+    assert res.status_code == 200
+    assert Event.objects.count() == 0
+
+    flush_events()
+    event = Event.objects.get()
+    assert event.meta == aid.slug
+
+
+def test_events_are_saved_immediately_without_buffering(settings):
+    settings.STATS_BUFFER_EVENTS = False
+    log_event('alert', 'sent', value=3)
+    assert Event.objects.count() == 1
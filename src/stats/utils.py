@@ -1,9 +1,172 @@
+"""Analytics events logging.
+
+Events are logged on very frequent paths (e.g every aid detail page view),
+so we don't want to pay for an INSERT query every time. Instead, events are
+accumulated in memory and saved with a single `bulk_create` query, either
+when the buffer is full or when the oldest event is old enough.
+
+Flushing happens in a background thread, so the request path never waits
+for the db. Events that can't be saved are kept in the buffer and saved
+with the next batch. When the process exits gracefully, the background
+thread is stopped and pending events are flushed.
+
+Optionally (see the `STATS_EVENTS_CELERY_FLUSH` setting), buffered events
+are handed over to a Celery task instead of being saved in-process.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
 from stats.models import Event
+from stats.tasks import save_events
+
+
+logger = logging.getLogger(__name__)
+
+# Maximum time to wait for a running flush when the process exits, in seconds
+SHUTDOWN_TIMEOUT = 10
+
+
+class EventBuffer:
+    """A thread-safe in-memory buffer of `Event` objects.
+
+    When `background` is False, no flushing thread is started and `flush`
+    must be called explicitly.
+    """
+
+    def __init__(self, max_size, max_age, use_celery=False, background=True):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.use_celery = use_celery
+        self.background = background
+        self.events = []
+        self.oldest_event_time = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.flusher = None
+
+    def add(self, event):
+        with self.lock:
+            if not self.events:
+                self.oldest_event_time = time.monotonic()
+            self.events.append(event)
+            is_full = len(self.events) >= self.max_size
+
+        self.start_flusher()
+        if is_full:
+            self.wakeup.set()
+
+    def is_due(self):
+        with self.lock:
+            if not self.events:
+                return False
+            age = time.monotonic() - self.oldest_event_time
+            return len(self.events) >= self.max_size or age >= self.max_age
+
+    def pop_events(self):
+        with self.lock:
+            events, self.events = self.events, []
+            oldest_event_time, self.oldest_event_time = \
+                self.oldest_event_time, None
+        return events, oldest_event_time
+
+    def restore_events(self, events, oldest_event_time):
+        """Put events that could not be saved back in the buffer."""
+
+        with self.lock:
+            self.events = events + self.events
+            self.oldest_event_time = oldest_event_time
+
+    def flush(self):
+        """Save all pending events."""
+
+        events, oldest_event_time = self.pop_events()
+        if not events:
+            return
+
+        try:
+            if self.use_celery:
+                save_events.delay([serialize_event(e) for e in events])
+            else:
+                Event.objects.bulk_create(events)
+        except Exception:
+            logger.exception('Cannot save {} events'.format(len(events)))
+            self.restore_events(events, oldest_event_time)
+
+    def start_flusher(self):
+        """Start the background flushing thread, if necessary."""
+
+        if not self.background or self.flusher is not None:
+            return
+
+        with self.lock:
+            if self.flusher is None:
+                self.flusher = threading.Thread(
+                    target=self.run_flusher, name='stats-events-flusher',
+                    daemon=True)
+                self.flusher.start()
+
+    def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """Stop the background thread, then save all pending events.
+
+        A flush that is running in the background thread is waited for,
+        otherwise its events would be lost when the process exits.
+        """
+        self.stopping.set()
+        self.wakeup.set()
+        if self.flusher is not None:
+            self.flusher.join(timeout)
+        self.flush()
+
+    def run_flusher(self):
+        while not self.stopping.is_set():
+            self.wakeup.wait(timeout=self.max_age)
+            self.wakeup.clear()
+            if self.is_due():
+                self.flush()
+                # This thread has its own db connection
+                connection.close()
+
+
+def serialize_event(event):
+    return {
+        'category': event.category,
+        'event': event.event,
+        'meta': event.meta,
+        'value': event.value,
+        'date_created': event.date_created.isoformat(),
+    }
+
+
+_buffer = EventBuffer(
+    max_size=settings.STATS_EVENTS_BUFFER_SIZE,
+    max_age=settings.STATS_EVENTS_FLUSH_INTERVAL,
+    use_celery=settings.STATS_EVENTS_CELERY_FLUSH)
+atexit.register(_buffer.stop)
+
+
+def flush_events():
+    """Save all buffered events now."""
+
+    _buffer.flush()
 
 
 def log_event(category, event, meta='', value=None):
-    Event.objects.create(
+    event = Event(
         category=category,
         event=event,
         meta=meta,
-        value=value)
+        value=value,
+        date_created=timezone.now())
+
+    if settings.STATS_BUFFER_EVENTS:
+        _buffer.add(event)
+    else:
+        event.save()